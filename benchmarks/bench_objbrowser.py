@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+""" Benchmarks for the TreeModel, TreeProxyModel and ObjectBrowser.
+
+    Runs headless with the Qt offscreen platform. The results can be saved as a baseline and
+    later runs can be compared with it to detect regressions. For example:
+
+        %> python benchmarks/bench_objbrowser.py --save benchmarks/baseline.json
+        %> python benchmarks/bench_objbrowser.py --compare benchmarks/baseline.json
+
+    The baseline depends on the machine, it is therefore not part of the repository.
+"""
+from __future__ import print_function, division
+
+import argparse, copy, fnmatch, json, logging, os, platform, shutil, sys, tempfile, time
+from timeit import default_timer
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Use the objbrowser of this source tree.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from six import unichr
+
+from objbrowser.qtpy import QtCore, QtWidgets
+from objbrowser.qtpy.QtCore import Qt
+from objbrowser.version import PROGRAM_VERSION, PYTHON_VERSION, QT_API_NAME
+from objbrowser.attribute_model import ALL_ATTR_MODELS, DEFAULT_ATTR_COLS, ATTR_MODEL_LENGTH
+from objbrowser.treemodel import TreeModel, TreeProxyModel
+from objbrowser.treeitem import hidden_attribute_flags
+from objbrowser.objectbrowser import ObjectBrowser
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # Python 2
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    from objbrowser.arraystats import array_stats, clear_array_stats_cache
+
+logger = logging.getLogger(__name__)
+
+# Factor by which a benchmark must be slower than the baseline to be reported as a regression.
+DEFAULT_THRESHOLD = 1.5
+
+# Number of rows of which the cells are evaluated by the data() benchmark.
+N_DATA_ROWS = 200
+
+# Number of pages that are scrolled by the paint benchmark.
+N_SCROLL_PAGES = 20
+
+
+def workloads(scale):
+    """ Returns a dictionary with the synthetic objects that are browsed by the benchmarks.
+
+        The size of the objects is multiplied by scale.
+    """
+    def n(size):
+        return max(1, int(size * scale))
+
+    deep = {}
+    node = deep
+    for _ in range(n(500)):
+        node['child'] = {}
+        node = node['child']
+
+    result = {
+        'wide_dict': {'key{:07d}'.format(i): i for i in range(n(100 * 1000))},
+        'long_list': [0] * n(10 * 1000 * 1000),
+        'deep_nesting': deep,
+        'sys_modules': sys.modules,
+        'unicode_dict': {i: unichr(i) for i in range(min(0x10000, n(0x10000)))},
+    }
+    if np is not None:
+        result['numpy_array'] = np.arange(n(1000 * 1000), dtype=np.float64).reshape(-1, 100)
+    return result
+
+
+def synchronous_attr_cols(attr_cols):
+    """ Returns copies of the attribute columns that are evaluated in the calling thread so that
+        data() returns the actual values.
+    """
+    attr_cols = [copy.copy(attr_col) for attr_col in attr_cols]
+    for attr_col in attr_cols:
+        attr_col.expensive = False
+    return attr_cols
+
+
+def fetch_all(model, parent=QtCore.QModelIndex()):
+    """ Fetches all children of the parent.
+    """
+    while model.canFetchMore(parent):
+        model.fetchMore(parent)
+
+
+def bench_fetch_more(objects):
+    """ Fetching the first page of children of the workloads.
+    """
+    results = {}
+    for name, obj in objects.items():
+        model = TreeModel(obj, name, attr_cols=DEFAULT_ATTR_COLS)
+        start = default_timer()
+        model.fetchMore(model.inspectedIndex())
+        results['fetch_more.' + name] = default_timer() - start
+        model.stopWorkers()
+    return results
+
+
+def bench_data_all_columns(objects):
+    """ Calling data() for all columns of the first N_DATA_ROWS rows, with an empty cache.
+    """
+    attr_cols = synchronous_attr_cols(ALL_ATTR_MODELS)
+    results = {}
+    for name, obj in objects.items():
+        model = TreeModel(obj, '', attr_cols=attr_cols) # Fetches the first page
+        n_rows = min(N_DATA_ROWS, model.rowCount())
+        indices = [model.index(row, col) for row in range(n_rows)
+                   for col in range(len(attr_cols))]
+        start = default_timer()
+        for index in indices:
+            model.data(index, Qt.DisplayRole)
+        results['data_all_columns.' + name] = default_timer() - start
+        model.stopWorkers()
+    return results
+
+
+def bench_proxy_filter(objects):
+    """ Toggling the filter of the callable and special attributes of the proxy model, and
+        of the source model (which leaves the hidden attributes out of the tree).
+    """
+    hide_all = hidden_attribute_flags(False, False)
+    results = {}
+    for name, obj in objects.items():
+        model = TreeModel(obj, '', attr_cols=DEFAULT_ATTR_COLS) # Fetches the first page
+        proxy = TreeProxyModel()
+        proxy.setSourceModel(model)
+        proxy.rowCount() # The proxy filters when the rows are requested.
+        start = default_timer()
+        for show in (False, True):
+            proxy.setShowCallables(show)
+            proxy.setShowSpecialAttributes(show)
+            proxy.rowCount()
+        results['proxy_filter.' + name] = default_timer() - start
+
+        start = default_timer()
+        for hidden_flags in (hide_all, 0):
+            model.setHiddenFlags(hidden_flags)
+            proxy.rowCount()
+        results['source_filter.' + name] = default_timer() - start
+        model.stopWorkers()
+    return results
+
+
+def bench_name_filter(scale):
+    """ Typing a name filter in the proxy model of an expanded wide dictionary.
+
+        The fetched rows are indexed when the event loop is idle, the time until the index is
+        complete is measured as well. The next keystrokes narrow down the 1000 matches of 
+        'key0000'.
+    """
+    n_keys = max(100, int(100 * 1000 * scale))
+    wide_dict = {'key{:07d}'.format(i): i for i in range(n_keys)}
+    model = TreeModel(wide_dict, 'wide_dict', attr_cols=DEFAULT_ATTR_COLS, fetch_page_size=None)
+    proxy = TreeProxyModel()
+    proxy.setSourceModel(model)
+    fetch_all(model, model.inspectedIndex())
+    proxy.rowCount(proxy.index(0, 0))
+
+    results = {}
+    start = default_timer()
+    while proxy.hasPendingIndexItems():
+        QtWidgets.QApplication.processEvents()
+    results['name_filter.background_index'] = default_timer() - start
+    start = default_timer()
+    proxy.setNameFilter('k')
+    results['name_filter.first_keystroke'] = default_timer() - start
+    proxy.setNameFilter('key0000')
+    start = default_timer()
+    texts = ('key00001', 'key000012', 'key0000123')
+    for text in texts:
+        proxy.setNameFilter(text)
+        proxy.rowCount(proxy.index(0, 0))
+    results['name_filter.next_keystroke'] = (default_timer() - start) / len(texts)
+    model.stopWorkers()
+    return results
+
+
+def bench_sort(scale):
+    """ Sorting an expanded wide dictionary by the length column in the proxy model.
+
+        The first sort determines the sort keys, the reverse sort uses the cached keys. The 
+        Qt sort calls the index and lessThan methods for every comparison, the dictionary 
+        is therefore smaller than in the other benchmarks.
+    """
+    n_keys = max(100, int(10 * 1000 * scale))
+    wide_dict = {'key{:07d}'.format(i): 'x' * (i % 100) for i in range(n_keys)}
+    model = TreeModel(wide_dict, 'wide_dict', attr_cols=DEFAULT_ATTR_COLS, fetch_page_size=None)
+    fetch_all(model, model.inspectedIndex())
+    proxy = TreeProxyModel()
+    proxy.setSourceModel(model)
+    proxy.setDynamicSortFilter(True)
+    proxy.rowCount(proxy.index(0, 0))
+    length_col = list(DEFAULT_ATTR_COLS).index(ATTR_MODEL_LENGTH)
+
+    results = {}
+    start = default_timer()
+    proxy.sort(length_col, Qt.AscendingOrder)
+    results['sort.first'] = default_timer() - start
+    start = default_timer()
+    proxy.sort(length_col, Qt.DescendingOrder)
+    results['sort.cached_keys'] = default_timer() - start
+    model.stopWorkers()
+    return results
+
+
+def bench_refresh_tree(scale):
+    """ Refreshing an expanded wide dictionary after 1% of its keys have been replaced.
+    """
+    n_keys = max(100, int(100 * 1000 * scale))
+    wide_dict = {'key{:07d}'.format(i): i for i in range(n_keys)}
+    data = {'wide_dict': wide_dict}
+    model = TreeModel(data, 'data', attr_cols=DEFAULT_ATTR_COLS, fetch_page_size=None)
+    root_index = model.inspectedIndex()
+    fetch_all(model, root_index)
+    model.setItemExpanded(root_index, True)
+    dict_index = [model.index(row, 0, root_index) for row in range(model.rowCount(root_index))
+                  if model.treeItem(model.index(row, 0, root_index)).obj_name == 'wide_dict'][0]
+    fetch_all(model, dict_index)
+    model.setItemExpanded(dict_index, True)
+
+    results = {}
+    start = default_timer()
+    model.refreshTree()
+    results['refresh_tree.unchanged'] = default_timer() - start
+
+    for i in range(0, n_keys, 100):
+        del wide_dict['key{:07d}'.format(i)]
+        wide_dict['new{:07d}'.format(i)] = i
+    start = default_timer()
+    model.refreshTree()
+    results['refresh_tree.mutated'] = default_timer() - start
+    model.stopWorkers()
+    return results
+
+
+def bench_scroll_paint(objects):
+    """ Scrolling the tree of the ObjectBrowser page by page and painting it.
+    """
+    results = {}
+    for name in ('wide_dict', 'long_list', 'unicode_dict'):
+        browser = ObjectBrowser(objects[name], '', reset=True)
+        browser.resize(1000, 800)
+        browser.show()
+        QtWidgets.QApplication.processEvents()
+        scroll_bar = browser.obj_tree.verticalScrollBar()
+        start = default_timer()
+        for _ in range(N_SCROLL_PAGES):
+            scroll_bar.setValue(scroll_bar.value() + scroll_bar.pageStep())
+            QtWidgets.QApplication.processEvents()
+            browser.obj_tree.viewport().repaint()
+        results['scroll_paint.' + name] = (default_timer() - start) / N_SCROLL_PAGES
+        browser.close()
+        QtWidgets.QApplication.processEvents()
+    return results
+
+
+def bench_tree_item_memory(scale):
+    """ The memory per TreeItem when all items of a wide dictionary are fetched.
+
+        Uses tracemalloc if available, otherwise the approximation of TreeModel.treeItemStats.
+    """
+    wide_dict = {'key{:07d}'.format(i): i for i in range(max(100, int(100 * 1000 * scale)))}
+    model = TreeModel(wide_dict, 'wide_dict', attr_cols=DEFAULT_ATTR_COLS, fetch_page_size=None)
+    n_items_before, n_bytes_before = model.treeItemStats()
+    if tracemalloc is not None:
+        tracemalloc.start()
+        fetch_all(model, model.inspectedIndex())
+        n_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        fetch_all(model, model.inspectedIndex())
+        _, n_bytes = model.treeItemStats()
+        n_bytes -= n_bytes_before
+    n_items, _ = model.treeItemStats()
+    model.stopWorkers()
+    return {'memory_per_tree_item_bytes': n_bytes / (n_items - n_items_before)}
+
+
+def bench_array_stats(scale):
+    """ The chunked statistics of a memory mapped array in a temporary file, the first time 
+        and from the cache. Skipped if numpy isn't installed.
+    """
+    if np is None:
+        return {}
+    temp_dir = tempfile.mkdtemp(prefix='bench_objbrowser')
+    try:
+        shape = (max(1, int(10 * 1000 * scale)), 1000)
+        file_name = os.path.join(temp_dir, 'array.dat')
+        array = np.memmap(file_name, dtype=np.float64, mode='w+', shape=shape)
+        array[:] = 1.0
+        array.flush()
+        del array
+        array = np.memmap(file_name, dtype=np.float64, mode='r', shape=shape)
+
+        results = {}
+        clear_array_stats_cache()
+        start = default_timer()
+        array_stats(array)
+        results['array_stats.memmap'] = default_timer() - start
+        start = default_timer()
+        array_stats(array)
+        results['array_stats.cached'] = default_timer() - start
+        del array
+        return results
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_benchmarks(scale, pattern):
+    """ Runs the benchmarks of which the name matches the pattern and returns the results.
+    """
+    objects = workloads(scale)
+    benchmarks = [
+        ('fetch_more', lambda: bench_fetch_more(objects)),
+        ('data_all_columns', lambda: bench_data_all_columns(objects)),
+        ('proxy_filter', lambda: bench_proxy_filter(objects)),
+        ('name_filter', lambda: bench_name_filter(scale)),
+        ('sort', lambda: bench_sort(scale)),
+        ('refresh_tree', lambda: bench_refresh_tree(scale)),
+        ('scroll_paint', lambda: bench_scroll_paint(objects)),
+        ('memory_per_tree_item', lambda: bench_tree_item_memory(scale)),
+        ('array_stats', lambda: bench_array_stats(scale)),
+    ]
+    results = {}
+    for name, benchmark in benchmarks:
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        logger.info("Running {}".format(name))
+        results.update(benchmark())
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Prints the results next to the baseline. Returns the names of the regressions.
+    """
+    regressions = []
+    print("{:40s} {:>12s} {:>12s} {:>8s}".format("benchmark", "baseline", "current", "ratio"))
+    for name in sorted(results):
+        current = results[name]
+        base = baseline.get(name)
+        if base:
+            ratio = current / base
+            flag = "  REGRESSION" if ratio > threshold else ""
+            if flag:
+                regressions.append(name)
+            print("{:40s} {:12.6g} {:12.6g} {:8.2f}{}".format(name, base, current, ratio, flag))
+        else:
+            print("{:40s} {:>12s} {:12.6g}".format(name, "-", current))
+    return regressions
+
+
+def main():
+    """ Main program """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Factor for the size of the workloads (default: 1.0)")
+    parser.add_argument('--only', default='*',
+                        help="Only run the benchmarks that match this pattern, e.g. 'fetch*'")
+    parser.add_argument('--save', metavar='FILE', help="Save the results as a baseline")
+    parser.add_argument('--compare', metavar='FILE', help="Compare with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Ratio above which a result is a regression (default: {})"
+                        .format(DEFAULT_THRESHOLD))
+    args = parser.parse_args()
+
+    logging.basicConfig(level='INFO', format='%(levelname)-7s: %(message)s')
+    _app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    start = time.time()
+    results = run_benchmarks(args.scale, args.only)
+    logger.info("Benchmarks took {:.1f} seconds".format(time.time() - start))
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print("\n{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+            exit_code = 1
+    else:
+        compare(results, {}, args.threshold)
+
+    if args.save:
+        report = {'objbrowser_version': PROGRAM_VERSION,
+                  'python_version': PYTHON_VERSION,
+                  'qt_api': QT_API_NAME,
+                  'platform': platform.platform(),
+                  'scale': args.scale,
+                  'results': results}
+        with open(args.save, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=4, sort_keys=True)
+        logger.info("Saved baseline to: {}".format(args.save))
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
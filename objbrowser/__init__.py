@@ -11,18 +11,20 @@ from objbrowser.version import PROGRAM_VERSION as __version__
 from objbrowser.version import DEBUGGING
 
 # Wrap the following code in an exception so that setup.py can still import the PROGRAM_VERSION
-# even if PyQt/PySide is not installed.
+# even if PyQt/PySide is not installed. The objbrowser.engine module can be used without Qt, 
+# so the error is only reported when the browser is started.
 try:
     import six
     import objbrowser.qtpy.QtCore as _QtCore
 except Exception as ex:
-    sys.stderr.write("\n")
-    sys.stderr.write("  The following packages are required to run objbrowser:\n")
-    sys.stderr.write("      six:\n")
-    sys.stderr.write("      PySide or PyQt\n")
-    sys.stderr.write("\n")
-    sys.stderr.write("  Could not run objbrowser because: {}".format(ex))
-    sys.stderr.write("\n")
+    _IMPORT_ERROR = ex
+
+    def browse(*args, **kwargs):
+        """ Raises an ImportError because the packages to run the browser are not installed.
+        """
+        raise ImportError("The following packages are required to run objbrowser: six and "
+                          "PySide or PyQt. Could not run objbrowser because: {}"
+                          .format(_IMPORT_ERROR))
 else:
     from objbrowser.patches import patch_qheaderview_if_needed
     patch_qheaderview_if_needed()
@@ -32,6 +34,8 @@ else:
     from objbrowser.utils import logging_basic_config
 
     if DEBUGGING:
+        from objbrowser import tracing
+        tracing.enable()
         logging_basic_config('DEBUG')
         logger.warn("DEBUGGING flag is on")
         logger.debug("Overriding Python excepthook.")
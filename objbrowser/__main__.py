@@ -0,0 +1,112 @@
+""" Command line interface of objbrowser.
+
+    Exports an object tree to standard output or to a file, without a GUI. For example:
+
+        %> python -m objbrowser export sys.modules --max-depth 2 --columns "path,type name"
+        %> python -m objbrowser export os.environ --format text -o environ.txt
+"""
+from __future__ import absolute_import, print_function
+
+import argparse, importlib, logging, sys
+
+from objbrowser.attribute_model import ALL_ATTR_MODELS
+from objbrowser.export import (export_tree, find_attr_models, DEFAULT_EXPORT_COLS,
+                               DEFAULT_MAX_DEPTH, DEFAULT_MAX_VALUE_LEN, FILE_FORMATS)
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_object(dotted_name):
+    """ Returns the object with a dotted name, e.g. 'os.path.sep'.
+
+        The longest prefix of the name that can be imported is imported as a module, the rest
+        of the name is looked up as attributes.
+    """
+    parts = dotted_name.split('.')
+    for n_parts in range(len(parts), 0, -1):
+        try:
+            obj = importlib.import_module('.'.join(parts[:n_parts]))
+        except ImportError:
+            continue
+        for attr_name in parts[n_parts:]:
+            obj = getattr(obj, attr_name)
+        return obj
+    raise ValueError("No module found for: {}".format(dotted_name))
+
+
+def export_command(args):
+    """ Runs the export subcommand. Returns the exit code.
+    """
+    try:
+        obj = resolve_object(args.object)
+        attr_cols = find_attr_models([name.strip() for name in args.columns.split(',')])
+    except (ValueError, AttributeError) as ex:
+        logger.error(ex)
+        return 2
+
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        n_nodes = export_tree(obj, output_file, args.object,
+                              attr_cols = attr_cols,
+                              file_format = args.format,
+                              max_len = args.max_len,
+                              max_depth = args.max_depth,
+                              max_nodes = args.max_nodes,
+                              show_callable_attributes = not args.hide_callables,
+                              show_special_attributes = not args.hide_special)
+    finally:
+        if output_file is not sys.stdout:
+            output_file.close()
+    logger.info("Exported {} nodes".format(n_nodes))
+    return 0
+
+
+def main():
+    """ Main program """
+    parser = argparse.ArgumentParser(prog='python -m objbrowser',
+                                     description="Inspect Python objects without a GUI.")
+    parser.add_argument('-l', '--log-level', dest='log_level', default='WARNING',
+                        help="Log level (default: WARNING)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    export_parser = subparsers.add_parser(
+        'export', help="Write the object tree as JSON Lines or text.",
+        description="Walks the object tree depth-first and writes a line per node while "
+                    "walking, so that large trees can be exported with little memory.",
+        epilog="Available columns: {}".format(", ".join(am.name for am in ALL_ATTR_MODELS)))
+    export_parser.add_argument('object',
+                               help="Dotted name of the object, e.g. 'sys.modules' or 'os.path'")
+    export_parser.add_argument('-o', '--output', default='-',
+                               help="Output file (default: standard output)")
+    export_parser.add_argument('-f', '--format', choices=FILE_FORMATS, default='jsonl',
+                               help="File format (default: jsonl)")
+    export_parser.add_argument('-c', '--columns',
+                               default=",".join(am.name for am in DEFAULT_EXPORT_COLS),
+                               help="Comma separated names of the exported columns "
+                                    "(default: %(default)s)")
+    export_parser.add_argument('-d', '--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                               help="Maximum depth of the nodes, the object itself has depth 0 "
+                                    "(default: %(default)s)")
+    export_parser.add_argument('-n', '--max-nodes', type=int, default=None,
+                               help="Maximum number of exported nodes (default: no limit)")
+    export_parser.add_argument('--max-len', type=int, default=DEFAULT_MAX_VALUE_LEN,
+                               help="Maximum length of the column values (default: %(default)s)")
+    export_parser.add_argument('--hide-callables', action='store_true',
+                               help="Don't export callable attributes")
+    export_parser.add_argument('--hide-special', action='store_true',
+                               help="Don't export __special__ attributes")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(),
+                        format='%(asctime)s %(filename)25s:%(lineno)-4d : %(levelname)-7s: '
+                               '%(message)s')
+
+    if args.command == 'export':
+        sys.exit(export_command(args))
+    else:
+        parser.print_help()
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+""" Module that calculates summary statistics of (memory mapped) numpy arrays in chunks.
+
+    The statistics are calculated over views of at most STATS_CHUNK_BYTES, so that a large
+    memory mapped array is read piece by piece instead of being loaded into memory at once.
+    The results are cached per array, identified by its id and data pointer. Changes of the
+    array data are therefore not detected.
+"""
+from __future__ import absolute_import
+
+import logging, threading, weakref
+from collections import OrderedDict
+
+from objbrowser.utils import check_time_budget
+
+try:
+    import numpy as np
+except ImportError:
+    _NUMPY_INSTALLED = False
+else:
+    _NUMPY_INSTALLED = True
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of bytes of the array data that is reduced in one step.
+STATS_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Maximum number of arrays of which the (partial) statistics are cached.
+MAX_CACHED_ARRAY_STATS = 1000
+
+# The dtype kinds of which the min, max and mean are calculated: booleans, (unsigned) integers,
+# floats and complex numbers. The NaNs are counted for floats and complex numbers.
+_MEAN_KINDS = 'biufc'
+_MIN_MAX_KINDS = 'biuf'
+_NAN_KINDS = 'fc'
+
+
+class ArrayStats(object):
+    """ The summary statistics of an array, which are accumulated chunk by chunk.
+
+        The min, max and mean are None if the dtype is not supported or if all elements are
+        NaN. NaNs are not included in them. The statistics are complete when n_chunks_done
+        equals n_chunks.
+    """
+    __slots__ = ('nbytes', 'n_elements', 'n_chunks', 'n_chunks_done', 'n_values', 'nan_count',
+                 'min', 'max', 'total')
+
+    def __init__(self, nbytes, n_elements, n_chunks):
+        self.nbytes = nbytes
+        self.n_elements = n_elements
+        self.n_chunks = n_chunks
+        self.n_chunks_done = 0
+        self.n_values = 0         # number of elements in the min, max and mean, i.e. not NaN
+        self.nan_count = 0
+        self.min = None
+        self.max = None
+        self.total = None
+
+    def __repr__(self):
+        return "<ArrayStats: {} of {} chunks>".format(self.n_chunks_done, self.n_chunks)
+
+    @property
+    def is_complete(self):
+        " Returns True if all chunks have been reduced "
+        return self.n_chunks_done >= self.n_chunks
+
+    @property
+    def mean(self):
+        " Returns the mean of the values that are not NaN, or None if there are none "
+        if self.total is None or self.n_values == 0:
+            return None
+        return self.total / self.n_values
+
+    def copy(self):
+        " Returns a shallow copy "
+        result = ArrayStats(self.nbytes, self.n_elements, self.n_chunks)
+        for slot in self.__slots__:
+            setattr(result, slot, getattr(self, slot))
+        return result
+
+    def add_chunk(self, chunk):
+        """ Adds the values of the chunk, an array view, to the statistics.
+        """
+        kind = chunk.dtype.kind
+        if kind in _NAN_KINDS:
+            is_nan = np.isnan(chunk)
+            n_nans = int(np.count_nonzero(is_nan))
+            if n_nans:
+                self.nan_count += n_nans
+                chunk = chunk[~is_nan]  # a copy of at most STATS_CHUNK_BYTES
+
+        if chunk.size == 0:
+            pass
+        elif kind in _MEAN_KINDS:
+            self.n_values += chunk.size
+            sum_dtype = np.complex128 if kind == 'c' else np.float64
+            chunk_total = np.add.reduce(chunk, axis=None, dtype=sum_dtype)
+            self.total = chunk_total if self.total is None else self.total + chunk_total
+            if kind in _MIN_MAX_KINDS:
+                chunk_min = np.min(chunk)
+                chunk_max = np.max(chunk)
+                self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+                self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+        self.n_chunks_done += 1
+
+
+def _chunk_layout(arr, chunk_bytes):
+    """ Returns the number of chunks and a function that returns the chunk with a given number.
+
+        The array is split along the axis where the trailing axes fit in chunk_bytes. This is
+        the last axis for 1D arrays. Each chunk is a view that covers consecutive indices of
+        that axis for one index of the leading axes.
+    """
+    if arr.ndim == 0 or arr.nbytes <= chunk_bytes:
+        return 1, lambda chunk_nr: arr
+
+    max_elements = max(1, chunk_bytes // max(1, arr.itemsize))
+    split_axis = arr.ndim - 1
+    block_size = 1   # number of elements of arr[idx] when idx indexes the axes up to split_axis
+    while split_axis > 0 and block_size * arr.shape[split_axis] <= max_elements:
+        block_size *= arr.shape[split_axis]
+        split_axis -= 1
+
+    step = max(1, max_elements // block_size)
+    n_steps = -(-arr.shape[split_axis] // step)
+    outer_shape = arr.shape[:split_axis]
+    n_outer = int(np.prod(outer_shape, dtype=np.int64))
+
+    def get_chunk(chunk_nr):
+        " Returns the view of the chunk "
+        outer_nr, step_nr = divmod(chunk_nr, n_steps)
+        outer_idx = np.unravel_index(outer_nr, outer_shape) if outer_shape else ()
+        start = step_nr * step
+        return arr[tuple(int(i) for i in outer_idx) + (slice(start, start + step), )]
+
+    return n_outer * n_steps, get_chunk
+
+
+class _ArrayStatsCache(object):
+    """ Cache with the (partial) statistics of arrays, the least recently used are removed.
+
+        The key is the id, data pointer, shape, strides and dtype of the array. A weak
+        reference to the array is stored as well, so that an array that has the id of
+        a deleted array is not mistaken for it.
+    """
+    def __init__(self, max_cached=MAX_CACHED_ARRAY_STATS):
+        self.max_cached = max_cached
+        self._lock = threading.Lock()  # the statistics are calculated in worker threads
+        self._entries = OrderedDict()  # key -> (weak reference to the array, ArrayStats)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, arr):
+        """ Returns the cached statistics of the array or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0]() is not arr:
+                return None
+            self._entries[key] = self._entries.pop(key)  # most recently used
+            return entry[1]
+
+    def put(self, key, arr, stats):
+        """ Stores the statistics, unless the cache contains statistics that are further along.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None and entry[0]() is arr and
+                    entry[1].n_chunks_done >= stats.n_chunks_done):
+                return
+            self._entries[key] = (weakref.ref(arr), stats)
+            while len(self._entries) > self.max_cached:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Removes all statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_STATS_CACHE = _ArrayStatsCache()
+
+
+def _cache_key(arr):
+    " Returns the key of the array in the statistics cache "
+    data_pointer = arr.__array_interface__['data'][0]
+    return (id(arr), data_pointer, arr.shape, arr.strides, arr.dtype.str)
+
+
+def array_stats(arr):
+    """ Returns the ArrayStats of a numpy array.
+
+        The statistics are cached. If the calculation is interrupted, for instance because
+        it exceeds the time budget of a column, the statistics of the chunks that have been
+        reduced are kept, and the next call continues with the remaining chunks.
+    """
+    key = _cache_key(arr)
+    stats = _STATS_CACHE.get(key, arr)
+    if stats is not None and stats.is_complete:
+        return stats
+
+    # Reduce a plain ndarray view so that subclasses, such as memmap, don't wrap every result.
+    n_chunks, get_chunk = _chunk_layout(arr.view(np.ndarray), STATS_CHUNK_BYTES)
+    if stats is None or stats.n_chunks != n_chunks:
+        stats = ArrayStats(arr.nbytes, arr.size, n_chunks)
+    else:
+        stats = stats.copy()  # the cached object may be read by other threads
+
+    while not stats.is_complete:
+        check_time_budget()
+        stats.add_chunk(get_chunk(stats.n_chunks_done))
+        _STATS_CACHE.put(key, arr, stats.copy())
+    return stats
+
+
+def clear_array_stats_cache():
+    """ Removes the cached statistics, e.g. after the data of the arrays has been changed.
+    """
+    _STATS_CACHE.clear()
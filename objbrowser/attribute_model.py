@@ -4,10 +4,11 @@ from __future__ import absolute_import
 
 __all__ = ['browse', 'execute', 'create_object_browser', 'logging_basic_config']
 
-from objbrowser.qtpy.QtCore import Qt
-from objbrowser.qtpy.QtGui import QTextOption
+import logging, inspect, string, six
 
-import logging, inspect, string, pprint, six
+from objbrowser.treeitem import SequenceRange
+from objbrowser.utils import (call_with_time_budget, bounded_repr, bounded_str, bounded_unicode,
+                              bounded_pformat, iter_repr)
 
 try:
     import numpy as np
@@ -15,6 +16,7 @@ except ImportError:
     _NUMPY_INSTALLED = False
 else:
     _NUMPY_INSTALLED = True
+    from objbrowser.arraystats import array_stats
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +24,12 @@ logger = logging.getLogger(__name__)
 SMALL_COL_WIDTH = 120
 MEDIUM_COL_WIDTH = 200
 
-_PRETTY_PRINTER = pprint.PrettyPrinter(indent=4)
+# Time budget in seconds for columns that can be slow on large objects.
+DEFAULT_TIME_BUDGET = 1.0
+
+# Maximum number of characters of the string representations (e.g. repr and pretty print). 
+# Formatting stops when this limit is reached so that large objects don't create giant strings.
+DEFAULT_MAX_STR_LEN = 100 * 1000
 
 _ALL_PREDICATES = (inspect.ismodule, inspect.isclass, inspect.ismethod,
                    inspect.isfunction, inspect.isgeneratorfunction, inspect.isgenerator,
@@ -31,10 +38,14 @@ _ALL_PREDICATES = (inspect.ismodule, inspect.isclass, inspect.ismethod,
                    inspect.ismethoddescriptor, inspect.isdatadescriptor, 
                    inspect.isgetsetdescriptor, inspect.ismemberdescriptor) 
 
-# The cast to int is necessary to avoid a bug in PySide, See:
+# The values of the Qt alignment flags and text wrap modes. They are defined as integers so that
+# the columns can be used without Qt, e.g. when exporting. Ints also avoid a bug in PySide, See:
 # https://bugreports.qt-project.org/browse/PYSIDE-20
-ALIGN_LEFT  = int(Qt.AlignVCenter | Qt.AlignLeft)
-ALIGN_RIGHT = int(Qt.AlignVCenter | Qt.AlignRight)
+ALIGN_LEFT  = 0x0081  # Qt.AlignVCenter | Qt.AlignLeft
+ALIGN_RIGHT = 0x0082  # Qt.AlignVCenter | Qt.AlignRight
+
+WRAP_NONE = 0      # QTextOption.NoWrap
+WRAP_ANYWHERE = 4  # QTextOption.WrapAtWordBoundaryOrAnywhere
 
 class AttributeModel(object):
     """ Determines how an object attribute is rendered in a table column or details pane
@@ -45,7 +56,12 @@ class AttributeModel(object):
                  col_visible = True, 
                  width = SMALL_COL_WIDTH,
                  alignment = ALIGN_LEFT, 
-                 line_wrap = QTextOption.NoWrap):
+                 line_wrap = WRAP_NONE,
+                 expensive = False,
+                 time_budget = None,
+                 details_fn = None,
+                 sort_key_fn = None,
+                 bounded = False):
         """
             Constructor
             
@@ -60,9 +76,31 @@ class AttributeModel(object):
             :param width: default width in the attribute table
             :type with: int
             :param alignment: alignment of the value in the table
-            :type alignment: Qt.AlignmentFlag 
+            :type alignment: int (Qt.AlignmentFlag)
             :param line_wrap: Line wrap mode of the attribute in the details pane
-            :type line_wrap: QtGui.QPlainTextEdit
+            :type line_wrap: int (QTextOption.WrapMode)
+            :param expensive: if True, the table cells are evaluated in a background thread.
+                A placeholder is shown until the value is available.
+            :type expensive: bool
+            :param time_budget: maximum number of seconds that the data_fn may take for a cell.
+                Cells that exceed it are marked as timed out and are not calculated again until
+                the user retries them. Data functions that don't call check_time_budget are not
+                interrupted, their late value is shown in the marked cell. If None, there is no 
+                time limit.
+            :type time_budget: float
+            :param details_fn: function that calculates the value shown in the details pane.
+                It may return a generator of string chunks, which are read when the user scrolls
+                down. If None, the data_fn is used.
+            :type details_fn: function(TreeItem) to string or generator of strings
+            :param sort_key_fn: function that returns the key for sorting the column, e.g. the
+                length as an integer. The keys of a column must be comparable with each other.
+                Items for which it returns None (or raises an exception) are sorted last. 
+                If None, the column is sorted by its display value.
+            :type sort_key_fn: function(TreeItem) to a comparable object
+            :param bounded: if True, the data_fn accepts the maximum number of characters of the
+                result as second argument, e.g. a function created by bounded_data_fn. The table
+                cells then only format as many characters as they display. 
+            :type bounded: bool
         """
 
         if not callable(data_fn):
@@ -75,6 +113,11 @@ class AttributeModel(object):
         self.width = width
         self.alignment = alignment
         self.line_wrap = line_wrap
+        self.expensive = expensive
+        self.time_budget = time_budget
+        self.details_fn = details_fn
+        self.sort_key_fn = sort_key_fn
+        self.bounded = bounded
         
     def __repr__(self):
         """ String representation """
@@ -130,6 +173,90 @@ def safe_data_fn(obj_fn, log_exceptions=False):
     return data_fn
 
 
+def budgeted_tio_call(obj_fn, tree_item, time_budget, log_exceptions=False):
+    """ Call the obj_fn(tree_item.obj) with a time budget in seconds.
+        Returns empty string in case of an error. 
+        Raises TimeBudgetExceeded if the time_budget is exceeded (see call_with_time_budget).
+    """ 
+    return safe_tio_call(lambda tio: call_with_time_budget(obj_fn, (tio,), time_budget),
+                         tree_item, log_exceptions=log_exceptions)
+
+
+def budgeted_data_fn(obj_fn, time_budget, log_exceptions=False):
+    """ Creates a function that returns an empty string in case of an exception and that
+        raises TimeBudgetExceeded when it takes longer than time_budget seconds.
+        
+        :param obj_fn: function that will be wrapped
+        :type obj_fn: object to basestring function
+        :param time_budget: maximum duration of the call in seconds
+        :type time_budget: float
+        :returns: function that can be used as AttributeModel data_fn attribute
+        :rtype: objbrowser.treeitem.TreeItem to string function 
+    """
+    def data_fn(tree_item):
+        """ Call the obj_fn(tree_item.obj) with a time budget. 
+            Returns empty string in case of an error
+        """ 
+        return budgeted_tio_call(obj_fn, tree_item, time_budget, log_exceptions=log_exceptions)
+    
+    return data_fn
+
+
+def bounded_data_fn(obj_fn, max_len=DEFAULT_MAX_STR_LEN):
+    """ Creates a function that calls obj_fn(tree_item.obj, max_len). 
+        
+        The max_len can be overridden by the second argument of the function, which is used by
+        the table cells of AttributeModels with bounded=True.
+        
+        :param obj_fn: function that returns a string representation of at most max_len 
+            characters, e.g. objbrowser.utils.bounded_repr 
+        :type obj_fn: function(object, int) to basestring
+        :param max_len: default maximum length of the string representation
+        :type max_len: int
+        :returns: function that can be used as AttributeModel data_fn attribute
+        :rtype: objbrowser.treeitem.TreeItem (and int) to string function 
+    """
+    def data_fn(tree_item, max_len=max_len):
+        """ Call the obj_fn(tree_item.obj, max_len)
+        """ 
+        return obj_fn(tree_item.obj, max_len)
+    
+    return data_fn
+
+
+def safe_sort_key_fn(obj_fn):
+    """ Creates a sort_key_fn that returns obj_fn(tree_item.obj), or None in case of an error.
+
+        :param obj_fn: function that returns the sort key of an object, e.g. len
+        :type obj_fn: object to comparable function
+        :returns: function that can be used as AttributeModel sort_key_fn attribute
+        :rtype: objbrowser.treeitem.TreeItem to comparable function
+    """
+    def sort_key_fn(tree_item):
+        """ Call the obj_fn(tree_item.obj).
+            Returns None in case of an error
+        """
+        try:
+            return obj_fn(tree_item.obj)
+        except Exception:
+            return None
+
+    return sort_key_fn
+
+
+def tio_name_sort_key(tree_item):
+    """ Returns the key for sorting by name. Integer names, e.g. the indices of list elements,
+        and range nodes, e.g. '[1000:2000]', are sorted numerically and precede the other names.
+    """
+    if isinstance(tree_item.obj, SequenceRange):
+        return (0, tree_item.obj.start, '')
+    name = tree_item.obj_name
+    if name.isdigit():
+        return (0, int(name), '')
+    else:
+        return (1, 0, name)
+
+
 def tio_predicates(tree_item):
     """ Returns the inspect module predicates that are true for this object
     """
@@ -144,7 +271,7 @@ def tio_summary(tree_item):
     """
     tio = tree_item.obj
     if isinstance(tio, six.string_types):
-        return tio
+        return tio[:DEFAULT_MAX_STR_LEN]
     elif isinstance(tio, (list, tuple, set, frozenset, dict)):  
         n_items = len(tio)
         if n_items == 0:
@@ -158,9 +285,53 @@ def tio_summary(tree_item):
     elif callable(tio) or inspect.ismodule(tio):
         return "" 
     else:
-        return str(tio)
+        return bounded_str(tio, DEFAULT_MAX_STR_LEN)
     
     
+def _format_stat(value):
+    " Formats a statistic of an array, e.g. the mean, with at most 6 significant digits "
+    if value is None:
+        return '-'
+    elif isinstance(value, (float, complex, np.floating, np.complexfloating)):
+        return '{:.6g}'.format(value)
+    else:
+        return str(value)
+
+
+def tio_array_stats(tree_item):
+    """ Returns the min, max, mean, number of NaNs and size of numpy arrays on one line.
+        For other objects an empty string is returned.
+    """
+    tio = tree_item.obj
+    if not (_NUMPY_INSTALLED and isinstance(tio, np.ndarray)):
+        return ""
+    stats = array_stats(tio)
+    return "min: {}, max: {}, mean: {}, NaNs: {}, {:,} bytes".format(
+        _format_stat(stats.min), _format_stat(stats.max), _format_stat(stats.mean), 
+        stats.nan_count, stats.nbytes)
+
+
+def tio_array_stats_details(tree_item):
+    """ Returns the statistics of numpy arrays with one statistic per line.
+    """
+    tio = tree_item.obj
+    if not (_NUMPY_INSTALLED and isinstance(tio, np.ndarray)):
+        return "<not a numpy array>"
+    stats = array_stats(tio)
+    lines = [("dtype", tio.dtype), 
+             ("shape", tio.shape), 
+             ("elements", "{:,}".format(stats.n_elements)), 
+             ("nbytes", "{:,}".format(stats.nbytes)), 
+             ("min", _format_stat(stats.min)), 
+             ("max", _format_stat(stats.max)), 
+             ("mean", _format_stat(stats.mean)), 
+             ("NaNs", "{:,}".format(stats.nan_count)), 
+             ("chunks", "{:,}".format(stats.n_chunks))]
+    if isinstance(tio, np.memmap):
+        lines.append(("file", tio.filename))
+    return "\n".join("{:10s}{}".format(name + ':', value) for name, value in lines)
+
+
 def tio_is_attribute(tree_item):
     """ Returns 'True' if the tree item object is an attribute of the parent 
         opposed to e.g. a list element.
@@ -194,6 +365,7 @@ def tio_doc_str(tree_item):
 ATTR_MODEL_NAME = AttributeModel('name', 
     doc         = "The name of the object.", 
     data_fn     = lambda tree_item: tree_item.obj_name if tree_item.obj_name else '<root>',
+    sort_key_fn = tio_name_sort_key,
     col_visible = True,  
     width       = SMALL_COL_WIDTH) 
 
@@ -210,33 +382,57 @@ ATTR_MODEL_SUMMARY = AttributeModel('summary',
     data_fn     = tio_summary,
     col_visible = True,  
     alignment   = ALIGN_LEFT,
-    width       = MEDIUM_COL_WIDTH) 
+    width       = MEDIUM_COL_WIDTH,
+    time_budget = DEFAULT_TIME_BUDGET) 
 
 ATTR_MODEL_UNICODE = AttributeModel('unicode', 
     doc         = """The unicode representation of the object. In Python 2 it uses unicode()
                      In Python 3 the str() function is used.
                   """, 
-    data_fn     = lambda tree_item: six.text_type(tree_item.obj),
+    data_fn     = bounded_data_fn(bounded_unicode),
+    bounded     = True,
     col_visible = True,  
     width       = MEDIUM_COL_WIDTH, 
-    line_wrap   = QTextOption.WrapAtWordBoundaryOrAnywhere) 
+    line_wrap   = WRAP_ANYWHERE,
+    time_budget = DEFAULT_TIME_BUDGET) 
 
 
 ATTR_MODEL_STR = AttributeModel('str', 
     doc         = """The string representation of the object using the str() function.
                      In Python 3 there is no difference with the 'unicode' column.
                   """,
-    data_fn     = lambda tree_item: str(tree_item.obj),
+    data_fn     = bounded_data_fn(bounded_str),
+    bounded     = True,
     col_visible = False,  
     width       = MEDIUM_COL_WIDTH, 
-    line_wrap   = QTextOption.WrapAtWordBoundaryOrAnywhere) 
+    line_wrap   = WRAP_ANYWHERE,
+    time_budget = DEFAULT_TIME_BUDGET) 
  
 ATTR_MODEL_REPR = AttributeModel('repr', 
     doc         = "The string representation of the object using the repr() function.", 
-    data_fn     = lambda tree_item: repr(tree_item.obj),         
+    data_fn     = bounded_data_fn(bounded_repr),
+    bounded     = True,
+    details_fn  = lambda tree_item: iter_repr(tree_item.obj),
     col_visible = True,  
     width       = MEDIUM_COL_WIDTH, 
-    line_wrap   = QTextOption.WrapAtWordBoundaryOrAnywhere) 
+    line_wrap   = WRAP_ANYWHERE,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET) 
+
+# The statistics of a large (memory mapped) array can take minutes. A cell that exceeds the time 
+# budget keeps the chunks that have been reduced, retrying it continues with the remaining chunks.
+ATTR_MODEL_ARRAY_STATS = AttributeModel('array statistics', 
+    doc         = """The minimum, maximum, mean, number of NaNs and size in bytes of numpy arrays.
+                     The NaNs are not included in the minimum, maximum and mean. They are 
+                     calculated in chunks, so that memory mapped arrays are not loaded at once,
+                     and are cached per array. Changes of the array data are not detected.
+                  """,
+    data_fn     = tio_array_stats,
+    details_fn  = tio_array_stats_details,
+    col_visible = False,  
+    width       = MEDIUM_COL_WIDTH,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET) 
 
 ATTR_MODEL_TYPE = AttributeModel('type', 
     doc         = "Type of the object determined using the builtin type() function", 
@@ -254,6 +450,7 @@ ATTR_MODEL_LENGTH = AttributeModel('length',
     doc         = "The length of the object using the len() function", 
     #data_fn     = tio_length,
     data_fn      = safe_data_fn(len),  
+    sort_key_fn = safe_sort_key_fn(len),
     col_visible = False,  
     alignment   = ALIGN_RIGHT,
     width       = SMALL_COL_WIDTH) 
@@ -261,6 +458,7 @@ ATTR_MODEL_LENGTH = AttributeModel('length',
 ATTR_MODEL_ID = AttributeModel('id', 
     doc         = "The identifier of the object with calculated using the id() function", 
     data_fn     = lambda tree_item: "0x{:X}".format(id(tree_item.obj)), 
+    sort_key_fn = lambda tree_item: id(tree_item.obj),
     col_visible = False, 
     alignment   = ALIGN_RIGHT, 
     width       = SMALL_COL_WIDTH) 
@@ -298,9 +496,12 @@ ATTR_MODEL_PRED = AttributeModel('inspect predicates',
 
 ATTR_MODEL_PRETTY_PRINT = AttributeModel('pretty print', 
     doc         = "Pretty printed representation of the object using the pprint module.", 
-    data_fn     = lambda tree_item: _PRETTY_PRINTER.pformat(tree_item.obj),         
+    data_fn     = bounded_data_fn(bounded_pformat),
+    bounded     = True,
     col_visible = False,  
-    width       = MEDIUM_COL_WIDTH) 
+    width       = MEDIUM_COL_WIDTH,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET) 
         
 ATTR_MODEL_DOC_STRING = AttributeModel('doc string', 
     doc         = "The object's doc string", 
@@ -318,7 +519,9 @@ ATTR_MODEL_GET_COMMENTS = AttributeModel('inspect.getcomments',
     doc         = "Comments above the object's definition. Retrieved using inspect.getcomments()",
     data_fn     = lambda tree_item: inspect.getcomments(tree_item.obj),         
     col_visible = False,  
-    width       = MEDIUM_COL_WIDTH)
+    width       = MEDIUM_COL_WIDTH,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET)
         
 ATTR_MODEL_GET_MODULE = AttributeModel('inspect.getmodule', 
     doc         = "The object's module. Retrieved using inspect.module",
@@ -342,13 +545,17 @@ ATTR_MODEL_GET_SOURCE_LINES = AttributeModel('inspect.getsourcelines',
     doc         = "Uses inspect.getsourcelines() to get a list of source lines for the object", 
     data_fn     = safe_data_fn(inspect.getsourcelines),         
     col_visible = False,  
-    width       = MEDIUM_COL_WIDTH)
+    width       = MEDIUM_COL_WIDTH,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET)
         
 ATTR_MODEL_GET_SOURCE = AttributeModel('inspect.getsource', 
     doc         = "The source code of an object retrieved using inspect.getsource", 
     data_fn     = safe_data_fn(inspect.getsource),         
     col_visible = False,  
-    width       = MEDIUM_COL_WIDTH) 
+    width       = MEDIUM_COL_WIDTH,
+    expensive   = True,
+    time_budget = DEFAULT_TIME_BUDGET) 
         
 
 ALL_ATTR_MODELS = (
@@ -374,7 +581,8 @@ ALL_ATTR_MODELS = (
     ATTR_MODEL_GET_FILE, 
     ATTR_MODEL_GET_SOURCE_FILE, 
     ATTR_MODEL_GET_SOURCE_LINES, 
-    ATTR_MODEL_GET_SOURCE)
+    ATTR_MODEL_GET_SOURCE,
+    ATTR_MODEL_ARRAY_STATS)
 
 
 DEFAULT_ATTR_COLS = (
@@ -394,7 +602,8 @@ DEFAULT_ATTR_COLS = (
     ATTR_MODEL_PRED,    
     ATTR_MODEL_GET_MODULE, 
     ATTR_MODEL_GET_FILE, 
-    ATTR_MODEL_GET_SOURCE_FILE)
+    ATTR_MODEL_GET_SOURCE_FILE,
+    ATTR_MODEL_ARRAY_STATS)
 
 DEFAULT_ATTR_DETAILS = (
     ATTR_MODEL_PATH, # to allow for copy/paste  
@@ -411,6 +620,7 @@ DEFAULT_ATTR_DETAILS = (
     #ATTR_MODEL_GET_SOURCE_FILE,  # not used, already in table 
     #ATTR_MODEL_GET_SOURCE_LINES, # not used, ATTR_MODEL_GET_SOURCE is better
     ATTR_MODEL_GET_SOURCE)
+    #ATTR_MODEL_ARRAY_STATS) # not used, only useful for numpy arrays
 
 # Sanity check for duplicates
 assert len(ALL_ATTR_MODELS) == len(set(ALL_ATTR_MODELS))
@@ -0,0 +1,149 @@
+""" Module that defines the CellCache
+"""
+from __future__ import absolute_import
+
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Default maximum number of cells of which the display value is cached.
+DEFAULT_MAX_CACHED_CELLS = 50000
+
+# Default maximum total number of characters of the cached display values.
+DEFAULT_MAX_CACHED_CHARS = 10 * 1000 * 1000
+
+
+class CellCache(object):
+    """ Least recently used cache for the display values of table cells.
+
+        The values are grouped per TreeItem so that all cells of an item can be removed at once.
+        When the cache is full, the cells of the least recently used item are evicted.
+
+        Both the number of cells and the total number of characters of the values are limited.
+        Values that are larger than the maximum number of characters are not cached.
+    """
+    def __init__(self, max_cells=DEFAULT_MAX_CACHED_CELLS, max_chars=DEFAULT_MAX_CACHED_CHARS):
+        """ Constructor
+
+            :param max_cells: maximum number of cells that are cached
+            :param max_chars: maximum total length of the cached values
+        """
+        assert max_cells > 0, "max_cells must be > 0. Got: {}".format(max_cells)
+        assert max_chars > 0, "max_chars must be > 0. Got: {}".format(max_chars)
+        self.max_cells = max_cells
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # tree_item -> {column: value}, in order of last usage.
+        self._n_cells = 0
+        self._n_chars = 0
+
+
+    def __repr__(self):
+        """ String representation """
+        return "<CellCache: {} cells, {} chars, {} hits, {} misses>" \
+            .format(self._n_cells, self._n_chars, self.hits, self.misses)
+
+
+    @property
+    def n_cells(self):
+        """ The number of cells that are currently cached.
+        """
+        return self._n_cells
+
+
+    @property
+    def n_chars(self):
+        """ The total number of characters of the cached values.
+        """
+        return self._n_chars
+
+
+    @property
+    def hit_rate(self):
+        """ The fraction of the get calls that found a cached value. None if get wasn't called.
+        """
+        n_calls = self.hits + self.misses
+        return self.hits / float(n_calls) if n_calls else None
+
+
+    def get(self, tree_item, column):
+        """ Returns the cached value of a cell. Returns None if the value is not cached.
+        """
+        try:
+            cells = self._items.pop(tree_item)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._items[tree_item] = cells # Mark as most recently used
+        value = cells.get(column)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+    def put(self, tree_item, column, value):
+        """ Stores the value of a cell. Evicts the least recently used items if needed.
+        """
+        if len(value) > self.max_chars:
+            return
+
+        cells = self._items.pop(tree_item, None)
+        if cells is None:
+            cells = {}
+        else:
+            old_value = cells.pop(column, None)
+            if old_value is not None:
+                self._n_cells -= 1
+                self._n_chars -= len(old_value)
+
+        cells[column] = value
+        self._items[tree_item] = cells
+        self._n_cells += 1
+        self._n_chars += len(value)
+
+        while self._n_cells > self.max_cells or self._n_chars > self.max_chars:
+            _, evicted_cells = self._items.popitem(last=False)
+            self._forget(evicted_cells)
+
+
+    def remove(self, tree_item):
+        """ Removes all cached values of the tree_item.
+        """
+        self.pop(tree_item)
+
+
+    def pop(self, tree_item):
+        """ Removes all cached values of the tree_item and returns them as a {column: value}
+            dictionary. Returns None if no values of the tree_item are cached.
+        """
+        cells = self._items.pop(tree_item, None)
+        if cells is not None:
+            self._forget(cells)
+        return cells
+
+
+    def clear(self):
+        """ Removes all cached values. The hit and miss counters are not reset.
+        """
+        self._items.clear()
+        self._n_cells = 0
+        self._n_chars = 0
+
+
+    def reset_counters(self):
+        """ Sets the hit and miss counters to zero.
+        """
+        self.hits = 0
+        self.misses = 0
+
+
+    def _forget(self, cells):
+        """ Updates the cell and character count for cells that are removed.
+        """
+        self._n_cells -= len(cells)
+        self._n_chars -= sum(len(value) for value in cells.values())
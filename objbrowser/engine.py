@@ -0,0 +1,413 @@
+""" Module with the Qt-independent core of objbrowser.
+
+    It determines the children of Python objects with child providers, creates the lazy
+    TreeItems for them and evaluates the attribute columns. The TreeModel is a Qt adapter on
+    top of this module. This module doesn't import Qt so that it can also be used by command
+    line tools, or on servers where Qt is not installed.
+
+    The children of an object are the items (e.g. dictionary values) followed by the attributes.
+    The elements of sequences are not part of the children, they are represented by the
+    SequenceChildren of the TreeItem, which create the TreeItems of the elements on demand.
+    The elements of sequences that are longer than RANGE_NODE_SIZE are grouped in range nodes, 
+    which are items with a SequenceRange object.
+"""
+from __future__ import absolute_import
+
+import logging, inspect, array, six
+from itertools import islice
+from collections import OrderedDict, deque
+from six import unichr
+
+from objbrowser.treeitem import (TreeItem, SequenceChildren, SequenceRange, child_path, 
+                                 element_path, sequence_path_and_offset, item_flags)
+from objbrowser.utils import call_with_time_budget
+
+try:
+    import numpy as np
+except ImportError:
+    _NUMPY_INSTALLED = False
+else:
+    _NUMPY_INSTALLED = True
+
+logger = logging.getLogger(__name__)
+
+# Sequences of which the elements are added as SequenceChildren. Their TreeItems are created on
+# demand so that the number of rows is known without iterating over the sequence. 
+# Numpy arrays with at least one dimension are sequences as well, see NumpyChildProvider.
+SEQUENCE_TYPES = (list, tuple, six.moves.range, array.array, deque)
+
+# The attributes of numpy arrays and scalars that are shown. Other attributes, such as T, real 
+# and flat, are not evaluated because they can be expensive or create new arrays.
+NUMPY_ARRAY_ATTRIBUTES = ('dtype', 'flags', 'itemsize', 'nbytes', 'ndim', 'shape', 'size', 
+                          'strides')
+NUMPY_MEMMAP_ATTRIBUTES = ('filename', 'mode', 'offset')
+NUMPY_SCALAR_ATTRIBUTES = ('dtype', 'itemsize', 'nbytes')
+
+# Maximum number of elements of which the rows are added directly to a node. Longer sequences
+# are split into range nodes of RANGE_NODE_SIZE elements, or of RANGE_NODE_SIZE ** 2 elements
+# (with range nodes as children) etc., so that no node has more than RANGE_NODE_SIZE ranges.
+RANGE_NODE_SIZE = 1000
+
+# Character that replaces line breaks in single line cell values.
+LINE_BREAK_GLYPH = unichr(0x21B5)
+
+
+class ChildProvider(object):
+    """ Determines the children of the Python objects that it accepts.
+
+        This base class accepts all objects. Its objects have no items, only attributes.
+        Subclasses override accepts and items (and sequence_length for sequences). Providers
+        can be added with register_child_provider.
+    """
+    def accepts(self, obj):
+        """ Returns True if this provider determines the children of obj.
+        """
+        return True
+
+    def sequence_length(self, obj):
+        """ Returns the number of elements if obj is a sequence of which the elements should be
+            SequenceChildren. Returns None otherwise.
+        """
+        return None
+
+    def items(self, obj):
+        """ Returns a list of (name, item) tuples and the template of the item paths.
+        """
+        return [], None
+
+    def attributes(self, obj):
+        """ Returns a list of (name, attribute) tuples, sorted by name.
+        """
+        return sorted(inspect.getmembers(obj))
+
+    def children(self, obj):
+        """ Returns a tuple with: a list of (name, child_obj) tuples, the number of items
+            at the start of that list and the path template of the items. The remaining
+            children are attributes.
+        """
+        obj_children, item_path_template = self.items(obj)
+        n_items = len(obj_children)
+        obj_children.extend(self.attributes(obj))
+        return obj_children, n_items, item_path_template
+
+
+def range_items(sequence, start, stop):
+    """ Returns a list of (name, SequenceRange) tuples that group the elements start to stop
+        of the sequence in at most RANGE_NODE_SIZE ranges.
+    """
+    span = RANGE_NODE_SIZE
+    while stop - start > span * RANGE_NODE_SIZE:
+        span *= RANGE_NODE_SIZE
+    items = []
+    for range_start in range(start, stop, span):
+        # The slice of the last range is not cut off so that its name remains the same 
+        # when the sequence grows.
+        name = '[{}:{}]'.format(range_start, range_start + span)
+        items.append((name, SequenceRange(sequence, range_start, min(range_start + span, stop), 
+                                          name)))
+    return items
+
+
+class _SubRangePathTemplate(object):
+    """ Path template of the ranges in a range node. 
+    
+        Replaces the slice of the range node by the slice of the sub-range so that the path
+        of the sub-range is a single slice of the sequence, e.g. 'lst[1000:2000]' instead of 
+        'lst[0:1000000][1000:2000]'.
+    """
+    def __init__(self, range_name):
+        self.range_name = range_name
+
+    def format(self, obj_path, name):
+        return obj_path[:len(obj_path) - len(self.range_name)] + name
+
+
+class SequenceChildProvider(ChildProvider):
+    """ Child provider for lists, tuples, ranges, arrays and deques.
+        Their elements are SequenceChildren, the children are only the attributes. The elements
+        of sequences that are longer than RANGE_NODE_SIZE are grouped in range nodes instead.
+    """
+    def accepts(self, obj):
+        return isinstance(obj, SEQUENCE_TYPES)
+
+    def _length(self, obj):
+        try:
+            return len(obj)
+        except OverflowError:
+            # Ranges can be longer than sys.maxsize
+            return None
+
+    def sequence_length(self, obj):
+        n_elements = self._length(obj)
+        return n_elements if n_elements is None or n_elements <= RANGE_NODE_SIZE else None
+
+    def items(self, obj):
+        n_elements = self._length(obj)
+        if n_elements is None or n_elements <= RANGE_NODE_SIZE:
+            return [], None
+        return range_items(obj, 0, n_elements), '{}{}'
+
+
+class SequenceRangeChildProvider(SequenceChildProvider):
+    """ Child provider for range nodes. Their children are the elements in the range, or the
+        sub-ranges if the range is longer than RANGE_NODE_SIZE. They have no attributes.
+    """
+    def accepts(self, obj):
+        return isinstance(obj, SequenceRange)
+
+    def _length(self, obj):
+        return len(obj)
+
+    def items(self, obj):
+        if len(obj) <= RANGE_NODE_SIZE:
+            return [], None
+        return (range_items(obj.sequence, obj.start, obj.stop), 
+                _SubRangePathTemplate(obj.name))
+
+    def attributes(self, obj):
+        return []
+
+
+class NumpyChildProvider(SequenceChildProvider):
+    """ Child provider for numpy arrays and numpy scalars.
+
+        The elements of an array are the slices along its first axis, e.g. the rows of a matrix.
+        They are views that are created when their rows are displayed, so the data of memory 
+        mapped arrays is only read when a cell needs it. The attributes are a fixed list of 
+        cheap attributes (e.g. the dtype, shape and strides) instead of inspect.getmembers, 
+        which would evaluate all array properties.
+    """
+    def accepts(self, obj):
+        return _NUMPY_INSTALLED and isinstance(obj, (np.ndarray, np.generic))
+
+    def _length(self, obj):
+        if isinstance(obj, np.ndarray) and obj.ndim > 0:
+            return obj.shape[0]
+        else:
+            return None
+
+    def attributes(self, obj):
+        if isinstance(obj, np.memmap):
+            names = sorted(NUMPY_ARRAY_ATTRIBUTES + NUMPY_MEMMAP_ATTRIBUTES)
+        elif isinstance(obj, np.ndarray):
+            names = NUMPY_ARRAY_ATTRIBUTES
+        else:
+            names = NUMPY_SCALAR_ATTRIBUTES
+        return [(name, getattr(obj, name, None)) for name in names]
+
+
+class SetChildProvider(ChildProvider):
+    """ Child provider for sets. The items are the sorted set elements.
+    """
+    def accepts(self, obj):
+        return isinstance(obj, (set, frozenset))
+
+    def items(self, obj):
+        return [('pop()', elem) for elem in sorted(obj)], '{}.pop()'
+
+
+class MappingChildProvider(ChildProvider):
+    """ Child provider for dictionaries and the likes, i.e. objects with an items method.
+        The items are the values, sorted by key unless the object is an OrderedDict.
+    """
+    def accepts(self, obj):
+        return hasattr(obj, 'items')
+
+    def items(self, obj):
+        try:
+            obj_items = list(obj.items())
+        except Exception as ex:
+            # Can happen if the items method expects an argument, for instance the
+            # types.DictType.items method expects a dictionary.
+            logger.warn("No items expanded. Objects items() call failed: {}".format(ex))
+            obj_items = []
+
+        # Sort keys, except when the object is an OrderedDict.
+        if not isinstance(obj, OrderedDict):
+            try:
+                obj_items = sorted(obj_items)
+            except Exception as ex:
+                logger.debug("Unable to sort dictionary keys: {}".format(ex))
+        return obj_items, '{}[{!r}]'
+
+
+# The providers are tried in order, the first one that accepts the object is used.
+_CHILD_PROVIDERS = [SequenceRangeChildProvider(), NumpyChildProvider(), SequenceChildProvider(),
+                    SetChildProvider(), MappingChildProvider()]
+
+_DEFAULT_CHILD_PROVIDER = ChildProvider()
+
+
+def register_child_provider(provider):
+    """ Adds a ChildProvider. It takes precedence over the providers that were added before.
+    """
+    _CHILD_PROVIDERS.insert(0, provider)
+
+
+def child_provider(obj):
+    """ Returns the ChildProvider that determines the children of obj.
+    """
+    for provider in _CHILD_PROVIDERS:
+        if provider.accepts(obj):
+            return provider
+    return _DEFAULT_CHILD_PROVIDER
+
+
+def sequence_length(obj):
+    """ Returns the length of the obj if its elements should be SequenceChildren.
+        Returns None otherwise.
+    """
+    return child_provider(obj).sequence_length(obj)
+
+
+def object_children(obj, hidden_flags=0):
+    """ Determines the children of a Python object.
+
+        Returns a tuple with: a list of (name, child_obj) tuples, the number of items
+        (e.g. dictionary values) at the start of that list and the path template of the items.
+        The remaining children are attributes.
+
+        The attributes that have one of the hidden_flags (see treeitem.hidden_attribute_flags)
+        are left out, so that no TreeItems are created for them.
+    """
+    obj_children, n_items, item_path_template = child_provider(obj).children(obj)
+    if hidden_flags:
+        # Only attributes can have the hidden flags, the items are kept as they are.
+        obj_children[n_items:] = [(name, child_obj) for name, child_obj in obj_children[n_items:]
+                                  if not item_flags(name, child_obj, True) & hidden_flags]
+    return obj_children, n_items, item_path_template
+
+
+def create_tree_item(name, child_obj, is_attribute, obj_path, item_path_template):
+    """ Creates the TreeItem of an item or attribute of the object at obj_path.
+    """
+    return TreeItem(child_obj, name, child_path(obj_path, name, is_attribute, item_path_template),
+                    is_attribute)
+
+
+def iter_tree_items(obj_children, n_items, obj_path, item_path_template, start=0):
+    """ Generator that creates the TreeItems for a list of (name, child_obj) tuples.
+
+        The first n_items children are items (e.g. list elements or dictionary values) whose
+        path is formatted with the item_path_template. The remaining children are attributes.
+        The TreeItems are created from the start position onwards.
+    """
+    for idx, (name, child_obj) in enumerate(islice(obj_children, start, None), start):
+        yield create_tree_item(name, child_obj, idx >= n_items, obj_path, item_path_template)
+
+
+def iter_object_children(obj, obj_path, hidden_flags=0):
+    """ Returns an iterator over the TreeItems of the children of a Python object.
+
+        The children are determined (and sorted) when this function is called but their
+        path strings and TreeItems are only created when the iterator is advanced.
+        Attributes with one of the hidden_flags are skipped.
+    """
+    obj_children, n_items, item_path_template = object_children(obj, hidden_flags)
+    return iter_tree_items(obj_children, n_items, obj_path, item_path_template)
+
+
+def fetch_children(parent_item, page_size=None, hidden_flags=0):
+    """ Determines the next page of children of the parent_item.
+
+        At most page_size rows are returned, or all remaining rows if page_size is None.
+        Sequence elements precede the other children. Sets parent_item.children_fetched when
+        all children have been fetched. The caller must add the rows to the parent_item with
+        add_fetched_children, which allows a Qt model to signal the insertion around it.
+
+        Attributes with one of the hidden_flags are skipped. The flags must be the same for 
+        all pages of the parent_item.
+
+        Returns a tuple with the number of new sequence elements and a list of the TreeItems of
+        the other new children.
+    """
+    if parent_item.children_fetched:
+        return 0, []
+
+    if parent_item.pending_children is None:
+        # First call. The TreeItems of the sequence elements are created on demand.
+        parent_item.pending_children = iter_object_children(parent_item.obj,
+                                                            parent_item.obj_path, hidden_flags)
+        n_elements = sequence_length(parent_item.obj)
+        if n_elements:
+            parent_item.sequence_children = SequenceChildren(parent_item, 0, n_elements)
+
+    sequence_children = parent_item.sequence_children
+    if sequence_children is None:
+        n_new_elements = 0
+    else:
+        n_new_elements = sequence_children.sequence_length - len(sequence_children)
+        if page_size is not None:
+            n_new_elements = min(n_new_elements, page_size)
+
+    if page_size is None:
+        tree_items = list(parent_item.pending_children)
+        all_fetched = True
+    else:
+        n_items = page_size - n_new_elements
+        tree_items = list(islice(parent_item.pending_children, n_items))
+        all_fetched = len(tree_items) < n_items
+
+    if all_fetched:
+        parent_item.pending_children = None
+        parent_item.children_fetched = True
+    return n_new_elements, tree_items
+
+
+def add_fetched_children(parent_item, n_new_elements, tree_items):
+    """ Adds the rows that were returned by fetch_children to the parent_item.
+    """
+    if n_new_elements:
+        parent_item.sequence_children.length += n_new_elements
+    for tree_item in tree_items:
+        parent_item.append_child(tree_item)
+
+
+def iter_child_items(tree_item, hidden_flags=0):
+    """ Generator that creates the TreeItems of all children of the tree_item.
+
+        Unlike fetch_children, the TreeItems are not added to the tree_item so that they can
+        be garbage collected when the caller is done with them. Attributes with one of the
+        hidden_flags are skipped.
+    """
+    obj = tree_item.obj
+    sequence_path, offset = sequence_path_and_offset(tree_item)
+    for row in range(sequence_length(obj) or 0):
+        try:
+            element = obj[row]
+        except Exception as ex:
+            # Can happen if the sequence is modified while iterating.
+            logger.debug("Unable to get sequence element {}: {}".format(row, ex))
+            return
+        yield TreeItem(element, offset + row, element_path(sequence_path, offset + row), False)
+
+    for child_item in iter_object_children(obj, tree_item.obj_path, hidden_flags):
+        yield child_item
+
+
+def evaluate_column(attr_col, tree_item, max_len=None):
+    """ Returns the value of the AttributeModel column for the tree_item.
+
+        If max_len is given, the data function of a bounded column formats at most max_len 
+        characters. The value of other columns can be longer.
+
+        Raises TimeBudgetExceeded if the data function exceeds the time budget of the column and
+        checks it with check_time_budget. Exceptions of the data function are propagated.
+    """
+    if max_len is not None and attr_col.bounded:
+        args = (tree_item, max_len)
+    else:
+        args = (tree_item, )
+    return call_with_time_budget(attr_col.data_fn, args, attr_col.time_budget)
+
+
+def single_line(text, max_len):
+    """ Cuts off the text at max_len characters and replaces the line breaks with a glyph,
+        so that it fits in a table cell.
+    """
+    # Cut off before replacing so that only the visible part of the string is copied.
+    if len(text) > max_len:
+        text = text[:max_len - 3] + '...'
+    return (text.replace('\r\n', LINE_BREAK_GLYPH)
+                .replace('\n', LINE_BREAK_GLYPH)
+                .replace('\r', LINE_BREAK_GLYPH))
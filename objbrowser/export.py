@@ -0,0 +1,163 @@
+""" Module for exporting (part of) an object tree without a GUI.
+
+    The tree is walked depth-first with the same child providers as the TreeModel. The nodes
+    are written as soon as they are visited and their TreeItems are not kept, so the memory
+    usage depends on the depth of the export and the number of children of the objects on the
+    current path, not on the number of exported nodes. For example:
+
+        from objbrowser.export import export_tree
+        with open('modules.jsonl', 'w') as output_file:
+            export_tree(sys.modules, output_file, 'sys.modules', max_depth=2)
+
+    Does not import Qt.
+"""
+from __future__ import absolute_import
+
+import logging, json
+from collections import OrderedDict
+
+from objbrowser.treeitem import TreeItem, hidden_attribute_flags
+from objbrowser.engine import iter_child_items, evaluate_column, single_line
+from objbrowser.utils import TimeBudgetExceeded
+from objbrowser.attribute_model import (ALL_ATTR_MODELS, ATTR_MODEL_PATH, ATTR_MODEL_CLASS,
+                                        ATTR_MODEL_SUMMARY)
+
+logger = logging.getLogger(__name__)
+
+# Default maximum depth of the exported nodes. The inspected object has depth 0.
+DEFAULT_MAX_DEPTH = 3
+
+# Default maximum number of characters of an exported value.
+DEFAULT_MAX_VALUE_LEN = 1000
+
+# The columns that are exported by default.
+DEFAULT_EXPORT_COLS = (ATTR_MODEL_PATH, ATTR_MODEL_CLASS, ATTR_MODEL_SUMMARY)
+
+# The supported file formats: JSON Lines (one JSON object per node) and indented text.
+FILE_FORMATS = ('jsonl', 'text')
+
+
+def find_attr_models(names):
+    """ Returns the AttributeModels of ALL_ATTR_MODELS with the given names.
+
+        Raises ValueError if a name is unknown.
+    """
+    attr_models = {attr_model.name: attr_model for attr_model in ALL_ATTR_MODELS}
+    try:
+        return [attr_models[name] for name in names]
+    except KeyError as ex:
+        raise ValueError("Unknown column: {}. Choose from: {}"
+                         .format(ex, ", ".join(am.name for am in ALL_ATTR_MODELS)))
+
+
+def walk_tree(obj, obj_name='',
+              max_depth = DEFAULT_MAX_DEPTH,
+              max_nodes = None,
+              show_callable_attributes = True,
+              show_special_attributes = True):
+    """ Generator that visits the nodes of the object tree in depth-first order.
+
+        Yields (depth, tree_item) tuples. If the obj_name is given the inspected object itself is
+        the first node (with depth 0), otherwise the walk starts with its children, as in the
+        ObjectBrowser. The children of nodes at max_depth are not determined. At most max_nodes
+        nodes are visited, if max_nodes is None there is no limit.
+    """
+    assert max_nodes is None or max_nodes >= 0, "max_nodes must be >= 0. Got: {}".format(max_nodes)
+    root_item = TreeItem(obj, obj_name, obj_name, None)
+    hidden_flags = hidden_attribute_flags(show_callable_attributes, show_special_attributes)
+    n_nodes = 0
+    if obj_name:
+        if max_nodes == 0:
+            return
+        n_nodes += 1
+        yield 0, root_item
+
+    # Stack with an iterator over the remaining children of each ancestor.
+    stack = [(1, iter_child_items(root_item, hidden_flags))] if max_depth >= 1 else []
+    while stack:
+        depth, child_items = stack[-1]
+        try:
+            tree_item = next(child_items)
+        except StopIteration:
+            stack.pop()
+            continue
+        except Exception as ex:
+            # The children are determined by the inspected objects, which can fail.
+            logger.warning("Unable to determine the children at depth {}: {}".format(depth, ex))
+            stack.pop()
+            continue
+
+        if max_nodes is not None and n_nodes >= max_nodes:
+            return
+        n_nodes += 1
+        yield depth, tree_item
+
+        if depth < max_depth:
+            stack.append((depth + 1, iter_child_items(tree_item, hidden_flags)))
+
+
+def column_value(attr_col, tree_item, max_len=DEFAULT_MAX_VALUE_LEN):
+    """ Returns the value of a column for the tree_item, cut off at max_len characters.
+
+        Errors and timeouts are returned as text, like they are displayed in the table.
+    """
+    try:
+        value = evaluate_column(attr_col, tree_item, max_len)
+    except TimeBudgetExceeded:
+        return "**TIMEOUT**: took more than {:g} seconds".format(attr_col.time_budget)
+    except Exception as ex:
+        return "**ERROR**: {}".format(ex)
+
+    if value is not None and len(value) > max_len:
+        value = value[:max_len - 3] + '...'
+    return value
+
+
+def iter_records(obj, obj_name='',
+                 attr_cols = DEFAULT_EXPORT_COLS,
+                 max_len = DEFAULT_MAX_VALUE_LEN,
+                 **walk_kwargs):
+    """ Generator of the exported nodes as OrderedDicts with the depth and the column values.
+
+        The walk_kwargs are passed to walk_tree.
+    """
+    for depth, tree_item in walk_tree(obj, obj_name, **walk_kwargs):
+        record = OrderedDict([('depth', depth)])
+        for attr_col in attr_cols:
+            record[attr_col.name] = column_value(attr_col, tree_item, max_len)
+        yield record
+
+
+def export_tree(obj, output_file, obj_name='',
+                attr_cols = DEFAULT_EXPORT_COLS,
+                file_format = 'jsonl',
+                max_len = DEFAULT_MAX_VALUE_LEN,
+                **walk_kwargs):
+    """ Writes the nodes of the object tree to the output file. Returns the number of nodes.
+
+        :param obj: any Python object or variable
+        :param output_file: file-like object that the nodes are written to.
+        :param obj_name: name of the object. If empty, the object itself is not exported.
+        :param attr_cols: list of AttributeModels of the columns that are exported.
+        :param file_format: 'jsonl' writes a JSON object per node, 'text' writes a line per
+            node with the column values separated by ' | ', indented by depth.
+        :param max_len: maximum number of characters of the column values.
+        :param walk_kwargs: max_depth, max_nodes, show_callable_attributes and
+            show_special_attributes. See walk_tree.
+    """
+    assert file_format in FILE_FORMATS, \
+        "file_format must be one of {}. Got: {}".format(FILE_FORMATS, file_format)
+    first_depth = 0 if obj_name else 1
+    n_nodes = 0
+    for record in iter_records(obj, obj_name, attr_cols=attr_cols, max_len=max_len,
+                               **walk_kwargs):
+        if file_format == 'jsonl':
+            output_file.write(json.dumps(record, default=repr))
+        else:
+            indent = "    " * (record['depth'] - first_depth)
+            values = [single_line(record[attr_col.name] or '', max_len)
+                      for attr_col in attr_cols]
+            output_file.write(indent + " | ".join(values))
+        output_file.write('\n')
+        n_nodes += 1
+    return n_nodes
@@ -0,0 +1,106 @@
+""" Module that defines the NameIndex, a trigram index for searching tree items by name or path.
+"""
+from __future__ import absolute_import
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of characters of the substrings that are indexed.
+NGRAM_LEN = 3
+
+
+def trigrams(text):
+    """ Returns the set of substrings of NGRAM_LEN characters of the text.
+    """
+    return {text[pos:pos + NGRAM_LEN] for pos in range(len(text) - NGRAM_LEN + 1)}
+
+
+class NameIndex(object):
+    """ Index of the lowercase keys (e.g. the paths) of TreeItems.
+
+        Each key is split into trigrams, the index maps every trigram to the items with that
+        trigram in their key. The items that contain a text are then found by intersecting the
+        item sets of the trigrams of the text and checking only those items. This is much less
+        than all items, unless the text is shorter than a trigram.
+    """
+    def __init__(self):
+        self._keys = {}      # tree_item -> lowercase key
+        self._postings = {}  # trigram -> set of tree_items
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, tree_item):
+        return tree_item in self._keys
+
+    def key(self, tree_item):
+        """ Returns the key of an indexed item.
+        """
+        return self._keys[tree_item]
+
+    def add(self, tree_item, key):
+        """ Adds the item to the index with a key, which is converted to lowercase.
+        """
+        if tree_item in self._keys:
+            self.remove(tree_item)
+        key = key.lower()
+        self._keys[tree_item] = key
+        postings = self._postings
+        for trigram in trigrams(key):
+            items = postings.get(trigram)
+            if items is None:
+                postings[trigram] = {tree_item}
+            else:
+                items.add(tree_item)
+
+    def remove(self, tree_item):
+        """ Removes the item from the index. Does nothing if it isn't indexed.
+        """
+        key = self._keys.pop(tree_item, None)
+        if key is None:
+            return
+        for trigram in trigrams(key):
+            items = self._postings[trigram]
+            items.discard(tree_item)
+            if not items:
+                del self._postings[trigram]
+
+    def clear(self):
+        """ Removes all items.
+        """
+        self._keys.clear()
+        self._postings.clear()
+
+    def candidates(self, text):
+        """ Returns the items of which the key may contain the (lowercase) text.
+
+            Returns all items if the text is shorter than a trigram.
+        """
+        text_trigrams = trigrams(text)
+        if not text_trigrams:
+            return set(self._keys)
+        # Start with the rarest trigram so that the intersection stays small.
+        postings = sorted((self._postings.get(trigram, ()) for trigram in text_trigrams), key=len)
+        result = set(postings[0])
+        for items in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(items)
+        return result
+
+    def search(self, text, candidates=None, key_fn=None):
+        """ Returns the set of items of which the key contains the (lowercase) text.
+
+            If candidates is given, only those items are checked. This is used to narrow down
+            the previous search result when the user types more characters. If key_fn is given,
+            the text is searched in key_fn(item) instead of in the key. The result of key_fn
+            must be a substring of the key, so that the candidates include all matches.
+        """
+        if candidates is None:
+            candidates = self.candidates(text)
+        keys = self._keys
+        if key_fn is None:
+            return set(item for item in candidates if item in keys and text in keys[item])
+        else:
+            return set(item for item in candidates if item in keys and text in key_fn(item))
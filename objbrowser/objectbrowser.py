@@ -11,7 +11,8 @@
 
 from __future__ import absolute_import
 from __future__ import print_function
-import logging, traceback, hashlib, sys
+import logging, traceback, hashlib, sys, inspect, six
+from timeit import default_timer
 
 
 from objbrowser.qtpy import QtCore, QtGui, QtWidgets
@@ -20,13 +21,75 @@ from objbrowser.qtpy.QtCore import Slot
 from objbrowser.app import get_qapp, get_qsettings, start_qt_event_loop
 from objbrowser.version import PROGRAM_NAME, PROGRAM_VERSION, PROGRAM_URL, DEBUGGING
 from objbrowser.version import PYTHON_VERSION, QT_API_NAME, QT_API, QTPY_VERSION
-from objbrowser.utils import setting_str_to_bool
-from objbrowser.treemodel import TreeProxyModel, TreeModel
+from objbrowser.utils import (setting_str_to_bool, call_with_time_budget, iter_with_time_budget,
+                              TimeBudgetExceeded)
+from objbrowser import tracing
+from objbrowser.treemodel import TreeProxyModel, TreeModel, DEFAULT_FETCH_PAGE_SIZE
+from objbrowser.treemodel import PENDING_VALUE_TEXT, SORT_ROLE
+from objbrowser.treeitem import (hidden_attribute_flags, FLAG_CALLABLE_ATTRIBUTE, 
+                                 FLAG_SPECIAL_ATTRIBUTE)
+from objbrowser.cellcache import CellCache
+from objbrowser.workers import WorkerPool
+from objbrowser.refresh_scheduler import RefreshScheduler
+from objbrowser.textviewer import LazyTextViewer, FETCH_LINES, MAX_LINE_LEN
+from objbrowser.perfpanel import PerformancePanel
 from objbrowser.toggle_column_mixin import ToggleColumnTreeView
-from objbrowser.attribute_model import DEFAULT_ATTR_COLS, DEFAULT_ATTR_DETAILS
+from objbrowser.attribute_model import DEFAULT_ATTR_COLS, DEFAULT_ATTR_DETAILS, WRAP_ANYWHERE
 
 logger = logging.getLogger(__name__)
 
+# Number of milliseconds that the selection must be unchanged before the details are calculated.
+DETAILS_DELAY_MS = 100
+
+# Maximum number of seconds that the calculation of the details may take.
+DETAILS_TIME_BUDGET = 10.0
+
+# Number of characters of a details generator that are read in the background, enough for the
+# first lines that the LazyTextViewer shows. The rest is read when the user scrolls down.
+DETAILS_PREFETCH_LEN = FETCH_LINES * MAX_LINE_LEN
+
+# Maximum number of seconds that reading the next chunk of a details generator may take. These
+# chunks are read in the GUI thread.
+DETAILS_CHUNK_TIME_BUDGET = 0.5
+
+# Maximum number of details that are cached.
+MAX_CACHED_DETAILS = 200
+
+# Details that are longer than this number of characters are shown in the LazyTextViewer.
+MAX_PLAIN_TEXT_LEN = 100 * 1000
+
+# Number of milliseconds after the last keystroke in the filter box before the tree is filtered.
+FILTER_DELAY_MS = 150
+
+
+def evaluate_details(details_fn, tree_item):
+    """ Calls the details_fn in a worker thread. 
+    
+        If it returns a generator, its first DETAILS_PREFETCH_LEN characters are read here as
+        well. The result is then a string if the generator is exhausted, or otherwise a generator
+        that continues with the remaining chunks, each with DETAILS_CHUNK_TIME_BUDGET.
+    """
+    data = details_fn(tree_item)
+    if not inspect.isgenerator(data):
+        return data
+
+    parts = []
+    length = 0
+    for chunk in data:
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= DETAILS_PREFETCH_LEN:
+            return _iter_details(''.join(parts), data)
+    return ''.join(parts)
+
+
+def _iter_details(first_text, chunks):
+    """ Generates the first_text, which has been read in the background, and then the chunks.
+    """
+    yield first_text
+    for chunk in iter_with_time_budget(chunks, DETAILS_CHUNK_TIME_BUDGET):
+        yield chunk
+
 
 # The main window inherits from a Qt class, therefore it has many 
 # ancestors public methods and attributes.
@@ -50,6 +113,8 @@ class ObjectBrowser(QtWidgets.QMainWindow):
                  show_special_attributes = None,  # None uses value from QSettings
                  auto_refresh=None,  # None uses value from QSettings
                  refresh_rate=None,  # None uses value from QSettings
+                 fetch_page_size = DEFAULT_FETCH_PAGE_SIZE,
+                 filter_in_source_model = False,
                  reset = False):
         """ Constructor
         
@@ -65,7 +130,15 @@ class ObjectBrowser(QtWidgets.QMainWindow):
                 the object name starts and ends with two underscores, are displayed. Otherwise 
                 they are hidden.
             :param auto_refresh: If True, the contents refershes itsef every <refresh_rate> seconds.
-            :param refresh_rate: number of seconds between automatic refreshes. Default = 2 .
+            :param refresh_rate: minimum number of seconds between automatic refreshes. Default = 2.
+                The interval is increased when refreshing takes long.
+            :param fetch_page_size: maximum number of children that are added when a node is
+                expanded. More children are added when scrolling down. If None, all children
+                are added at once.
+            :param filter_in_source_model: if True the hidden callable and special attributes
+                are left out of the tree model, instead of being filtered out by the proxy
+                model. This saves memory when most attributes are hidden, but toggling the 
+                filters then refreshes the expanded nodes.
             :param reset: If true the persistent settings, such as column widths, are reset. 
         """
         super(ObjectBrowser, self).__init__()
@@ -83,14 +156,19 @@ class ObjectBrowser(QtWidgets.QMainWindow):
                                     show_callable_attributes= show_callable_attributes,
                                     show_special_attributes = show_special_attributes)
 
-        self._tree_model = TreeModel(obj, name, attr_cols = self._attr_cols)
-            
+        self._filter_in_source_model = filter_in_source_model
+        hidden_flags = hidden_attribute_flags(show_callable_attributes, show_special_attributes)
+        self._tree_model = TreeModel(obj, name, attr_cols = self._attr_cols,
+                                     fetch_page_size = fetch_page_size,
+                                     hidden_flags = hidden_flags if filter_in_source_model else 0)
+
+        # The proxy model shows all attributes if they are filtered by the source model.
         self._proxy_tree_model = TreeProxyModel(
-            show_callable_attributes= show_callable_attributes,
-            show_special_attributes = show_special_attributes)
+            show_callable_attributes= show_callable_attributes or filter_in_source_model,
+            show_special_attributes = show_special_attributes or filter_in_source_model)
         
         self._proxy_tree_model.setSourceModel(self._tree_model)
-        #self._proxy_tree_model.setSortRole(RegistryTableModel.SORT_ROLE)
+        self._proxy_tree_model.setSortRole(SORT_ROLE)
         self._proxy_tree_model.setDynamicSortFilter(True) 
         #self._proxy_tree_model.setSortCaseSensitivity(Qt.CaseInsensitive)
                 
@@ -101,11 +179,18 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         self.setWindowTitle("{} - {}".format(PROGRAM_NAME, name))
 
         self._readViewSettings(reset = reset)
+        
+        # Sorts by the sort indicator of the restored header state. By default the sort 
+        # indicator is not shown and the rows are in the order of the child providers.
+        self.obj_tree.setSortingEnabled(True)
 
         assert self._refresh_rate > 0, "refresh_rate must be > 0. Got: {}".format(self._refresh_rate)
-        self._refresh_timer = QtCore.QTimer(self)
-        self._refresh_timer.setInterval(self._refresh_rate * 1000)
-        self._refresh_timer.timeout.connect(self.refresh)
+        self._refresh_scheduler = RefreshScheduler(self._refresh_rate, parent=self)
+        self._refresh_scheduler.refreshDue.connect(self.refresh)
+        self._refresh_scheduler.intervalChanged.connect(self._show_refresh_rate)
+        self._refresh_scheduler.setPaused('hidden', not self.isVisible())
+        self.obj_tree.verticalScrollBar().valueChanged.connect(self._refresh_scheduler.userScrolled)
+        self._tree_model.refreshFinished.connect(self._on_refresh_finished)
         
         # Update views with model
         self.toggle_special_attribute_action.setChecked(show_special_attributes)
@@ -121,9 +206,30 @@ class ObjectBrowser(QtWidgets.QMainWindow):
 
     def refresh(self):
         """ Refreshes object brawser contents
+        
+            The children are determined in a background thread. If a refresh is already running,
+            another refresh is done when it is finished.
         """
         logger.debug("Refreshing")
-        self._tree_model.refreshTree()
+        self._tree_model.requestRefresh()
+        
+        
+    def _on_refresh_finished(self, duration):
+        """ Updates the visible cells and the details pane after the tree has been refreshed.
+            Schedules the next automatic refresh.
+        """
+        self._refresh_scheduler.refreshFinished(duration)
+        
+        # Only the cells that have changed are repainted (and highlighted).
+        self._tree_model.updateChangedCells(
+            [self._proxy_tree_model.mapToSource(index) for index in self._visible_indices()])
+        
+        # The underlying objects may have changed
+        self._details_cache.clear()
+        if self._details_key is not None:
+            self._details_pool.cancel(self._details_key)
+            self._details_key = None 
+        self._change_details_field()
         
         
     def _add_instance(self):
@@ -166,19 +272,19 @@ class ObjectBrowser(QtWidgets.QMainWindow):
             QtWidgets.QAction("Show callable attributes", self, checkable=True,
                           shortcut = QtGui.QKeySequence("Alt+C"),
                           statusTip = "Shows/hides attributes that are callable (functions, methods, etc)")
-        self.toggle_callable_action.toggled.connect(self._proxy_tree_model.setShowCallables)
+        self.toggle_callable_action.toggled.connect(self.show_callable_attributes)
                               
         # Show/hide special attributes
         self.toggle_special_attribute_action = \
             QtWidgets.QAction("Show __special__ attributes", self, checkable=True,
                           shortcut = QtGui.QKeySequence("Alt+S"),
                           statusTip = "Shows or hides __special__ attributes")
-        self.toggle_special_attribute_action.toggled.connect(self._proxy_tree_model.setShowSpecialAttributes)
+        self.toggle_special_attribute_action.toggled.connect(self.show_special_attributes)
 
         # Toggle auto-refresh on/off
         self.toggle_auto_refresh_action = \
             QtWidgets.QAction("Auto-refresh", self, checkable=True,
-                          statusTip = "Auto refresh every {} seconds".format(self._refresh_rate))
+                          statusTip = "Auto refresh at most every {} seconds".format(self._refresh_rate))
         self.toggle_auto_refresh_action.toggled.connect(self.toggle_auto_refresh)
                               
         # Add another refresh action with a different short cut. An action must be added to
@@ -188,6 +294,18 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         self.refresh_action_f5.triggered.connect(self.refresh)
         self.addAction(self.refresh_action_f5) 
         
+        # Recalculate the cells that exceeded the time budget of their column
+        self.retry_timed_out_action = \
+            QtWidgets.QAction("Retry timed-out cells", self,
+                          statusTip = "Calculates the cells that took too long again")
+        self.retry_timed_out_action.triggered.connect(self.retry_timed_out_cells)
+        
+        # Move the focus to the filter box
+        self.find_action = QtWidgets.QAction("&Filter by name...", self,
+                                             shortcut = QtGui.QKeySequence.Find,
+                                             statusTip = "Filters the tree by name or path")
+        self.find_action.triggered.connect(self.focus_name_filter)
+        
                               
     def _setup_menu(self):
         """ Sets up the main menu.
@@ -198,16 +316,20 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         if DEBUGGING is True:
             file_menu.addSeparator()
             file_menu.addAction("&Test", self.my_test, "Ctrl+T")
+            file_menu.addAction("&Dump Trace...", self.dump_trace)
         
         view_menu = self.menuBar().addMenu("&View")
+        self.view_menu = view_menu
         view_menu.addAction("&Refresh", self.refresh, "Ctrl+R")
         view_menu.addAction(self.toggle_auto_refresh_action)
+        view_menu.addAction(self.retry_timed_out_action)
         
         view_menu.addSeparator()
         self.show_cols_submenu = view_menu.addMenu("Table columns")
         view_menu.addSeparator()
         view_menu.addAction(self.toggle_callable_action)
         view_menu.addAction(self.toggle_special_attribute_action)
+        view_menu.addAction(self.find_action)
         
         self.menuBar().addSeparator()
         help_menu = self.menuBar().addMenu("&Help")
@@ -234,10 +356,29 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         obj_tree_header = self.obj_tree.header()
         obj_tree_header.setSectionsMovable(True)
         obj_tree_header.setStretchLastSection(False)
+        obj_tree_header.setSortIndicator(-1, QtCore.Qt.AscendingOrder) # Unsorted
         for action in self.obj_tree.toggle_column_actions_group.actions():
             self.show_cols_submenu.addAction(action)
 
-        self.central_splitter.addWidget(self.obj_tree)
+        # Filter box above the tree. The filter is applied when the user stops typing.
+        self.name_filter_edit = QtWidgets.QLineEdit()
+        self.name_filter_edit.setPlaceholderText(
+            "Filter by name (by path if the text contains '.' or '[')")
+        if hasattr(self.name_filter_edit, 'setClearButtonEnabled'): # Qt 5 only
+            self.name_filter_edit.setClearButtonEnabled(True)
+        self._name_filter_timer = QtCore.QTimer(self)
+        self._name_filter_timer.setSingleShot(True)
+        self._name_filter_timer.setInterval(FILTER_DELAY_MS)
+        self._name_filter_timer.timeout.connect(self._apply_name_filter)
+        self.name_filter_edit.textChanged.connect(self._on_name_filter_edited)
+        
+        tree_pane_widget = QtWidgets.QWidget()
+        tree_layout = QtWidgets.QVBoxLayout(tree_pane_widget)
+        tree_layout.setSpacing(2)
+        tree_layout.setContentsMargins(0, 0, 0, 0) # left top right bottom
+        tree_layout.addWidget(self.name_filter_edit)
+        tree_layout.addWidget(self.obj_tree)
+        self.central_splitter.addWidget(tree_pane_widget)
 
         # Bottom pane
         bottom_pane_widget = QtWidgets.QWidget()
@@ -281,7 +422,48 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         self.editor = QtWidgets.QPlainTextEdit()
         self.editor.setReadOnly(True)
         self.editor.setFont(font)
-        group_layout.addWidget(self.editor)
+        
+        # Large details and generators are shown in a viewer that only lays out the visible text.
+        self.text_viewer = LazyTextViewer()
+        self.text_viewer.setFont(font)
+        
+        self.details_stack = QtWidgets.QStackedWidget()
+        self.details_stack.addWidget(self.editor)
+        self.details_stack.addWidget(self.text_viewer)
+        group_layout.addWidget(self.details_stack)
+        
+        # The details are calculated in the background after the selection has been unchanged
+        # for DETAILS_DELAY_MS. They are cached per tree item and details field. 
+        self._details_cache = CellCache(max_cells=MAX_CACHED_DETAILS)
+        self._details_pool = WorkerPool(parent=self)
+        self._details_pool.jobFinished.connect(self._show_calculated_details)
+        self._details_key = None # The (tree_item, button_id) that should be displayed
+        self._details_timer = QtCore.QTimer(self)
+        self._details_timer.setSingleShot(True)
+        self._details_timer.setInterval(DETAILS_DELAY_MS)
+        self._details_timer.timeout.connect(self._calculate_details)
+        
+        # Stall indicator that shows the cells that exceeded their time budget
+        self.stall_label = QtWidgets.QLabel()
+        self.stall_label.setStyleSheet("color: red;")
+        self.stall_label.hide()
+        self.statusBar().addPermanentWidget(self.stall_label)
+        self._tree_model.cellTimedOut.connect(self._show_stalled_cell)
+        
+        # Dock with the performance statistics, hidden by default
+        self.perf_panel = PerformancePanel(self._tree_model, details_cache=self._details_cache)
+        self.perf_dock = QtWidgets.QDockWidget("Performance", self)
+        self.perf_dock.setObjectName("performance_dock")
+        self.perf_dock.setWidget(self.perf_panel)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.perf_dock)
+        self.perf_dock.hide()
+        self.view_menu.addSeparator()
+        self.view_menu.addAction(self.perf_dock.toggleViewAction())
+        
+        # Shows the interval between automatic refreshes, which depends on the refresh duration.
+        self.refresh_rate_label = QtWidgets.QLabel()
+        self.refresh_rate_label.hide()
+        self.statusBar().addPermanentWidget(self.refresh_rate_label)
         
         # Splitter parameters
         self.central_splitter.setCollapsible(0, False)
@@ -296,6 +478,18 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         selection_model = self.obj_tree.selectionModel() 
         selection_model.currentChanged.connect(self._update_details)
 
+        # Collapsed nodes are not refreshed, they are refreshed when they are expanded again.
+        self.obj_tree.expanded.connect(self._on_item_expanded)
+        self.obj_tree.collapsed.connect(self._on_item_collapsed)
+
+        # Fetch the next page of children when the last fetched child of a node scrolls into view.
+        self.obj_tree.verticalScrollBar().valueChanged.connect(self._fetch_more_if_visible)
+        self.obj_tree.expanded.connect(self._fetch_more_if_visible)
+
+        # Cancel the queued calculations of expensive cells that are no longer visible.
+        self.obj_tree.verticalScrollBar().valueChanged.connect(self._cancel_hidden_cells)
+        self.obj_tree.collapsed.connect(self._cancel_hidden_cells)
+
     # End of setup_methods
     
     
@@ -383,13 +577,13 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         logger.debug("writing refresh_rate: {!r}".format(self._refresh_rate))
         settings.setValue("refresh_rate", self._refresh_rate)
 
-        logger.debug("writing show_callable_attributes: {!r}"
-                     .format(self._proxy_tree_model.getShowCallables()))
-        settings.setValue("show_callable_attributes", self._proxy_tree_model.getShowCallables())
+        show_callable_attributes = self.toggle_callable_action.isChecked()
+        logger.debug("writing show_callable_attributes: {!r}".format(show_callable_attributes))
+        settings.setValue("show_callable_attributes", show_callable_attributes)
 
-        logger.debug("writing show_special_attributes: {!r}"
-                     .format(self._proxy_tree_model.getShowSpecialAttributes()))
-        settings.setValue("show_special_attributes", self._proxy_tree_model.getShowSpecialAttributes())
+        show_special_attributes = self.toggle_special_attribute_action.isChecked()
+        logger.debug("writing show_special_attributes: {!r}".format(show_special_attributes))
+        settings.setValue("show_special_attributes", show_special_attributes)
         
         settings.endGroup()
         
@@ -459,10 +653,105 @@ class ObjectBrowser(QtWidgets.QMainWindow):
     @Slot(QtCore.QModelIndex, QtCore.QModelIndex)
     def _update_details(self, current_index, _previous_index):
         """ Shows the object details in the editor given an index.
+        
+            Unless they are cached, the details are calculated when the selection hasn't changed
+            for DETAILS_DELAY_MS milliseconds so that navigating quickly through the tree doesn't
+            calculate the details of every row that is passed.
         """
         tree_item = self._proxy_tree_model.treeItem(current_index)
-        self._update_details_for_item(tree_item)
+        self._update_details_for_item(tree_item, delay=True)
+
+        
+    def _fetch_more_if_visible(self, *_args):
+        """ Fetches the next page of children for the nodes of which the last child is visible.
+        
+            The QTreeView only fetches more children of the last node in the tree when the 
+            scroll bar reaches its maximum. This method also fetches the next page of nodes that
+            are followed by other rows.
+        """
+        parent_indices = []
+        for index in self._visible_indices():
+            parent_index = index.parent()
+            if (index.row() == self._proxy_tree_model.rowCount(parent_index) - 1 and
+                    self._proxy_tree_model.canFetchMore(parent_index)):
+                parent_indices.append(QtCore.QPersistentModelIndex(parent_index))
 
+        # Fetch after iterating; inserting rows invalidates the layout of the rows below.
+        for parent_index in parent_indices:
+            self._proxy_tree_model.fetchMore(QtCore.QModelIndex(parent_index))
+        
+        
+    def _visible_indices(self):
+        """ Returns the (proxy) indices of the first column of the rows that are visible.
+        """
+        viewport_height = self.obj_tree.viewport().height()
+        indices = []
+        index = self.obj_tree.indexAt(QtCore.QPoint(0, 0))
+        while index.isValid():
+            if self.obj_tree.visualRect(index).top() >= viewport_height:
+                break
+            indices.append(index)
+            index = self.obj_tree.indexBelow(index)
+        return indices
+        
+        
+    def _cancel_hidden_cells(self, *_args):
+        """ Cancels the queued calculations of expensive cells.
+        
+            The cells that are still visible are requested again when the viewport is repainted.
+        """
+        self._tree_model.cancelQueuedCells()
+        self.obj_tree.viewport().update()
+        
+        
+    def _on_item_expanded(self, proxy_index):
+        """ Refreshes the children of the expanded node if they are stale.
+        """
+        source_index = self._proxy_tree_model.mapToSource(proxy_index)
+        self._tree_model.setItemExpanded(source_index, True)
+        
+        
+    def _on_item_collapsed(self, proxy_index):
+        """ Marks the node as collapsed so that it isn't refreshed.
+        """
+        source_index = self._proxy_tree_model.mapToSource(proxy_index)
+        self._tree_model.setItemExpanded(source_index, False)
+        
+        
+    def _show_stalled_cell(self, obj_path, column_name, duration):
+        """ Shows the cell that exceeded its time budget in the stall indicator.
+        """
+        n_timed_out = len(self._tree_model.timedOutCells)
+        self.stall_label.setText("{} timed-out cell{}, last: {} [{}] {:.2f} sec"
+                                 .format(n_timed_out, "" if n_timed_out == 1 else "s", 
+                                         obj_path, column_name, duration))
+        self.stall_label.show()
+
+
+    def _show_refresh_rate(self, interval):
+        """ Shows the interval between automatic refreshes in the status bar.
+        
+            An interval of 0 means that auto-refresh is paused or off.
+        """
+        if not self._auto_refresh:
+            self.refresh_rate_label.hide()
+            return
+        
+        if interval > 0:
+            self.refresh_rate_label.setText("Auto-refresh every {:.1f} sec".format(interval))
+        else:
+            self.refresh_rate_label.setText("Auto-refresh paused")
+        self.refresh_rate_label.show()
+        
+        
+    def retry_timed_out_cells(self):
+        """ Calculates the cells that exceeded their time budget again.
+        """
+        logger.info("Retrying {} timed-out cells".format(len(self._tree_model.timedOutCells)))
+        self._tree_model.retryTimedOutCells()
+        self.stall_label.hide()
+        self.obj_tree.viewport().update()
+        
         
     def _change_details_field(self, _button_id=None):
         """ Changes the field that is displayed in the details pane
@@ -473,35 +762,208 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         self._update_details_for_item(tree_item)
         
             
-    def _update_details_for_item(self, tree_item):
+    def _update_details_for_item(self, tree_item, delay=False):
         """ Shows the object details in the editor given an tree_item
+        
+            Cached details are shown immediately. Otherwise the calculation of the details that
+            were requested before is cancelled and the new details are calculated in the 
+            background, optionally after a delay.
+        """
+        button_id = self.button_group.checkedId()
+        assert button_id >= 0, "No radio button selected. Please report this bug."
+        key = (tree_item, button_id)
+        if key == self._details_key:
+            return
+
+        if self._details_key is not None:
+            self._details_pool.cancel(self._details_key)
+        self._details_timer.stop()
+        self._details_key = key
+
+        data = self._details_cache.get(tree_item, button_id)
+        if data is not None:
+            self._show_details(data, self._attr_details[button_id].line_wrap)
+            return
+
+        self._show_editor_text(PENDING_VALUE_TEXT, "gray")
+        if delay:
+            self._details_timer.start()
+        else:
+            self._calculate_details()
+
+
+    def _calculate_details(self):
+        """ Starts the calculation of the requested details in the background.
+        """
+        tree_item, button_id = self._details_key
+        attr_details = self._attr_details[button_id]
+        details_fn = attr_details.details_fn or attr_details.data_fn
+        self._details_pool.submit(self._details_key, call_with_time_budget, evaluate_details,
+                                  (details_fn, tree_item), DETAILS_TIME_BUDGET)
+        
+
+    def _show_calculated_details(self, job):
+        """ Shows the details that were calculated in the background and caches them.
+        """
+        if job.key != self._details_key:
+            return # Outdated
+
+        tree_item, button_id = job.key
+        if job.exception is None:
+            data = job.result
+            if isinstance(data, six.string_types):
+                self._details_cache.put(tree_item, button_id, data)
+            self._show_details(data, self._attr_details[button_id].line_wrap)
+        elif isinstance(job.exception, TimeBudgetExceeded):
+            self._show_details_timeout(job.exception, button_id)
+        else:
+            self._show_details_error(job.exception, job.stack_trace)
+
+
+    def _show_details_timeout(self, ex, button_id):
+        """ Shows that the calculation of the details exceeded the time budget. 
+        
+            The details are calculated again when the button is clicked again. Calculations
+            that keep their intermediate results, such as the array statistics, then continue
+            where they stopped.
+        """
+        self._details_key = None
+        self._show_editor_text("<{}>\n\nClick the '{}' button again to continue the calculation."
+                               .format(ex, self._attr_details[button_id].name), "gray", 
+                               WRAP_ANYWHERE)
+
+
+    def _show_details(self, data, line_wrap):
+        """ Shows the details in the editor. 
+        
+            Generators and long strings are shown in the LazyTextViewer, which doesn't wrap lines.
         """
-        self.editor.setStyleSheet("color: black;")
         try:
-            #obj = tree_item.obj
-            button_id = self.button_group.checkedId()
-            assert button_id >= 0, "No radio button selected. Please report this bug."
-            attr_details = self._attr_details[button_id]
-            data = attr_details.data_fn(tree_item)
-            self.editor.setPlainText(data)
-            self.editor.setWordWrapMode(attr_details.line_wrap)
-            
+            if inspect.isgenerator(data) or (isinstance(data, six.string_types) and 
+                                             len(data) > MAX_PLAIN_TEXT_LEN):
+                self.text_viewer.setText(data)
+                self.editor.clear()
+                self.details_stack.setCurrentWidget(self.text_viewer)
+            else:
+                self._show_editor_text(data, "black", line_wrap)
         except Exception as ex:
-            self.editor.setStyleSheet("color: red;")
-            stack_trace = traceback.format_exc()
-            self.editor.setPlainText("{}\n\n{}".format(ex, stack_trace))
-            self.editor.setWordWrapMode(QtWidgets.QTextOption.WrapAtWordBoundaryOrAnywhere)
+            self._show_details_error(ex, traceback.format_exc())
+            
+
+    def _show_details_error(self, ex, stack_trace):
+        """ Shows an exception that occurred while calculating the details in the editor.
+        """
+        self._show_editor_text("{}\n\n{}".format(ex, stack_trace), "red", WRAP_ANYWHERE)
+
+
+    def _show_editor_text(self, text, color, line_wrap=None):
+        """ Shows the text in the QPlainTextEdit of the details pane.
+        """
+        self.editor.setStyleSheet("color: {};".format(color))
+        self.editor.setPlainText(text)
+        if line_wrap is not None:
+            # The attribute models define the wrap mode as an int so that they don't need Qt.
+            self.editor.setWordWrapMode(QtGui.QTextOption.WrapMode(line_wrap))
+        self.text_viewer.clear()
+        self.details_stack.setCurrentWidget(self.editor)
+
+    def focus_name_filter(self):
+        """ Moves the keyboard focus to the filter box and selects its text.
+        """
+        self.name_filter_edit.setFocus()
+        self.name_filter_edit.selectAll()
+        
+        
+    def _on_name_filter_edited(self, _text):
+        """ (Re)starts the timer that applies the filter.
+        """
+        self._name_filter_timer.start()
+        
+        
+    def _apply_name_filter(self):
+        """ Filters the tree with the text of the filter box.
+        """
+        text = self.name_filter_edit.text()
+        start_time = default_timer()
+        n_matches = self._proxy_tree_model.setNameFilter(text)
+        if text.strip():
+            self.statusBar().showMessage("{} matching nodes ({:.0f} ms)".format(
+                n_matches, (default_timer() - start_time) * 1000))
+        else:
+            self.statusBar().clearMessage()
+        self._fetch_more_if_visible()
+        
+
+    def show_callable_attributes(self, checked):
+        """ Shows/hides the callable attributes.
+        """
+        if self._filter_in_source_model:
+            self._set_attributes_hidden(FLAG_CALLABLE_ATTRIBUTE, not checked)
+        else:
+            self._proxy_tree_model.setShowCallables(checked)
+
+
+    def show_special_attributes(self, checked):
+        """ Shows/hides the __special__ attributes.
+        """
+        if self._filter_in_source_model:
+            self._set_attributes_hidden(FLAG_SPECIAL_ATTRIBUTE, not checked)
+        else:
+            self._proxy_tree_model.setShowSpecialAttributes(checked)
+
+
+    def _set_attributes_hidden(self, flag, hidden):
+        """ Leaves the attributes with the treeitem flag out of the tree model if hidden is True.
+            Adds them again otherwise.
+        """
+        hidden_flags = self._tree_model.getHiddenFlags()
+        hidden_flags = hidden_flags | flag if hidden else hidden_flags & ~flag
+        self._tree_model.setHiddenFlags(hidden_flags)
+        self._fetch_more_if_visible()
+
 
     def toggle_auto_refresh(self, checked):
         """ Toggles auto-refresh on/off.
         """
+        self._auto_refresh = checked        
         if checked:
             logger.info("Auto-refresh on. Rate {:g} seconds".format(self._refresh_rate))
-            self._refresh_timer.start()
+            self._refresh_scheduler.start()
         else:
             logger.info("Auto-refresh off")
-            self._refresh_timer.stop()
-        self._auto_refresh = checked        
+            self._refresh_scheduler.stop()
+
+
+    def showEvent(self, event):
+        """ Resumes auto-refresh when the window is shown.
+        """
+        super(ObjectBrowser, self).showEvent(event)
+        self._refresh_scheduler.setPaused('hidden', False)
+        
+        
+    def hideEvent(self, event):
+        """ Pauses auto-refresh while the window is hidden.
+        """
+        super(ObjectBrowser, self).hideEvent(event)
+        self._refresh_scheduler.setPaused('hidden', True)
+        
+        
+    def changeEvent(self, event):
+        """ Pauses auto-refresh while the window is minimized.
+        """
+        super(ObjectBrowser, self).changeEvent(event)
+        if event.type() == QtCore.QEvent.WindowStateChange:
+            self._refresh_scheduler.setPaused('minimized', self.isMinimized())
+
+
+    def dump_trace(self):
+        """ Asks for a file name and writes the recorded trace events to it.
+        """
+        result = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Dump Trace", "objbrowser_trace.jsonl", "JSON lines (*.jsonl);;All files (*)")
+        file_name = result[0] if isinstance(result, tuple) else result # PyQt4 returns a string
+        if file_name:
+            tracing.dump(file_name)
 
 
     def my_test(self):
@@ -522,15 +984,37 @@ class ObjectBrowser(QtWidgets.QMainWindow):
         """ Cleans up resources when this window is closed.
             Disconnects all signals for this window.
         """
-        self._refresh_timer.stop()
-        self._refresh_timer.timeout.disconnect(self.refresh)
-        self.toggle_callable_action.toggled.disconnect(self._proxy_tree_model.setShowCallables)
-        self.toggle_special_attribute_action.toggled.disconnect(self._proxy_tree_model.setShowSpecialAttributes)        
+        self._refresh_scheduler.stop()
+        self._refresh_scheduler.refreshDue.disconnect(self.refresh)
+        self._refresh_scheduler.intervalChanged.disconnect(self._show_refresh_rate)
+        self.obj_tree.verticalScrollBar().valueChanged.disconnect(
+            self._refresh_scheduler.userScrolled)
+        self._tree_model.refreshFinished.disconnect(self._on_refresh_finished)
+        self.toggle_callable_action.toggled.disconnect(self.show_callable_attributes)
+        self.toggle_special_attribute_action.toggled.disconnect(self.show_special_attributes)
         self.toggle_auto_refresh_action.toggled.disconnect(self.toggle_auto_refresh)
         self.refresh_action_f5.triggered.disconnect(self.refresh)
+        self.retry_timed_out_action.triggered.disconnect(self.retry_timed_out_cells)
+        self.find_action.triggered.disconnect(self.focus_name_filter)
+        self._name_filter_timer.stop()
+        self._name_filter_timer.timeout.disconnect(self._apply_name_filter)
+        self.name_filter_edit.textChanged.disconnect(self._on_name_filter_edited)
+        self._tree_model.cellTimedOut.disconnect(self._show_stalled_cell)
         self.button_group.buttonClicked[int].disconnect(self._change_details_field)
         selection_model = self.obj_tree.selectionModel() 
         selection_model.currentChanged.disconnect(self._update_details)
+        self.obj_tree.verticalScrollBar().valueChanged.disconnect(self._fetch_more_if_visible)
+        self.obj_tree.expanded.disconnect(self._fetch_more_if_visible)
+        self.obj_tree.verticalScrollBar().valueChanged.disconnect(self._cancel_hidden_cells)
+        self.obj_tree.collapsed.disconnect(self._cancel_hidden_cells)
+        self.obj_tree.expanded.disconnect(self._on_item_expanded)
+        self.obj_tree.collapsed.disconnect(self._on_item_collapsed)
+        self._tree_model.stopWorkers()
+        self._details_timer.stop()
+        self._details_timer.timeout.disconnect(self._calculate_details)
+        self._details_pool.jobFinished.disconnect(self._show_calculated_details)
+        self._details_pool.stop()
+        self.perf_panel.stop()
         
         
     def closeEvent(self, event):
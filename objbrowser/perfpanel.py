@@ -0,0 +1,192 @@
+""" Module that defines the PerformancePanel
+"""
+from __future__ import absolute_import
+
+import json, logging
+
+from objbrowser.qtpy import QtCore, QtWidgets
+
+logger = logging.getLogger(__name__)
+
+# Number of milliseconds between updates of the statistics while the panel is visible.
+UPDATE_INTERVAL_MS = 1000
+
+# Titles of the categories of the PerformanceStats of the TreeModel.
+CATEGORY_TITLES = [('cell', "Data functions per column"),
+                   ('fetch', "Fetching children"),
+                   ('refresh', "Refreshing")]
+
+
+def _format_ms(seconds):
+    """ Formats a duration in seconds as milliseconds.
+    """
+    return "" if seconds is None else "{:.2f}".format(seconds * 1000)
+
+
+def _cache_report(cell_cache):
+    """ Returns a dictionary with the usage and hit rate of a CellCache.
+    """
+    return {'hits': cell_cache.hits,
+            'misses': cell_cache.misses,
+            'hit_rate': cell_cache.hit_rate,
+            'n_cells': cell_cache.n_cells,
+            'n_chars': cell_cache.n_chars}
+
+
+# Keep the method names camelCase since it inherits from a Qt object.
+# pylint: disable=C0103
+
+class PerformancePanel(QtWidgets.QWidget):
+    """ Shows the performance statistics of a TreeModel.
+
+        Shows the number of calls, the cumulative, mean, 95th percentile and maximum duration of
+        the data function of each column and of fetching and refreshing. Also shows the number
+        of TreeItems, their approximate memory and the hit rate of the caches. The statistics are
+        updated every UPDATE_INTERVAL_MS milliseconds while the panel is visible. They can be
+        exported as JSON.
+
+        Counting the TreeItems walks the whole tree, so they are only counted when the panel 
+        is shown, when the 'Count Tree Items' button is clicked and when exporting.
+    """
+    def __init__(self, tree_model, details_cache=None, parent=None):
+        """ Constructor
+
+            :param tree_model: the TreeModel of which the statistics are shown.
+            :param details_cache: the CellCache of the details pane (optional).
+            :param parent: the parent widget
+        """
+        super(PerformancePanel, self).__init__(parent)
+        self._tree_model = tree_model
+        self._details_cache = details_cache
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.stats_tree = QtWidgets.QTreeWidget()
+        self.stats_tree.setHeaderLabels(["Operation", "Calls", "Total (ms)", "Mean (ms)",
+                                         "p95 (ms)", "Max (ms)"])
+        self.stats_tree.setRootIsDecorated(False)
+        self.stats_tree.setUniformRowHeights(True)
+        layout.addWidget(self.stats_tree)
+
+        self.memory_label = QtWidgets.QLabel("Tree items: not counted")
+        layout.addWidget(self.memory_label)
+        self.cache_label = QtWidgets.QLabel()
+        layout.addWidget(self.cache_label)
+
+        button_layout = QtWidgets.QHBoxLayout()
+        layout.addLayout(button_layout)
+        self.reset_button = QtWidgets.QPushButton("Reset")
+        self.reset_button.clicked.connect(self.resetStats)
+        button_layout.addWidget(self.reset_button)
+        self.export_button = QtWidgets.QPushButton("Export JSON...")
+        self.export_button.clicked.connect(self.exportJson)
+        button_layout.addWidget(self.export_button)
+        self.count_button = QtWidgets.QPushButton("Count Tree Items")
+        self.count_button.clicked.connect(self.updateTreeItemStats)
+        button_layout.addWidget(self.count_button)
+        button_layout.addStretch()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(UPDATE_INTERVAL_MS)
+        self._timer.timeout.connect(self.updateStats)
+
+
+    def report(self, count_tree_items=True):
+        """ Returns a dictionary with all statistics. The durations are in seconds.
+
+            The 'tree_items' are left out if count_tree_items is False, since counting them 
+            walks the whole tree.
+        """
+        caches = {'cells': _cache_report(self._tree_model.cellCache)}
+        if self._details_cache is not None:
+            caches['details'] = _cache_report(self._details_cache)
+
+        result = {'operations': self._tree_model.performanceStats.as_dict(),
+                  'caches': caches}
+        if count_tree_items:
+            n_items, n_bytes = self._tree_model.treeItemStats()
+            result['tree_items'] = {'count': n_items, 'approx_bytes': n_bytes}
+        return result
+
+
+    def updateStats(self):
+        """ Shows the current statistics, except for the number of tree items.
+        """
+        report = self.report(count_tree_items=False)
+        self.stats_tree.clear()
+        for category, title in CATEGORY_TITLES:
+            operations = report['operations'].get(category, {})
+            category_item = QtWidgets.QTreeWidgetItem(self.stats_tree, [title])
+            category_item.setFirstColumnSpanned(True)
+            # The most expensive operations first.
+            for name, stats in sorted(operations.items(), key=lambda kv: -kv[1]['total']):
+                QtWidgets.QTreeWidgetItem(category_item, [
+                    name, str(stats['count']), _format_ms(stats['total']),
+                    _format_ms(stats['mean']), _format_ms(stats['p95']),
+                    _format_ms(stats['max'])])
+        self.stats_tree.expandAll()
+
+        cache_texts = []
+        for name, cache in sorted(report['caches'].items()):
+            hit_rate = cache['hit_rate']
+            cache_texts.append("{} cache: {:,} cells, {} hits".format(
+                name.capitalize(), cache['n_cells'],
+                "-" if hit_rate is None else "{:.1%}".format(hit_rate)))
+        self.cache_label.setText(";  ".join(cache_texts))
+
+
+    def updateTreeItemStats(self):
+        """ Counts the tree items and shows their number and approximate memory.
+        """
+        n_items, n_bytes = self._tree_model.treeItemStats()
+        self.memory_label.setText("Tree items: {:,}, approx. {:,} KB"
+                                  .format(n_items, n_bytes // 1024))
+
+
+    def resetStats(self):
+        """ Removes the durations and resets the hit counters of the caches.
+        """
+        self._tree_model.performanceStats.clear()
+        self._tree_model.cellCache.reset_counters()
+        if self._details_cache is not None:
+            self._details_cache.reset_counters()
+        self.updateStats()
+
+
+    def exportJson(self, file_name=None):
+        """ Writes the report to a JSON file. Asks for the file name if it is None.
+        """
+        if not file_name:
+            result = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Export Performance Statistics", "objbrowser_performance.json",
+                "JSON files (*.json);;All files (*)")
+            file_name = result[0] if isinstance(result, tuple) else result # PyQt4 returns a string
+            if not file_name:
+                return
+
+        with open(file_name, 'w') as json_file:
+            json.dump(self.report(), json_file, indent=4, sort_keys=True)
+        logger.info("Exported performance statistics to: {}".format(file_name))
+
+
+    def stop(self):
+        """ Stops updating the statistics.
+        """
+        self._timer.stop()
+
+
+    def showEvent(self, event):
+        """ Starts updating the statistics when the panel is shown.
+        """
+        super(PerformancePanel, self).showEvent(event)
+        self.updateStats()
+        self.updateTreeItemStats()
+        self._timer.start()
+
+
+    def hideEvent(self, event):
+        """ Stops updating the statistics when the panel is hidden.
+        """
+        super(PerformancePanel, self).hideEvent(event)
+        self._timer.stop()
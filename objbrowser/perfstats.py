@@ -0,0 +1,93 @@
+""" Module that defines the PerformanceStats, which keeps the durations of operations.
+"""
+from __future__ import absolute_import, division
+
+import logging, threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Default number of recent durations per operation from which the percentiles are calculated.
+DEFAULT_MAX_SAMPLES = 1000
+
+
+class DurationStats(object):
+    """ The number of calls, total and maximum duration of an operation.
+
+        The most recent durations are kept to calculate percentiles.
+    """
+    __slots__ = ('count', 'total', 'maximum', 'samples')
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, duration):
+        """ Adds the duration (in seconds) of a call.
+        """
+        self.count += 1
+        self.total += duration
+        self.maximum = max(self.maximum, duration)
+        self.samples.append(duration)
+
+    def percentile(self, fraction):
+        """ Returns the duration below which the fraction of the recent calls fall.
+            Returns None if there are no calls.
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def as_dict(self):
+        """ Returns the statistics as a dictionary. The durations are in seconds.
+        """
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'p95': self.percentile(0.95),
+                'max': self.maximum}
+
+
+class PerformanceStats(object):
+    """ DurationStats of operations, grouped by category (e.g. 'cell' or 'fetch').
+
+        Durations can be added from any thread.
+    """
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        """ Constructor
+
+            :param max_samples: number of recent durations per operation that are kept to
+                calculate the percentiles.
+        """
+        assert max_samples > 0, "max_samples must be > 0. Got: {}".format(max_samples)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._stats = {}  # category -> {name: DurationStats}
+
+    def add(self, category, name, duration):
+        """ Adds the duration in seconds of a call of the operation.
+        """
+        with self._lock:
+            operations = self._stats.setdefault(category, {})
+            stats = operations.get(name)
+            if stats is None:
+                stats = DurationStats(self.max_samples)
+                operations[name] = stats
+            stats.add(duration)
+
+    def as_dict(self):
+        """ Returns a {category: {name: statistics}} dictionary with the statistics of all
+            operations. See DurationStats.as_dict.
+        """
+        with self._lock:
+            return {category: {name: stats.as_dict() for name, stats in operations.items()}
+                    for category, operations in self._stats.items()}
+
+    def clear(self):
+        """ Removes all statistics.
+        """
+        with self._lock:
+            self._stats.clear()
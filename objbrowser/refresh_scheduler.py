@@ -0,0 +1,196 @@
+""" Module that defines the RefreshScheduler, which decides when to auto-refresh.
+"""
+from __future__ import absolute_import
+
+import logging
+from timeit import default_timer
+
+from objbrowser.qtpy import QtCore
+
+logger = logging.getLogger(__name__)
+
+# Default maximum fraction of the time that is spent refreshing.
+DEFAULT_MAX_CPU_FRACTION = 0.1
+
+# Default maximum number of seconds between two automatic refreshes.
+DEFAULT_MAX_INTERVAL = 60.0
+
+# Number of milliseconds after the last scroll event before refreshing is resumed.
+SCROLL_PAUSE_MS = 1000
+
+# Weight of the most recent refresh in the moving average of the refresh durations.
+DURATION_SMOOTHING = 0.3
+
+
+# Keep the method names camelCase since it inherits from a Qt object.
+# pylint: disable=C0103
+
+class RefreshScheduler(QtCore.QObject):
+    """ Emits refreshDue when it is time for the next automatic refresh.
+
+        The interval is measured from the end of one refresh to the start of the next. It is at
+        least min_interval seconds, but it is increased when refreshes take so long that more
+        than max_cpu_fraction of the time would be spent refreshing. The scheduler is paused
+        while the window is hidden or the user is scrolling. A refresh that becomes due while
+        paused is done when the pause ends.
+
+        The owner must call refreshFinished after each refresh, including refreshes that were
+        not started by the scheduler.
+    """
+    # Emitted when an automatic refresh should be started.
+    refreshDue = QtCore.Signal()
+
+    # Emitted with the current interval in seconds, or with 0.0 when the scheduler is paused
+    # or stopped.
+    intervalChanged = QtCore.Signal(float)
+
+    def __init__(self, min_interval,
+                 max_cpu_fraction = DEFAULT_MAX_CPU_FRACTION,
+                 max_interval = DEFAULT_MAX_INTERVAL,
+                 parent = None):
+        """ Constructor
+
+            :param min_interval: minimum number of seconds between two refreshes.
+            :param max_cpu_fraction: maximum fraction of the time spent refreshing.
+            :param max_interval: maximum number of seconds between two refreshes.
+            :param parent: the parent QObject
+        """
+        super(RefreshScheduler, self).__init__(parent)
+        assert min_interval > 0, "min_interval must be > 0. Got: {}".format(min_interval)
+        assert 0 < max_cpu_fraction <= 1, \
+            "max_cpu_fraction must be in (0, 1]. Got: {}".format(max_cpu_fraction)
+
+        self._min_interval = min_interval
+        self._max_cpu_fraction = max_cpu_fraction
+        self._max_interval = max(min_interval, max_interval)
+
+        self._active = False
+        self._refreshing = False
+        self._pause_reasons = set()
+        self._mean_duration = None
+        self._last_finished = default_timer()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._onTimeout)
+
+        self._scroll_timer = QtCore.QTimer(self)
+        self._scroll_timer.setSingleShot(True)
+        self._scroll_timer.setInterval(SCROLL_PAUSE_MS)
+        self._scroll_timer.timeout.connect(self._onScrollingStopped)
+
+
+    def isActive(self):
+        """ Returns True if automatic refreshing has been started.
+        """
+        return self._active
+
+
+    def isPaused(self):
+        """ Returns True if automatic refreshing is paused, e.g. because the window is hidden.
+        """
+        return bool(self._pause_reasons)
+
+
+    def interval(self):
+        """ Returns the number of seconds between the end of a refresh and the start of the next.
+        """
+        if self._mean_duration is None:
+            return self._min_interval
+
+        # Spending duration seconds per (duration + interval) seconds is below the CPU fraction.
+        fraction = self._max_cpu_fraction
+        cost_interval = self._mean_duration * (1.0 - fraction) / fraction
+        return min(self._max_interval, max(self._min_interval, cost_interval))
+
+
+    def setMinInterval(self, min_interval):
+        """ Sets the minimum number of seconds between two refreshes.
+        """
+        assert min_interval > 0, "min_interval must be > 0. Got: {}".format(min_interval)
+        self._min_interval = min_interval
+        self._max_interval = max(min_interval, self._max_interval)
+        self._schedule()
+
+
+    def start(self):
+        """ Starts automatic refreshing.
+        """
+        self._active = True
+        self._schedule()
+
+
+    def stop(self):
+        """ Stops automatic refreshing.
+        """
+        self._active = False
+        self._timer.stop()
+        self._scroll_timer.stop()
+        self.intervalChanged.emit(0.0)
+
+
+    def setPaused(self, reason, paused):
+        """ Pauses or resumes the scheduler.
+
+            The scheduler is paused as long as at least one reason (a string) applies.
+        """
+        if paused:
+            self._pause_reasons.add(reason)
+        else:
+            self._pause_reasons.discard(reason)
+        self._schedule()
+
+
+    def userScrolled(self, *_args):
+        """ Pauses the scheduler until the user hasn't scrolled for SCROLL_PAUSE_MS.
+        """
+        if not self._active:
+            return
+        self._scroll_timer.start()
+        if 'scrolling' not in self._pause_reasons:
+            self.setPaused('scrolling', True)
+
+
+    def refreshFinished(self, duration):
+        """ Updates the moving average of the refresh durations and schedules the next refresh.
+
+            :param duration: the number of seconds that the refresh took.
+        """
+        if self._mean_duration is None:
+            self._mean_duration = duration
+        else:
+            self._mean_duration = (DURATION_SMOOTHING * duration +
+                                   (1.0 - DURATION_SMOOTHING) * self._mean_duration)
+        self._refreshing = False
+        self._last_finished = default_timer()
+        logger.debug("Refresh took {:.3f} sec, auto-refresh interval: {:.3f} sec"
+                     .format(duration, self.interval()))
+        self._schedule()
+
+
+    def _schedule(self):
+        """ (Re)starts the timer so that it times out when the next refresh is due.
+        """
+        if not self._active or self._refreshing or self._pause_reasons:
+            self._timer.stop()
+            self.intervalChanged.emit(0.0 if self._pause_reasons or not self._active
+                                      else self.interval())
+            return
+
+        interval = self.interval()
+        remaining = max(0.0, interval - (default_timer() - self._last_finished))
+        self._timer.start(int(round(remaining * 1000)))
+        self.intervalChanged.emit(interval)
+
+
+    def _onTimeout(self):
+        """ Emits refreshDue. The next refresh is scheduled when refreshFinished is called.
+        """
+        self._refreshing = True
+        self.refreshDue.emit()
+
+
+    def _onScrollingStopped(self):
+        """ Resumes the scheduler when the user has stopped scrolling.
+        """
+        self.setPaused('scrolling', False)
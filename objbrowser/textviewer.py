@@ -0,0 +1,188 @@
+""" Module that defines the LazyTextViewer
+"""
+from __future__ import absolute_import
+
+import logging, six
+
+from objbrowser.qtpy import QtCore, QtGui, QtWidgets
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of lines that are added when more text is read from an iterable.
+FETCH_LINES = 500
+
+# Lines that are longer than this number of characters are split over several lines. This way
+# chunks without newlines, e.g. the repr of a long list, can still be read lazily.
+MAX_LINE_LEN = 500
+
+
+# Keep the method names camelCase since it inherits from a Qt object.
+# pylint: disable=C0103
+
+class LazyTextViewer(QtWidgets.QAbstractScrollArea):
+    """ Read-only viewer for large texts. Only the lines that are visible are laid out and drawn.
+
+        The text can be a string or an iterable of string chunks, e.g. a generator. Chunks are
+        read when the user scrolls down so that only the part of the text that is viewed needs
+        to be generated. Lines that are longer than MAX_LINE_LEN are split, they are not wrapped
+        at the window width. Ctrl+C copies the text that has been read.
+    """
+    def __init__(self, parent=None):
+        """ Constructor
+        """
+        super(LazyTextViewer, self).__init__(parent)
+        self._lines = ['']
+        self._chunks = None # Iterator with the chunks that haven't been read yet.
+        self._max_line_len = 0
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+        self.verticalScrollBar().valueChanged.connect(self._fetchMoreIfNeeded)
+
+
+    def setText(self, text):
+        """ Shows a string or an iterable of string chunks.
+        """
+        self._lines = ['']
+        self._max_line_len = 0
+        if isinstance(text, six.string_types):
+            self._appendText(text)
+            self._chunks = None
+        else:
+            self._chunks = iter(text)
+
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self._fetchMoreIfNeeded()
+        self._updateScrollBars()
+        self.viewport().update()
+
+
+    def clear(self):
+        """ Removes the text.
+        """
+        self.setText('')
+
+
+    def lineCount(self):
+        """ The number of lines that have been read so far.
+        """
+        return len(self._lines)
+
+
+    def isComplete(self):
+        """ Returns True if all chunks have been read.
+        """
+        return self._chunks is None
+
+
+    def toPlainText(self):
+        """ Returns the text that has been read so far.
+        """
+        return '\n'.join(self._lines)
+
+
+    def _visibleLineCount(self):
+        """ The number of lines that fit in the viewport.
+        """
+        line_height = self.fontMetrics().lineSpacing()
+        return max(1, self.viewport().height() // line_height)
+
+
+    def _fetchMoreIfNeeded(self, *_args):
+        """ Reads chunks until the lines below the visible window are available.
+        """
+        if self._chunks is None:
+            return
+
+        n_lines_needed = (self.verticalScrollBar().value() +
+                          max(2 * self._visibleLineCount(), FETCH_LINES))
+        if len(self._lines) >= n_lines_needed:
+            return
+
+        try:
+            while len(self._lines) < n_lines_needed:
+                self._appendText(next(self._chunks))
+        except StopIteration:
+            self._chunks = None
+        except Exception as ex:
+            logger.exception(ex)
+            self._lines.append("**ERROR**: {}".format(ex))
+            self._chunks = None
+
+        self._updateScrollBars()
+
+
+    def _appendText(self, text):
+        """ Appends the text to the lines. Splits lines that are longer than MAX_LINE_LEN.
+        """
+        lines = text.split('\n')
+        lines[0] = self._lines.pop() + lines[0] # Continue the last line
+        for line in lines:
+            split_pos = max(0, (len(line) - 1) // MAX_LINE_LEN) * MAX_LINE_LEN
+            for start in range(0, split_pos, MAX_LINE_LEN):
+                self._lines.append(line[start:start + MAX_LINE_LEN])
+            self._lines.append(line[split_pos:])
+            self._max_line_len = max(self._max_line_len, len(line) if split_pos == 0 
+                                                          else MAX_LINE_LEN)
+
+
+    def _updateScrollBars(self):
+        """ Sets the ranges of the scroll bars to the size of the text that has been read.
+        """
+        n_visible = self._visibleLineCount()
+        # Allow to scroll one line further if there are more chunks so that they are fetched.
+        n_scrollable = len(self._lines) + (0 if self._chunks is None else 1)
+        vertical_scroll_bar = self.verticalScrollBar()
+        vertical_scroll_bar.setRange(0, max(0, n_scrollable - n_visible))
+        vertical_scroll_bar.setPageStep(n_visible)
+
+        char_width = self.fontMetrics().averageCharWidth()
+        text_width = self._max_line_len * char_width + 2 * char_width
+        horizontal_scroll_bar = self.horizontalScrollBar()
+        horizontal_scroll_bar.setRange(0, max(0, text_width - self.viewport().width()))
+        horizontal_scroll_bar.setPageStep(self.viewport().width())
+        horizontal_scroll_bar.setSingleStep(char_width)
+
+
+    def resizeEvent(self, event):
+        """ Updates the scroll bars when the viewer is resized.
+        """
+        super(LazyTextViewer, self).resizeEvent(event)
+        self._fetchMoreIfNeeded()
+        self._updateScrollBars()
+
+
+    def scrollContentsBy(self, _dx, _dy):
+        """ Repaints the viewport when the text is scrolled.
+        """
+        self.viewport().update()
+
+
+    def paintEvent(self, _event):
+        """ Draws the visible lines.
+        """
+        painter = QtGui.QPainter(self.viewport())
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(QtGui.QPalette.Text))
+
+        font_metrics = self.fontMetrics()
+        line_height = font_metrics.lineSpacing()
+        x = font_metrics.averageCharWidth() - self.horizontalScrollBar().value()
+        y = font_metrics.ascent()
+        first_line = self.verticalScrollBar().value()
+        for line in self._lines[first_line:first_line + self._visibleLineCount() + 1]:
+            painter.drawText(x, y, line.expandtabs())
+            y += line_height
+        painter.end()
+
+
+    def keyPressEvent(self, event):
+        """ Copies the text to the clipboard on Ctrl+C. Otherwise scrolls the text.
+        """
+        if event.matches(QtGui.QKeySequence.Copy):
+            QtWidgets.QApplication.clipboard().setText(self.toPlainText())
+        elif event.key() == QtCore.Qt.Key_Home:
+            self.verticalScrollBar().setValue(0)
+        elif event.key() == QtCore.Qt.Key_End:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            super(LazyTextViewer, self).keyPressEvent(event)
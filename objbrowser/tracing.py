@@ -0,0 +1,87 @@
+""" Module for recording structured trace events in a ring buffer.
+
+    Tracing is disabled by default. The callers check the module level `enabled` flag before
+    they create an event, so that disabled tracing only costs an attribute lookup:
+
+        if tracing.enabled:
+            tracing.record('fetch', path=parent_item.obj_path, n_rows=n_rows)
+
+    Events can be recorded from any thread. The buffer can be written to a JSON lines file
+    with dump().
+"""
+from __future__ import absolute_import
+
+import json, logging, threading
+from collections import deque
+from timeit import default_timer
+
+logger = logging.getLogger(__name__)
+
+# Default maximum number of events that are kept. The oldest events are discarded first.
+DEFAULT_BUFFER_SIZE = 10000
+
+# True if events are recorded. Use enable() and disable() to change it.
+enabled = False
+
+_events = deque(maxlen=DEFAULT_BUFFER_SIZE)
+
+
+def enable(buffer_size=DEFAULT_BUFFER_SIZE):
+    """ Starts recording events. Keeps the most recent buffer_size events.
+    """
+    global enabled, _events
+    assert buffer_size > 0, "buffer_size must be > 0. Got: {}".format(buffer_size)
+    if buffer_size != _events.maxlen:
+        _events = deque(_events, maxlen=buffer_size)
+    enabled = True
+
+
+def disable():
+    """ Stops recording events. The recorded events are kept.
+    """
+    global enabled
+    enabled = False
+
+
+def record(event, **fields):
+    """ Adds an event to the ring buffer.
+
+        :param event: the type of the event, e.g. 'fetch' or 'refresh'.
+        :param fields: the properties of the event. They should be convertible to JSON.
+    """
+    _events.append((default_timer(), threading.current_thread().name, event, fields))
+
+
+def events():
+    """ Returns the recorded events as a list of dictionaries, oldest first.
+
+        Each dictionary contains the time (seconds of the default_timer), the thread name,
+        the event type and the fields of the event.
+    """
+    result = []
+    for timestamp, thread_name, event, fields in list(_events):
+        event_dict = {'time': timestamp, 'thread': thread_name, 'event': event}
+        event_dict.update(fields)
+        result.append(event_dict)
+    return result
+
+
+def clear():
+    """ Removes all recorded events.
+    """
+    _events.clear()
+
+
+def dump(file_name):
+    """ Writes the recorded events to a file, one JSON object per line.
+
+        Values that cannot be converted to JSON are written as their repr. Returns the number
+        of events that have been written.
+    """
+    event_dicts = events()
+    with open(file_name, 'w') as trace_file:
+        for event_dict in event_dicts:
+            trace_file.write(json.dumps(event_dict, default=repr))
+            trace_file.write('\n')
+    logger.info("Wrote {} trace events to: {}".format(len(event_dicts), file_name))
+    return len(event_dicts)
@@ -6,6 +6,8 @@
 # pylint: disable=C0111
 
 import logging
+from collections import OrderedDict
+
 logger = logging.getLogger(__name__)
 
 from objbrowser.utils import cut_off_str
@@ -13,80 +15,228 @@ from objbrowser.utils import cut_off_str
 # Maximum number of characters used in the __str__ method to represent the underlying object
 MAX_OBJ_STR_LEN = 50
 
+# Default maximum number of sequence element TreeItems that are cached per sequence.
+MAX_CACHED_SEQUENCE_ITEMS = 1000
+
+
+# Shared by all TreeItems without child_items, an empty list per item would take 56 bytes. 
+_NO_CHILD_ITEMS = ()
+
+# Classification flags of the TreeItems. They are computed once, when the item is created or
+# its object is replaced, so that filtering and painting don't call callable() on the objects.
+FLAG_CALLABLE = 1             # The object is callable
+FLAG_CALLABLE_ATTRIBUTE = 2   # The object is callable and an attribute of its parent
+FLAG_SPECIAL_ATTRIBUTE = 4    # The object is an attribute with a __special__ name
+
 
 def name_is_special(method_name):
     "Returns true if the method name starts and ends with two underscores"
     return method_name.startswith('__') and method_name.endswith('__') 
 
 
+def item_flags(name, obj, is_attribute):
+    """ Returns the classification flags of a child object with a name.
+    """
+    flags = 0
+    if callable(obj):
+        flags = FLAG_CALLABLE | FLAG_CALLABLE_ATTRIBUTE if is_attribute else FLAG_CALLABLE
+    if is_attribute and name_is_special(name):
+        flags |= FLAG_SPECIAL_ATTRIBUTE
+    return flags
+
+
+def hidden_attribute_flags(show_callable_attributes, show_special_attributes):
+    """ Returns the flags of the items that are hidden by the show/hide attribute settings.
+    """
+    return ((0 if show_callable_attributes else FLAG_CALLABLE_ATTRIBUTE) | 
+            (0 if show_special_attributes else FLAG_SPECIAL_ATTRIBUTE))
+
+
+def child_path(obj_path, name, is_attribute, item_path_template):
+    """ Returns the path of an item or attribute of the object at obj_path.
+    
+        The item_path_template formats the path of items, e.g. '{}[{!r}]' for dictionary values.
+        Note that the set template ignores the item name.
+    """
+    if not obj_path:
+        return name
+    elif is_attribute:
+        return '{}.{}'.format(obj_path, name)
+    else:
+        return item_path_template.format(obj_path, name)
+
+
+def element_path(obj_path, row):
+    " Returns the path of the sequence element at the row of the sequence at obj_path "
+    return '{}[{}]'.format(obj_path, row) if obj_path else row
+
+
+class SequenceRange(object):
+    """ The underlying object of a range node, which groups the elements start to stop of a
+        large sequence.
+
+        The name of the node is the slice of the sequence, e.g. '[1000:2000]', so that its path
+        can be evaluated. The slice stop of the last range of a sequence can be larger than 
+        the length of the sequence. Indexing a SequenceRange returns the element at that 
+        position from the start.
+    """
+    __slots__ = ('sequence', 'start', 'stop', 'name')
+
+    def __init__(self, sequence, start, stop, name):
+        self.sequence = sequence
+        self.start = start
+        self.stop = stop
+        self.name = name
+
+    def __repr__(self):
+        return "<{} elements {} to {}>".format(type(self.sequence).__name__, 
+                                               self.start, self.stop - 1)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.stop - self.start:
+            raise IndexError("SequenceRange index out of range: {}".format(row))
+        return self.sequence[self.start + row]
+
+
+def sequence_path_and_offset(tree_item):
+    """ Returns the path of the sequence of which the SequenceChildren of the tree_item are the 
+        elements, and the index of the element in the first row. 
+        
+        These are the obj_path and 0, unless the tree_item is a range node.
+    """
+    obj = tree_item.obj
+    if isinstance(obj, SequenceRange):
+        obj_path = tree_item.obj_path
+        return obj_path[:len(obj_path) - len(obj.name)], obj.start
+    else:
+        return tree_item.obj_path, 0
+
+
 
 class TreeItem(object):
     """ Tree node class that can be used to build trees of objects.
     """
+    # Using slots to reduce the memory usage per node. 
+    __slots__ = ('parent_item', 'obj', 'obj_name', 'obj_path', 'is_attribute', 'flags', 
+                 'child_items', 'has_children', 'children_fetched', 'pending_children', 
+                 'sequence_children', 'is_expanded', 'is_stale', 'sort_key', '_row', 
+                 '_is_sequence_element')
+
     def __init__(self, obj, name, obj_path, is_attribute, parent=None):
         self.parent_item = parent
         self.obj = obj
         self.obj_name = str(name)
         self.obj_path = str(obj_path)
         self.is_attribute = is_attribute
-        self.child_items = []
+        # Use set_obj to replace the obj, so that the flags are updated.
+        self.flags = item_flags(self.obj_name, obj, is_attribute)
+        self.child_items = _NO_CHILD_ITEMS # replaced by a list when the first child is added
         self.has_children = True
         self.children_fetched = False
+        self.pending_children = None  # iterator over the children that are not yet fetched
+        self.sequence_children = None # SequenceChildren if the children are sequence elements
+        self.is_expanded = False      # True if the node is expanded in the view
+        self.is_stale = False         # True if the children must be refreshed when expanded
+        self.sort_key = None          # (column, key) tuple, cached by the TreeModel
+        self._row = 0                 # position in the child_items or SequenceChildren of parent 
+        self._is_sequence_element = False
 
 
     def __str__(self):
-        n_children = len(self.child_items)
+        n_children = self.child_count()
         if n_children == 0:
             return "<TreeItem(0x{:x}): {} = {}>" \
                 .format(id(self.obj), self.obj_path, cut_off_str(self.obj, MAX_OBJ_STR_LEN))
         else:
             return "<TreeItem(0x{:x}): {} ({:d} children)>" \
-                .format(id(self.obj), self.obj_path, len(self.child_items))
+                .format(id(self.obj), self.obj_path, n_children)
 
 
     def __repr__(self):
-        n_children = len(self.child_items)
+        n_children = self.child_count()
         return "<TreeItem(0x{:x}): {} ({:d} children)>" \
             .format(id(self.obj), self.obj_path, n_children)
             
     @property
     def is_special_attribute(self):
         " Return true if the items is an attribute and its name begins and end with 2 underscores" 
-        return self.is_attribute and name_is_special(self.obj_name)
+        return bool(self.flags & FLAG_SPECIAL_ATTRIBUTE)
 
     @property
     def is_callable_attribute(self):
         " Return true if the items is an attribute and it is callable."
-        return self.is_attribute and self.is_callable
+        return bool(self.flags & FLAG_CALLABLE_ATTRIBUTE)
 
     @property
     def is_callable(self):
         " Return true if the underlying object is callable "
-        return callable(self.obj)
+        return bool(self.flags & FLAG_CALLABLE)
+
+    def set_obj(self, obj):
+        " Replaces the underlying object, e.g. after a refresh, and updates the flags "
+        self.obj = obj
+        self.flags = item_flags(self.obj_name, obj, self.is_attribute)
     
     def append_child(self, item):
+        if self.child_items is _NO_CHILD_ITEMS:
+            self.child_items = []
         item.parent_item = self
+        item._row = len(self.child_items)
         self.child_items.append(item)
 
     def insert_children(self, idx, items):
+        if self.child_items is _NO_CHILD_ITEMS:
+            self.child_items = []
         self.child_items[idx:idx] = items
         for item in items:
             item.parent_item = self
+        self._renumber_child_items(idx)
+
+    def remove_children(self, start, stop):
+        " Removes the child_items[start:stop] "
+        del self.child_items[start:stop]
+        self._renumber_child_items(start)
+
+    def _renumber_child_items(self, start):
+        " Updates the position of the child_items from start onwards "
+        child_items = self.child_items
+        for pos in range(start, len(child_items)):
+            child_items[pos]._row = pos
+
+    def n_sequence_children(self):
+        " Returns the number of sequence elements that precede the other children "
+        return 0 if self.sequence_children is None else len(self.sequence_children)
 
     def child(self, row):
-        return self.child_items[row]
+        n_elements = self.n_sequence_children()
+        if row < n_elements:
+            return self.sequence_children.item(row)
+        else:
+            return self.child_items[row - n_elements]
+
+    def existing_child(self, row):
+        " Returns the child at the row if its TreeItem exists. Returns None otherwise "
+        n_elements = self.n_sequence_children()
+        if row < n_elements:
+            return self.sequence_children.cached_item(row)
+        else:
+            return self.child_items[row - n_elements]
 
     def child_count(self):
-        return len(self.child_items)
+        return self.n_sequence_children() + len(self.child_items)
 
     def parent(self):
         return self.parent_item
 
     def row(self):
-        if self.parent_item:
-            return self.parent_item.child_items.index(self)
+        if self._is_sequence_element or self.parent_item is None:
+            return self._row
         else:
-            return 0
+            # The sequence elements precede the child_items
+            return self.parent_item.n_sequence_children() + self._row
 
     def pretty_print(self, indent=0):
         if 0:
@@ -98,3 +248,117 @@ class TreeItem(object):
             
         
         
+
+
+
+class SequenceChildren(object):
+    """ The children of a TreeItem that represent the elements of a sequence.
+
+        The TreeItems are only created when they are requested. The most recently used items are
+        kept in a cache of limited size. Items of which the children are (being) fetched are never
+        removed from the cache because they contain the state of the subtree.
+    """
+    __slots__ = ('parent_item', 'length', 'sequence_length', 'max_cached', 
+                 '_cached_items', '_fetched_items')
+
+    def __init__(self, parent_item, length, sequence_length, 
+                 max_cached=MAX_CACHED_SEQUENCE_ITEMS):
+        """ Constructor
+
+            :param parent_item: the TreeItem of which the obj is the sequence.
+            :param length: the number of elements that have been fetched, i.e. the number of rows.
+            :param sequence_length: the number of elements in the sequence. This is not 
+                determined from the sequence so that it only changes when the tree is refreshed.
+            :param max_cached: maximum number of cached TreeItems (excluding fetched items).
+        """
+        self.parent_item = parent_item
+        self.length = length
+        self.sequence_length = sequence_length
+        self.max_cached = max_cached
+        self._cached_items = OrderedDict()  # in order of last usage
+        self._fetched_items = {}
+
+    def __len__(self):
+        return self.length
+
+    def item(self, row):
+        """ Returns the TreeItem of the element at the row. Creates it if it's not cached.
+        """
+        if row in self._fetched_items:
+            return self._fetched_items[row]
+
+        try:
+            item = self._cached_items.pop(row)
+        except KeyError:
+            item = self._create_item(row)
+
+        self._cached_items[row] = item
+        if len(self._cached_items) > self.max_cached:
+            self._evict()
+        return item
+
+    def cached_item(self, row):
+        """ Returns the TreeItem of the element at the row if it is in the cache. 
+            Returns None otherwise. Does not update the order of usage.
+        """
+        item = self._fetched_items.get(row)
+        if item is None:
+            item = self._cached_items.get(row)
+        return item
+
+    def _create_item(self, row):
+        """ Creates the TreeItem for the element at the row.
+        """
+        try:
+            element = self.parent_item.obj[row]
+        except Exception as ex:
+            # Can happen if the sequence has been shortened after the last refresh.
+            logger.debug("Unable to get sequence element {}: {}".format(row, ex))
+            element = None
+
+        # The elements of a range node are named and indexed by their position in the sequence.
+        sequence_path, offset = sequence_path_and_offset(self.parent_item)
+        path_str = element_path(sequence_path, offset + row)
+        item = TreeItem(element, offset + row, path_str, False, parent=self.parent_item)
+        item._row = row
+        item._is_sequence_element = True
+        return item
+
+    def _evict(self):
+        """ Removes the least recently used items from the cache until it fits.
+        """
+        while len(self._cached_items) > self.max_cached:
+            row, item = self._cached_items.popitem(last=False)
+            if item.children_fetched or item.pending_children is not None:
+                self._fetched_items[row] = item
+
+    def fetched_items(self):
+        """ Returns a list of (row, item) tuples of the items that have (partially) fetched
+            children. The list is sorted by row.
+        """
+        items = dict(self._fetched_items)
+        for row, item in self._cached_items.items():
+            if item.children_fetched or item.pending_children is not None:
+                items[row] = item
+        return sorted(items.items())
+
+    def existing_items(self):
+        """ Returns a list with the TreeItems that have been created and are not evicted.
+        """
+        return list(self._fetched_items.values()) + list(self._cached_items.values())
+
+    def reset(self, length, sequence_length):
+        """ Sets the number of rows and elements and clears the cache.
+
+            Fetched items with a row smaller than the new length are kept. Their obj attributes
+            are not updated.
+        """
+        for row, item in self._cached_items.items():
+            if item.children_fetched or item.pending_children is not None:
+                self._fetched_items[row] = item
+        self._cached_items.clear()
+
+        self.length = length
+        self.sequence_length = sequence_length
+        for row in [row for row in self._fetched_items if row >= length]:
+            del self._fetched_items[row]
@@ -8,19 +8,168 @@
 
 
 from __future__ import absolute_import
-import logging, inspect
-from difflib import SequenceMatcher
-from collections import OrderedDict
-from six import unichr
+import logging, operator, sys
+from timeit import default_timer
+from bisect import bisect_left
+from itertools import islice
+from collections import deque
 
 from objbrowser.qtpy import QtCore, QtGui, QtWidgets
 from objbrowser.qtpy.QtCore import Qt
-from objbrowser.treeitem import TreeItem
-from objbrowser.utils import cut_off_str
+from objbrowser.treeitem import (TreeItem, SequenceChildren, SequenceRange, 
+                                 hidden_attribute_flags, sequence_path_and_offset)
+from objbrowser.engine import (sequence_length, object_children, create_tree_item, 
+                               iter_tree_items, fetch_children, add_fetched_children, 
+                               evaluate_column, single_line)
+from objbrowser.cellcache import CellCache, DEFAULT_MAX_CACHED_CELLS, DEFAULT_MAX_CACHED_CHARS
+from objbrowser.workers import WorkerPool
+from objbrowser.perfstats import PerformanceStats
+from objbrowser.nameindex import NameIndex
+from objbrowser.utils import TimeBudgetExceeded
+from objbrowser import tracing
 
 logger = logging.getLogger(__name__)
 
+# Default maximum number of children that are added to a node per fetchMore call.
+DEFAULT_FETCH_PAGE_SIZE = 1000
 
+# Default maximum number of characters that is displayed in a table cell.
+DEFAULT_MAX_CELL_LEN = 1000
+
+# Text that is displayed in expensive cells while their value is calculated in the background.
+PENDING_VALUE_TEXT = "<calculating...>"
+
+# Number of milliseconds that cells are highlighted after their value changed during a refresh.
+HIGHLIGHT_DURATION_MS = 1500
+
+# Maximum number of milliseconds that the TreeProxyModel spends on indexing fetched rows per 
+# event loop iteration. The name index is updated in these slices so that fetching stays fast.
+NAME_INDEX_SLICE_MS = 20
+
+# Item data role of the sort keys of the cells. See TreeModel.sortKey.
+SORT_ROLE = Qt.UserRole
+
+# The sort keys are tuples so that cells without a value can be sorted after the other cells,
+# even if their values are not comparable with None.
+_MISSING_SORT_KEY = (1, )
+
+
+class _CellTimeout(object):
+    """ Result of a cell calculation that exceeded the time budget of its column.
+
+        The worker threads return it instead of marking the cell, so that the timed-out cells
+        are only updated in the GUI thread. The value is None if the calculation was 
+        interrupted, or the display value if the data function didn't check the time budget.
+    """
+    __slots__ = ('duration', 'value')
+
+    def __init__(self, duration, value=None):
+        self.duration = duration
+        self.value = value
+
+
+class _RefreshSnapshot(object):
+    """ The children of a node as determined by a background refresh.
+
+        The obj is the Python object of which the children were determined. The snapshot is only
+        used if the node still refers to the same object, and the model still hides the same
+        attributes, when the snapshot is applied. The child_snapshots dictionary contains the 
+        snapshots of the child TreeItems that have fetched children.
+    """
+    __slots__ = ('obj', 'hidden_flags', 'obj_children', 'n_items', 'item_path_template', 
+                 'child_snapshots')
+
+    def __init__(self, obj, hidden_flags, obj_children, n_items, item_path_template):
+        self.obj = obj
+        self.hidden_flags = hidden_flags
+        self.obj_children = obj_children
+        self.n_items = n_items
+        self.item_path_template = item_path_template
+        self.child_snapshots = {}
+
+
+def diff_child_keys(old_keys, new_keys):
+    """ Determines how the old children of a node can be transformed into the new children.
+    
+        The children are identified by their keys, which must be hashable. Duplicate keys, such 
+        as the 'pop()' names of set elements, are matched in order of occurrence. The children
+        that are kept are the longest subsequence of common keys that have the same order in
+        both lists. The other old children are removed and the other new children are inserted.
+        Runs in O(n) if the common keys have the same order, O(n log n) otherwise.
+        
+        Returns a tuple with:
+            - list of (old_position, new_position) tuples of the kept children.
+            - list of (start, stop) ranges of old positions that must be removed. 
+            - list of (start, stop) ranges of new positions that must be inserted. 
+        The ranges are sorted and each is as long as possible.
+    """
+    if old_keys == new_keys: # Common case, e.g. when only the values of a dict have changed.
+        return list(zip(range(len(old_keys)), range(len(new_keys)))), [], []
+
+    new_positions = {key: pos for pos, key in enumerate(new_keys)}
+    if len(new_positions) < len(new_keys) or len(set(old_keys)) < len(old_keys):
+        old_keys = _number_occurrences(old_keys)
+        new_keys = _number_occurrences(new_keys)
+        new_positions = {key: pos for pos, key in enumerate(new_keys)}
+
+    matched = [(old_pos, new_pos) for old_pos, new_pos in 
+               enumerate(map(new_positions.get, old_keys)) if new_pos is not None]
+    matched_new_positions = [new_pos for _, new_pos in matched]
+    if all(map(operator.lt, matched_new_positions, matched_new_positions[1:])):
+        kept = matched
+    else:
+        kept = _longest_increasing_subsequence(matched)
+
+    removed_runs = _gaps([old_pos for old_pos, _ in kept], len(old_keys))
+    inserted_runs = _gaps([new_pos for _, new_pos in kept], len(new_keys))
+    return kept, removed_runs, inserted_runs
+
+
+def _number_occurrences(keys):
+    """ Makes the keys unique by pairing them with their number of previous occurrences.
+    """
+    counts = {}
+    numbered_keys = []
+    for key in keys:
+        count = counts.get(key, 0)
+        counts[key] = count + 1
+        numbered_keys.append((key, count))
+    return numbered_keys
+
+
+def _longest_increasing_subsequence(pairs):
+    """ Returns the longest subsequence of (old_pos, new_pos) pairs with increasing new_pos.
+    
+        The pairs must be sorted by old_pos. Uses patience sorting, which is O(n log n).
+    """
+    tail_values = []    # Smallest last new_pos of the increasing subsequences of each length.
+    tail_indices = []   # Index in pairs of the last pair of the subsequences in tail_values.
+    predecessors = []   # Index in pairs of the previous pair in the subsequence (or -1)
+    for idx, (_, new_pos) in enumerate(pairs):
+        length = bisect_left(tail_values, new_pos)
+        predecessors.append(tail_indices[length - 1] if length > 0 else -1)
+        if length == len(tail_values):
+            tail_values.append(new_pos)
+            tail_indices.append(idx)
+        else:
+            tail_values[length] = new_pos
+            tail_indices[length] = idx
+
+    result = []
+    idx = tail_indices[-1] if tail_indices else -1
+    while idx >= 0:
+        result.append(pairs[idx])
+        idx = predecessors[idx]
+    result.reverse()
+    return result
+
+
+def _gaps(positions, n_positions):
+    """ Returns the (start, stop) ranges of range(n_positions) that are not in the positions.
+        The positions must be sorted.
+    """
+    bounds = [-1] + positions + [n_positions]
+    return [(prev + 1, pos) for prev, pos in zip(bounds, bounds[1:]) if pos > prev + 1]
 
     
 # Keep the method names camelCase since it inherits from a Qt object.
@@ -35,10 +184,26 @@ logger = logging.getLogger(__name__)
     
 class TreeModel(QtCore.QAbstractItemModel):
     """ Model that provides an interface to an objectree that is build of TreeItems. 
+    
+        The children and cell values are determined by the Qt-independent objbrowser.engine.
+        This class adds the Qt model interface, caching, background evaluation and refreshing.
     """
+    # Emitted with the path, the column name and the duration when a cell exceeded the time
+    # budget of its column.
+    cellTimedOut = QtCore.Signal(str, str, float)
+
+    # Emitted with the duration in seconds when a refresh has been applied to the tree.
+    # The view should then call updateChangedCells with its visible rows.
+    refreshFinished = QtCore.Signal(float)
+
     def __init__(self, obj, 
                  obj_name = '',
                  attr_cols = None, 
+                 fetch_page_size = DEFAULT_FETCH_PAGE_SIZE,
+                 max_cached_cells = DEFAULT_MAX_CACHED_CELLS,
+                 max_cached_chars = DEFAULT_MAX_CACHED_CHARS,
+                 max_cell_len = DEFAULT_MAX_CELL_LEN,
+                 hidden_flags = 0,
                  parent = None):
         """ Constructor
         
@@ -46,11 +211,59 @@ class TreeModel(QtCore.QAbstractItemModel):
             :param obj_name: name of the object as it will appear in the root node
                              If empty, no root node will be drawn. 
             :param attr_cols: list of AttributeColumn definitions
+            :param fetch_page_size: maximum number of children that are added to a node in one
+                fetchMore call. The view fetches the next page when the user scrolls down.
+                If None, all children are added at once.
+            :param max_cached_cells: maximum number of cells of which the display value is cached.
+            :param max_cached_chars: maximum total length of the cached display values.
+            :param max_cell_len: maximum number of characters that is displayed in a cell. 
+                Longer values are cut off and end with an ellipsis.
+            :param hidden_flags: attributes with one of these treeitem flags are left out of 
+                the model. See treeitem.hidden_attribute_flags.
             :param parent: the parent widget
         """
         super(TreeModel, self).__init__(parent)
         self._attr_cols = attr_cols
 
+        assert fetch_page_size is None or fetch_page_size > 0, \
+            "fetch_page_size must be > 0. Got: {}".format(fetch_page_size)
+        self._fetch_page_size = fetch_page_size
+        self._max_cell_len = max_cell_len
+        self._hidden_flags = hidden_flags
+        self._cell_cache = CellCache(max_cells=max_cached_cells, max_chars=max_cached_chars)
+        self._perf_stats = PerformanceStats()
+
+        # Cells of expensive columns are calculated by the worker pool.
+        self._worker_pool = WorkerPool(parent=self)
+        self._worker_pool.jobFinished.connect(self._onCellValueCalculated)
+
+        # The children of the nodes are determined in a background thread during a refresh.
+        # There is at most one refresh running, requests in the meantime are coalesced.
+        self._refresh_pool = WorkerPool(n_threads=1, parent=self)
+        self._refresh_pool.jobFinished.connect(self._onRefreshSnapshotTaken)
+        self._refresh_start_time = None  # Not None while a refresh is running
+        self._refresh_requested = False
+
+        # Fingerprints of the display values of the cells that were invalidated by a refresh:
+        # tree_item -> {column: fingerprint}. Used to detect which cells have changed.
+        self._stale_fingerprints = {}
+        
+        # The (column, key) sort keys of the tree items that were invalidated by a refresh.
+        self._stale_sort_keys = {}
+
+        # Expensive cells that have been displayed with the PENDING_VALUE_TEXT.
+        self._placeholder_cells = set()
+
+        # Cells of which the value changed during a refresh: (tree_item, column) -> end time
+        self._highlighted_cells = {}
+        self._highlight_timer = QtCore.QTimer(self)
+        self._highlight_timer.setSingleShot(True)
+        self._highlight_timer.timeout.connect(self._removeExpiredHighlights)
+
+        # Cells that exceeded the time budget of their column: (obj_path, column) -> duration.
+        # They are keyed by path so that they aren't recalculated after a refresh.
+        self._timed_out_cells = {}
+
         self.regular_font = QtGui.QFont()  # Font for members (non-functions)
         self.special_attribute_font = QtGui.QFont()  # Font for __special_attributes__
         self.special_attribute_font.setItalic(True)
@@ -58,6 +271,8 @@ class TreeModel(QtCore.QAbstractItemModel):
         self.regular_color = QtGui.QBrush(QtGui.QColor('black'))    
         #self.callable_color = QtGui.QBrush(QtGui.QColor('brown'))  # for functions, methods, etc.
         self.callable_color = QtGui.QBrush(QtGui.QColor('mediumblue'))  # for functions, methods, etc.
+        self.pending_color = QtGui.QBrush(QtGui.QColor('gray'))  # while calculating expensive cells
+        self.highlight_color = QtGui.QBrush(QtGui.QColor(255, 255, 160))  # for changed cells
 
         # The following members will be initialized by populateTree
         # The rootItem is always invisible. If the obj_name is the empty string, the inspectedItem 
@@ -78,6 +293,45 @@ class TreeModel(QtCore.QAbstractItemModel):
         return self._inspected_node_is_visible
     
     
+    @property
+    def cellCache(self):
+        """ The CellCache with the display values of the cells. 
+            Can be used to inspect the hit and miss counters.
+        """
+        return self._cell_cache
+
+
+    @property
+    def performanceStats(self):
+        """ The PerformanceStats with the durations of the data functions ('cell' category per
+            column), of fetchMore ('fetch') and of refreshing ('refresh').
+        """
+        return self._perf_stats
+
+
+    def treeItemStats(self):
+        """ Returns the number of TreeItems in the tree and their approximate memory in bytes.
+        
+            The memory includes the items, their lists of children, names and paths, but not the
+            underlying Python objects. Walks the whole tree so it should not be called often.
+        """
+        n_items = 0
+        n_bytes = 0
+        stack = [self.rootItem]
+        while stack:
+            tree_item = stack.pop()
+            n_items += 1
+            n_bytes += (sys.getsizeof(tree_item) + sys.getsizeof(tree_item.obj_name) + 
+                        sys.getsizeof(tree_item.obj_path))
+            if tree_item.child_items:
+                n_bytes += sys.getsizeof(tree_item.child_items)
+                stack.extend(tree_item.child_items)
+            if tree_item.sequence_children is not None:
+                n_bytes += sys.getsizeof(tree_item.sequence_children)
+                stack.extend(tree_item.sequence_children.existing_items())
+        return n_items, n_bytes
+    
+    
     @property
     def rootItem(self):
         """ The root TreeItem.
@@ -102,7 +356,7 @@ class TreeModel(QtCore.QAbstractItemModel):
         """ The model index that point to the inspectedItem
         """
         if self.inspectedNodeIsVisible:
-            return self.createIndex(0, 0, self._inspected_item)
+            return self.createIndex(0, 0, self._root_item)
         else:
             return self.rootIndex()
         
@@ -119,40 +373,326 @@ class TreeModel(QtCore.QAbstractItemModel):
             return None
 
         col = index.column()
-        tree_item = index.internalPointer()
-        obj = tree_item.obj
+        tree_item = self.treeItem(index)
 
         if role == Qt.DisplayRole:
-            try:
-                attr = self._attr_cols[col].data_fn(tree_item)
-                # Replace carriage returns and line feeds with unicode glyphs 
-                # so that all table rows fit on one line. 
-                #return attr.replace('\n', unichr(0x240A)).replace('\r', unichr(0x240D))
-                return (attr.replace('\r\n', unichr(0x21B5))
-                            .replace('\n', unichr(0x21B5))
-                            .replace('\r', unichr(0x21B5)))
-            except Exception as ex:
-                #logger.exception(ex)
-                return "**ERROR**: {}".format(ex) 
+            value = self._cell_cache.get(tree_item, col)
+            if value is None:
+                if (tree_item.obj_path, col) in self._timed_out_cells:
+                    return self._timedOutText(col)
+                if self._attr_cols[col].expensive:
+                    self._worker_pool.submit((tree_item, col), self._calculateDisplayValue, 
+                                             tree_item, col)
+                    self._placeholder_cells.add((tree_item, col))
+                    return PENDING_VALUE_TEXT
+                # Errors are cached as well so that failing data functions aren't called again.
+                value = self._displayValue(tree_item, col)
+                if value is None:
+                    return self._timedOutText(col)
+                self._cell_cache.put(tree_item, col, value)
+            return value
             
         elif role == Qt.TextAlignmentRole:
             return self._attr_cols[col].alignment
             
         elif role == Qt.ForegroundRole:
-            if tree_item.is_callable:
+            if self._worker_pool.isPending((tree_item, col)):
+                return self.pending_color
+            elif tree_item.is_callable:
                 return self.callable_color
             else:
                 return self.regular_color
             
+        elif role == Qt.BackgroundRole:
+            if (tree_item, col) in self._highlighted_cells:
+                return self.highlight_color
+            return None
+            
         elif role == Qt.FontRole:
             if tree_item.is_attribute:
                 return self.special_attribute_font
             else:
                 return self.regular_font
+            
+        elif role == SORT_ROLE:
+            return self.sortKey(index)
         else:
             return None
 
 
+    def sortKey(self, index):
+        """ Returns the key for sorting the rows by the column of the index.
+        
+            The key of the sort column is cached in the tree item, so that sorting again (e.g. 
+            when rows are inserted) doesn't evaluate the column again. The key is calculated 
+            by the sort_key_fn of the column, or else it is the display value. Expensive columns
+            are not evaluated for sorting, cells that have not been calculated yet are sorted
+            last and are moved when their value becomes available.
+        """
+        # Called twice per comparison when sorting, so the tree item is looked up directly.
+        col = index.column()
+        tree_item = index.internalPointer().child(index.row())
+        sort_key = tree_item.sort_key
+        if sort_key is not None and sort_key[0] == col:
+            return sort_key[1]
+        
+        attr_col = self._attr_cols[col]
+        if attr_col.sort_key_fn is not None:
+            try:
+                value = attr_col.sort_key_fn(tree_item)
+            except Exception as ex:
+                logger.debug("Unable to determine sort key of {} [{}]: {}"
+                             .format(tree_item.obj_path, attr_col.name, ex))
+                value = None
+        else:
+            value = self._cell_cache.get(tree_item, col)
+            if (value is None and not attr_col.expensive and 
+                    (tree_item.obj_path, col) not in self._timed_out_cells):
+                value = self._displayValue(tree_item, col)
+                if value is not None:
+                    self._cell_cache.put(tree_item, col, value)
+                
+        key = _MISSING_SORT_KEY if value is None else (0, value)
+        tree_item.sort_key = (col, key)
+        return key
+
+
+    def _displayValue(self, tree_item, col):
+        """ Calculates the string that is displayed in a cell. Must be called in the GUI thread.
+        
+            If the calculation exceeded the time budget of the column, the cell is marked as 
+            timed out and the cellTimedOut signal is emitted. None is returned if the calculation
+            was interrupted.
+        """
+        value = self._calculateDisplayValue(tree_item, col)
+        if isinstance(value, _CellTimeout):
+            self._markTimedOut(tree_item, col, value.duration)
+            return value.value
+        return value
+
+
+    def _calculateDisplayValue(self, tree_item, col):
+        """ Calculates the string that is displayed in a cell. Is called in the worker threads
+            for expensive columns, it therefore doesn't change the state of the model.
+        
+            Returns a _CellTimeout if the calculation exceeded the time budget of the column.
+        """
+        attr_col = self._attr_cols[col]
+        start_time = default_timer()
+        try:
+            attr = evaluate_column(attr_col, tree_item, self._max_cell_len)
+            duration = default_timer() - start_time
+            if tracing.enabled:
+                tracing.record('cell', path=tree_item.obj_path, column=attr_col.name, 
+                               duration=duration)
+            # Replace line breaks so that all table rows fit on one line. 
+            value = single_line(attr, self._max_cell_len)
+            if attr_col.time_budget is not None and duration > attr_col.time_budget:
+                # Code that doesn't check the time budget, e.g. a slow __repr__ or 
+                # inspect.getsource, can't be interrupted. Its value is shown, but the cell is
+                # marked as timed out so that it isn't calculated again by refreshes.
+                logger.warning("Cell {} [{}] exceeded its time budget: {:.3f} seconds"
+                               .format(tree_item.obj_path, attr_col.name, duration))
+                return _CellTimeout(duration, value)
+            return value
+        except TimeBudgetExceeded:
+            duration = default_timer() - start_time
+            logger.warning("Cell {} [{}] exceeded its time budget: {:.3f} seconds"
+                           .format(tree_item.obj_path, attr_col.name, duration))
+            if tracing.enabled:
+                tracing.record('cell_timeout', path=tree_item.obj_path, column=attr_col.name, 
+                               duration=duration)
+            return _CellTimeout(duration)
+        except Exception as ex:
+            #logger.exception(ex)
+            return "**ERROR**: {}".format(ex) 
+        finally:
+            self._perf_stats.add('cell', attr_col.name, default_timer() - start_time)
+
+
+    def _markTimedOut(self, tree_item, col, duration):
+        """ Marks the cell as timed out and emits the cellTimedOut signal.
+        """
+        self._timed_out_cells[(tree_item.obj_path, col)] = duration
+        self.cellTimedOut.emit(tree_item.obj_path, self._attr_cols[col].name, duration)
+
+
+    def _timedOutText(self, col):
+        """ The text that is displayed in a timed-out cell.
+        """
+        return "**TIMEOUT**: took more than {:g} seconds".format(self._attr_cols[col].time_budget)
+
+
+    def _onCellValueCalculated(self, job):
+        """ Called when the worker pool has calculated the value of an expensive cell.
+
+            Stores the value in the cell cache and emits dataChanged for the cell. The value is
+            discarded if the tree item has been removed from the tree in the meantime. If the
+            cell was recalculated after a refresh, dataChanged is only emitted if its value has 
+            changed (the cell is then highlighted) or if the placeholder text was displayed.
+        """
+        tree_item, col = job.key
+        shows_placeholder = job.key in self._placeholder_cells
+        self._placeholder_cells.discard(job.key)
+        value = job.result
+        if isinstance(value, _CellTimeout):
+            self._markTimedOut(tree_item, col, value.duration)
+            value = value.value
+        index = self._itemIndex(tree_item, col)
+        if not index.isValid():
+            return
+
+        fingerprint = self._stale_fingerprints.get(tree_item, {}).pop(col, None)
+        if value is None: 
+            changed = True # The view will get the timeout text or placeholder from data()
+        else:
+            self._cell_cache.put(tree_item, col, value)
+            if tree_item.sort_key is not None and tree_item.sort_key[0] == col:
+                tree_item.sort_key = None
+            changed = fingerprint is None or hash(value) != fingerprint
+            if changed and fingerprint is not None:
+                self._highlightCell(tree_item, col)
+        if changed or shows_placeholder:
+            self.dataChanged.emit(index, index)
+
+
+    def _itemIndex(self, tree_item, col):
+        """ Returns the index of a cell of the tree_item. 
+            Returns an invalid index if the tree_item has been removed from the tree.
+        """
+        parent_item = tree_item.parent_item
+        if parent_item is None:
+            return QtCore.QModelIndex()
+        row = tree_item.row()
+        if parent_item.existing_child(row) is not tree_item:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, col, parent_item)
+
+
+    def _invalidateCells(self, tree_item):
+        """ Removes the cells of the tree_item from the cell cache because its object may have 
+            changed. Keeps the fingerprints of the display values to detect changes later.
+        """
+        if tree_item.sort_key is not None:
+            self._stale_sort_keys[tree_item] = tree_item.sort_key
+            tree_item.sort_key = None
+        cells = self._cell_cache.pop(tree_item)
+        if cells:
+            self._stale_fingerprints[tree_item] = {col: hash(value) 
+                                                   for col, value in cells.items()}
+
+
+    def updateChangedCells(self, indices):
+        """ Recalculates the cells of the rows that were invalidated by the last refresh.
+        
+            Should be called with the (column 0) indices of the visible rows after a refresh. 
+            The dataChanged signal is only emitted for cells of which the display value changed;
+            these cells are highlighted for HIGHLIGHT_DURATION_MS milliseconds. Expensive cells 
+            are recalculated in the background, their old value remains visible until then.
+            
+            The dataChanged signal is also emitted if the sort key of a row has changed, so 
+            that a sorting proxy model with a dynamic sort filter moves only that row.
+        """
+        for index in indices:
+            tree_item = self._existingTreeItem(index)
+            stale_sort_key = self._stale_sort_keys.pop(tree_item, None)
+            if stale_sort_key is not None:
+                col, old_key = stale_sort_key
+                cell_index = index.sibling(index.row(), col)
+                if self.sortKey(cell_index) != old_key:
+                    self.dataChanged.emit(cell_index, cell_index)
+                
+            fingerprints = self._stale_fingerprints.get(tree_item)
+            if not fingerprints:
+                continue
+            
+            for col, fingerprint in list(fingerprints.items()):
+                if self._attr_cols[col].expensive:
+                    # The fingerprint is compared when the value has been calculated.
+                    self._worker_pool.submit((tree_item, col), self._calculateDisplayValue, 
+                                             tree_item, col)
+                    continue
+                
+                del fingerprints[col]
+                value = self._displayValue(tree_item, col)
+                if value is None: # Timed out
+                    changed = True
+                else:
+                    self._cell_cache.put(tree_item, col, value)
+                    changed = hash(value) != fingerprint
+                if changed:
+                    self._highlightCell(tree_item, col)
+                    cell_index = index.sibling(index.row(), col)
+                    self.dataChanged.emit(cell_index, cell_index)
+                
+            if not fingerprints:
+                del self._stale_fingerprints[tree_item]
+                
+
+    def _highlightCell(self, tree_item, col):
+        """ Highlights the cell for HIGHLIGHT_DURATION_MS milliseconds.
+        """
+        self._highlighted_cells[(tree_item, col)] = (default_timer() + 
+                                                     HIGHLIGHT_DURATION_MS / 1000.0)
+        if not self._highlight_timer.isActive():
+            self._highlight_timer.start(HIGHLIGHT_DURATION_MS)
+            
+            
+    def _removeExpiredHighlights(self):
+        """ Removes the highlights that have expired and repaints their cells. 
+        """
+        now = default_timer()
+        for key, end_time in list(self._highlighted_cells.items()):
+            if end_time <= now:
+                del self._highlighted_cells[key]
+                index = self._itemIndex(*key)
+                if index.isValid():
+                    self.dataChanged.emit(index, index)
+                    
+        if self._highlighted_cells:
+            end_time = min(self._highlighted_cells.values())
+            self._highlight_timer.start(max(0, int((end_time - now) * 1000)) + 1)
+
+
+    @property
+    def timedOutCells(self):
+        """ Dictionary with the (path, column) of the timed-out cells and the duration.
+        """
+        return self._timed_out_cells
+
+
+    def retryTimedOutCells(self):
+        """ Clears the timed-out marks so that the cells are calculated again when the view
+            requests them.
+        """
+        self._timed_out_cells.clear()
+
+
+    def cancelQueuedCells(self):
+        """ Cancels the calculation of the expensive cells that haven't started yet.
+
+            Should be called when rows are scrolled out of view. The view will request the
+            cells that are still visible again when it repaints.
+        """
+        self._worker_pool.cancelQueued()
+        self._placeholder_cells.clear()
+
+
+    def emitRowsChanged(self, parent_item, first, last):
+        """ Emits dataChanged for all cells of the rows first to last (inclusive) of the 
+            parent_item. The TreeProxyModel uses this to filter only these rows again.
+        """
+        self.dataChanged.emit(self.createIndex(first, 0, parent_item), 
+                              self.createIndex(last, len(self._attr_cols) - 1, parent_item))
+
+
+    def stopWorkers(self):
+        """ Cancels all calculations of expensive cells and refreshes and stops the worker threads.
+        """
+        self._worker_pool.stop()
+        self._refresh_pool.stop()
+
+
     def flags(self, index):
         if not index.isValid():
             return Qt.NoItemFlags
@@ -166,47 +706,58 @@ class TreeModel(QtCore.QAbstractItemModel):
         else:
             return None
 
+    # The internal pointer of an index is the TreeItem of its parent. This way the TreeItems of
+    # sequence elements can be removed from the SequenceChildren cache and recreated later. 
+
     def treeItem(self, index):
         if not index.isValid():
             return self.rootItem
         else:
-            return index.internalPointer() 
+            return index.internalPointer().child(index.row())
             
 
+    def _existingTreeItem(self, index):
+        """ Returns the tree item at the index if it exists. Returns None otherwise.
+
+            The TreeItems of sequence elements are created when they are needed. Uncreated
+            items have no fetched children.
+        """
+        if not index.isValid():
+            return self.rootItem
+        else:
+            return index.internalPointer().existing_child(index.row())
+
+
     def index(self, row, column, parent=None):
         
         if parent is None:
             logger.debug("parent is None")
             parent = QtCore.QModelIndex()
 
-        parentItem = self.treeItem(parent)
-            
-        if not self.hasIndex(row, column, parent):
-            logger.debug("hasIndex is False: ({}, {}) {!r}".format(row, column, parentItem))
-            #logger.warn("Parent index model: {!r} != {!r}".format(parent.model(), self))
-
+        parentItem = self._existingTreeItem(parent)
+        
+        # Same as hasIndex but without the overhead of calling rowCount and columnCount via Qt.
+        if not (parentItem is not None and parent.column() <= 0 and 
+                0 <= row < parentItem.child_count() and 
+                0 <= column < len(self._attr_cols)):
             return QtCore.QModelIndex()
 
-        childItem = parentItem.child(row)
-        #logger.debug("  {}".format(childItem.obj_path))
-        if childItem:
-            return self.createIndex(row, column, childItem)
-        else:
-            logger.warn("no childItem")
-            return QtCore.QModelIndex()
+        # The child TreeItem is not retrieved here. The QTreeView calls index() for all rows of 
+        # an expanded node, the TreeItems of sequence elements should only be created for the 
+        # rows of which the data is requested.
+        return self.createIndex(row, column, parentItem)
 
 
     def parent(self, index):
         if not index.isValid():
             return QtCore.QModelIndex()
 
-        child_item = index.internalPointer()
-        parent_item = child_item.parent()
+        parent_item = index.internalPointer()
 
         if parent_item is None or parent_item == self.rootItem:
             return QtCore.QModelIndex()
 
-        return self.createIndex(parent_item.row(), 0, parent_item)
+        return self.createIndex(parent_item.row(), 0, parent_item.parent())
     
 
     def rowCount(self, parent=None):
@@ -216,7 +767,8 @@ class TreeModel(QtCore.QAbstractItemModel):
             # This is taken from the PyQt simpletreemodel example.
             return 0
         else:
-            return self.treeItem(parent).child_count()
+            tree_item = self._existingTreeItem(parent)
+            return 0 if tree_item is None else tree_item.child_count()
 
 
     def hasChildren(self, parent=None):
@@ -224,7 +776,8 @@ class TreeModel(QtCore.QAbstractItemModel):
         if parent.column() > 0:
             return 0
         else:
-            return self.treeItem(parent).has_children
+            tree_item = self._existingTreeItem(parent)
+            return True if tree_item is None else tree_item.has_children
     
 
     def canFetchMore(self, parent=None):
@@ -232,7 +785,8 @@ class TreeModel(QtCore.QAbstractItemModel):
         if parent.column() > 0:
             return 0
         else:
-            result = not self.treeItem(parent).children_fetched 
+            tree_item = self._existingTreeItem(parent)
+            result = tree_item is None or not tree_item.children_fetched 
             # logger.debug("canFetchMore: {} = {}".format(parent, result))
             return result  
 
@@ -240,6 +794,9 @@ class TreeModel(QtCore.QAbstractItemModel):
     def fetchMore(self, parent=None):
         """ Fetches the children given the model index of a parent node.
             Adds the children to the parent.
+
+            If the model has a fetch page size, at most that many children are added per call.
+            In that case canFetchMore keeps returning True until all children have been fetched.
         """
         parent = QtCore.QModelIndex() if parent is None else parent
         if parent.column() > 0:
@@ -248,67 +805,23 @@ class TreeModel(QtCore.QAbstractItemModel):
         parent_item = self.treeItem(parent)
         if parent_item.children_fetched:
             return
-                
-        tree_items = self._fetchObjectChildren(parent_item.obj, parent_item.obj_path)
+
+        start_time = default_timer()
+        # Sequence elements are added before the other children.
+        n_new_elements, tree_items = fetch_children(parent_item, self._fetch_page_size,
+                                                    self._hidden_flags)
+        n_rows = n_new_elements + len(tree_items)
+        if n_rows > 0:
+            first = parent_item.child_count()
+            self.beginInsertRows(parent, first, first + n_rows - 1)
+            add_fetched_children(parent_item, n_new_elements, tree_items)
+            self.endInsertRows()
         
-        self.beginInsertRows(parent, 0, len(tree_items) - 1)
-        for tree_item in tree_items:
-            parent_item.append_child(tree_item)
-            
-        parent_item.children_fetched = True                
-        self.endInsertRows()
-        
-
-    def _fetchObjectChildren(self, obj, obj_path):
-        """ Fetches the children of a Python object. 
-            Returns: list of TreeItems
-        """
-        obj_children = []
-        path_strings = []
-        
-        if isinstance(obj, (list, tuple)):
-            obj_children = sorted(enumerate(obj))
-            path_strings = ['{}[{}]'.format(obj_path, item[0]) if obj_path else item[0] 
-                            for item in obj_children]
-        elif isinstance(obj, (set, frozenset)):
-            obj_children = [('pop()', elem) for elem in sorted(obj)]
-            path_strings = ['{0}.pop()'.format(obj_path, item[0]) if obj_path else item[0] 
-                            for item in obj_children]
-        elif hasattr(obj, 'items'): # dictionaries and the likes. 
-            try: 
-                obj_children = list(obj.items())
-            except Exception as ex:
-                # Can happen if the items method expects an argument, for instance the  
-                # types.DictType.items method expects a dictionary.
-                logger.warn("No items expanded. Objects items() call failed: {}".format(ex))
-                obj_children = []
-
-            # Sort keys, except when the object is an OrderedDict.
-            if not isinstance(obj, OrderedDict):
-                try:
-                    obj_children = sorted(obj.items())
-                except Exception as ex:
-                    logger.debug("Unable to sort dictionary keys: {}".format(ex))
-                    
-            path_strings = ['{}[{!r}]'.format(obj_path, item[0]) if obj_path else item[0] 
-                            for item in obj_children]
-        
-        assert len(obj_children) == len(path_strings), "sanity check"    
-        is_attr_list = [False] * len(obj_children)
-        
-        # Object attributes
-        for attr_name, attr_value in sorted(inspect.getmembers(obj)):
-            obj_children.append( (attr_name, attr_value) )
-            path_strings.append('{}.{}'.format(obj_path, attr_name) if obj_path else attr_name)
-            is_attr_list.append(True)
-
-        assert len(obj_children) == len(path_strings), "sanity check"
-        tree_items = []
-        for item, path_str, is_attr in zip(obj_children, path_strings, is_attr_list):
-            name, child_obj = item
-            tree_items.append(TreeItem(child_obj, name, path_str, is_attr))
-            
-        return tree_items
+        duration = default_timer() - start_time
+        self._perf_stats.add('fetch', 'fetchMore', duration)
+        if tracing.enabled:
+            tracing.record('fetch', path=parent_item.obj_path, n_rows=n_rows, 
+                           all_fetched=parent_item.children_fetched, duration=duration)
 
    
     def populateTree(self, obj, obj_name='', inspected_node_is_visible=None):
@@ -336,123 +849,370 @@ class TreeModel(QtCore.QAbstractItemModel):
             
                 
                 
-    def _auxRefreshTree(self, tree_index):
+    def _auxRefreshTree(self, tree_index, snapshot=None):
         """ Auxiliary function for refreshTree that recursively refreshes the tree nodes.
             
             If the underlying Python object has been changed, we don't want to delete the old
             tree model and create a new one from scratch because this loses all information about
-            which nodes are fetched and expanded. Instead the old tree model is updated. Using the
-            difflib from the standard library it is determined for a parent node which child nodes
-            should be added or removed. This is done based on the node names only, not on the node 
-            contents (the underlying Python objects). Testing the underlying nodes for equality
-            is potentially slow. It is faster to let the refreshNode function emit the dataChanged
-            signal for all cells.
+            which nodes are fetched and expanded. Instead the old tree model is updated. Using
+            diff_child_keys it is determined for a parent node which child nodes should be added 
+            or removed. This is done based on the node names only, not on the node contents (the
+            underlying Python objects). Testing the underlying nodes for equality is potentially
+            slow. It is faster to let the refreshNode function emit the dataChanged signal for 
+            all cells. Collapsed child nodes are not refreshed but marked as stale.
+            
+            If a _RefreshSnapshot of the node is given, the children are taken from it instead of
+            being determined from the underlying object.
         """
         tree_item = self.treeItem(tree_index)
-        logger.debug("_auxRefreshTree({}): {}{}".format(tree_index, tree_item.obj_path, 
-                                           "*" if tree_item.children_fetched else ""))
+
+        # The underlying object may have changed.
+        self._invalidateCells(tree_item)
+        tree_item.is_stale = False
         
+        if not (tree_item.children_fetched or tree_item.pending_children is not None):
+            return
+
+        from_snapshot = (snapshot is not None and snapshot.obj is tree_item.obj and 
+                         snapshot.hidden_flags == self._hidden_flags)
+        if from_snapshot:
+            obj_children = snapshot.obj_children
+            n_items = snapshot.n_items
+            item_path_template = snapshot.item_path_template
+            child_snapshots = snapshot.child_snapshots
+        else:
+            obj_children, n_items, item_path_template = object_children(tree_item.obj, 
+                                                                        self._hidden_flags)
+            child_snapshots = {}
+
+        self._refreshSequenceChildren(tree_index, child_snapshots)
+        offset = tree_item.n_sequence_children() # row number of the first child_item
+        
+        old_items = list(tree_item.child_items) # Copy, the child_items are modified below.
         if tree_item.children_fetched:
+            n_new = len(obj_children)
+        else:
+            # Only the first page(s) have been fetched. Compare them with the same number of 
+            # new children and let fetchMore continue with the remaining new children.
+            n_new = min(len(old_items), len(obj_children))
+            tree_item.pending_children = iter_tree_items(
+                obj_children, n_items, tree_item.obj_path, item_path_template, start=n_new)
+
+        old_keys = [(item.obj_name, item.is_attribute) for item in old_items]
+        new_keys = [(str(name), idx >= n_items) for idx, (name, _) in 
+                    enumerate(islice(obj_children, n_new))]
+        kept, removed_runs, inserted_runs = diff_child_keys(old_keys, new_keys)
+        if tracing.enabled:
+            tracing.record('diff', path=tree_item.obj_path, n_kept=len(kept), 
+                           removed=removed_runs, inserted=inserted_runs, 
+                           from_snapshot=from_snapshot)
+        
+        # Remove from the back so that the positions of the preceding runs remain valid.
+        for start, stop in reversed(removed_runs):
+            # The old items may have child nodes which indices must be removed by Qt, 
+            # otherwise it crashes.
+            self.beginRemoveRows(tree_index, offset + start, offset + stop - 1)
+            tree_item.remove_children(start, stop) 
+            self.endRemoveRows()
+
+        # Insert from the front; the children before a run are then equal to the new children.
+        for start, stop in inserted_runs:
+            new_items = [create_tree_item(name, child_obj, idx >= n_items, 
+                                          tree_item.obj_path, item_path_template)
+                         for idx, (name, child_obj) in 
+                         enumerate(islice(obj_children, start, stop), start)]
+            self.beginInsertRows(tree_index, offset + start, offset + stop - 1)
+            tree_item.insert_children(start, new_items)
+            self.endInsertRows()
+
+        # Only when node names are equal is _auxRefreshTree called recursively.
+        for old_pos, new_pos in kept:
+            child_item = old_items[old_pos]
+            child_item.set_obj(obj_children[new_pos][1])
+            self._refreshChild(tree_item, offset + new_pos, child_item, child_snapshots)
+
+
+    def _refreshChild(self, tree_item, row, child_item, child_snapshots):
+        """ Auxiliary function for _auxRefreshTree that refreshes a kept child node.
+        
+            Only the children of expanded nodes are refreshed recursively. Collapsed nodes with
+            fetched children are marked as stale, they are refreshed when they are expanded.
+        """
+        if not (child_item.children_fetched or child_item.pending_children is not None):
+            self._invalidateCells(child_item)
+        elif child_item.is_expanded:
+            self._auxRefreshTree(self.createIndex(row, 0, tree_item), 
+                                 child_snapshots.get(child_item))
+        else:
+            child_item.is_stale = True
+            self._invalidateCells(child_item)
+
+
+    def _refreshSequenceChildren(self, tree_index, child_snapshots):
+        """ Auxiliary function for _auxRefreshTree that updates the sequence elements of a node.
+
+            Since the elements are identified by their index, rows are only added or removed at 
+            the end of the sequence. The elements are not compared with each other. New elements
+            are only added if all old elements were fetched, otherwise fetchMore adds them.
+            The child_snapshots dictionary contains the _RefreshSnapshots of the child TreeItems.
+        """
+        tree_item = self.treeItem(tree_index)
+        sequence_children = tree_item.sequence_children
+        new_length = sequence_length(tree_item.obj) or 0
+
+        if sequence_children is None:
+            if new_length == 0:
+                return
+            sequence_children = SequenceChildren(tree_item, 0, 0)
+            tree_item.sequence_children = sequence_children
+            all_fetched = True
+        else:
+            all_fetched = len(sequence_children) == sequence_children.sequence_length
+
+        old_n_rows = len(sequence_children)
+        new_n_rows = new_length if all_fetched else min(old_n_rows, new_length)
+        
+        if new_n_rows < old_n_rows:
+            self.beginRemoveRows(tree_index, new_n_rows, old_n_rows - 1)
+            sequence_children.reset(new_n_rows, new_length)
+            self.endRemoveRows()
+        elif new_n_rows > old_n_rows:
+            self.beginInsertRows(tree_index, old_n_rows, new_n_rows - 1)
+            sequence_children.reset(new_n_rows, new_length)
+            self.endInsertRows()
+        else:
+            sequence_children.reset(new_n_rows, new_length)
             
-            old_items = tree_item.child_items
-            new_items = self._fetchObjectChildren(tree_item.obj, tree_item.obj_path)
-            
-            old_item_names = [(item.obj_name, item.is_attribute) for item in old_items]
-            new_item_names = [(item.obj_name, item.is_attribute) for item in new_items]
-            seqMatcher = SequenceMatcher(isjunk=None, a=old_item_names, b=new_item_names, 
-                                         autojunk=False)
-            opcodes = seqMatcher.get_opcodes()
-            
-            logger.debug("(reversed) opcodes: {}".format(list(reversed(opcodes))))
+        if new_length == 0:
+            tree_item.sequence_children = None
+            return
+
+        # Only the TreeItems with fetched children are kept.
+        for row, item in sequence_children.fetched_items():
+            item.set_obj(tree_item.obj[row])
+            self._refreshChild(tree_item, row, item, child_snapshots)
+
+        
+    def setItemExpanded(self, index, expanded):
+        """ Must be called when the node at the index is expanded or collapsed in the view.
+        
+            When a stale node is expanded, its children are refreshed. Refreshing only recurses
+            into expanded nodes so that its duration depends on what is visible.
+        """
+        tree_item = self.treeItem(index)
+        tree_item.is_expanded = expanded
+        if not (expanded and tree_item.is_stale):
+            return
+        
+        start_time = default_timer()
+        self._auxRefreshTree(index)
+        n_rows = self.rowCount(index)
+        if n_rows > 0:
+            self.dataChanged.emit(self.index(0, 0, parent=index),
+                                  self.index(n_rows - 1, self.columnCount() - 1, parent=index))
+        duration = default_timer() - start_time
+        self._perf_stats.add('refresh', 'stale node', duration)
+        if tracing.enabled:
+            tracing.record('stale_refresh', path=tree_item.obj_path, duration=duration)
+        
+        
+    def _refreshPlan(self, tree_item):
+        """ Returns the nodes that must be refreshed as a tree of (tree_item, child_plans) tuples.
+        
+            Only expanded nodes with (partially) fetched children are included, the other nodes
+            are marked as stale when the plan is applied. The child_plans is a list 
+            of (key, plan) tuples where the key is the row of a sequence element or the
+            (obj_name, is_attribute) tuple of another child. The plan is made in the GUI thread
+            so that the background thread doesn't access the TreeItems while they are modified.
+        """
+        child_plans = []
+        if tree_item.sequence_children is not None:
+            for row, item in tree_item.sequence_children.fetched_items():
+                if item.is_expanded:
+                    child_plans.append((row, self._refreshPlan(item)))
             
-            for tag, i1, i2, j1, j2 in reversed(opcodes):
-                
-                if 1 or tag != 'equal':
-                    logger.debug("  {:7s}, a[{}:{}] ({}), b[{}:{}] ({})"
-                                 .format(tag, i1, i2, old_item_names[i1:i2], j1, j2, new_item_names[j1:j2]))
+        for item in tree_item.child_items:
+            if item.is_expanded and (item.children_fetched or item.pending_children is not None):
+                child_plans.append(((item.obj_name, item.is_attribute), self._refreshPlan(item)))
                 
-                if tag == 'equal':
-                    # Only when node names are equal is _auxRefreshTree called recursively.
-                    assert i2-i1 == j2-j1, "equal sanity check failed {} != {}".format(i2-i1, j2-j1)
-                    for old_row, new_row in zip(range(i1, i2), range(j1, j2)):
-                        old_items[old_row].obj = new_items[new_row].obj
-                        child_index = self.index(old_row, 0, parent=tree_index)
-                        self._auxRefreshTree(child_index) 
-
-                elif tag == 'replace':
-                    # Explicitly remove the old item and insert the new. The old item may have
-                    # child nodes which indices must be removed by Qt, otherwise it crashes.
-                    assert i2-i1 == j2-j1, "replace sanity check failed {} != {}".format(i2-i1, j2-j1)
-                    
-                    first = i1          # row number of first that will be removed
-                    last  = i1 + i2 - 1 # row number of last element after insertion
-                    logger.debug("     calling beginRemoveRows({}, {}, {})".format(tree_index, first, last)) 
-                    self.beginRemoveRows(tree_index, first, last)
-                    del tree_item.child_items[i1:i2] 
-                    self.endRemoveRows()                    
-
-                    first = i1               # row number of first element after insertion 
-                    last  = i1 + j2 - j1 - 1 # row number of last element after insertion
-                    logger.debug("     calling beginInsertRows({}, {}, {})".format(tree_index, first, last)) 
-                    self.beginInsertRows(tree_index, first, last)
-                    tree_item.insert_children(i1, new_items[j1:j2])
-                    self.endInsertRows()
-                    
-                elif tag == 'delete':
-                    assert j1 == j2, "delete sanity check failed. {} != {}".format(j1, j2)
-                    first = i1          # row number of first that will be removed
-                    last  = i1 + i2 - 1 # row number of last element after insertion
-                    logger.debug("     calling beginRemoveRows({}, {}, {})".format(tree_index, first, last)) 
-                    self.beginRemoveRows(tree_index, first, last)
-                    del tree_item.child_items[i1:i2] 
-                    self.endRemoveRows()
-                                            
-                elif tag == 'insert':
-                    assert i1 == i2, "insert sanity check failed. {} != {}".format(i1, i2)
-                    first = i1               # row number of first element after insertion 
-                    last  = i1 + j2 - j1 - 1 # row number of last element after insertion
-                    logger.debug("     calling beginInsertRows({}, {}, {})".format(tree_index, first, last)) 
-                    self.beginInsertRows(tree_index, first, last)
-                    tree_item.insert_children(i1, new_items[j1:j2])
-                    self.endInsertRows()
+        return (tree_item, child_plans)
 
-                else:
-                    raise ValueError("Invalid tag: {}".format(tag))
+    
+    def _takeRefreshSnapshot(self, plan, obj):
+        """ Determines the children of obj and recursively of its children in the refresh plan.
+        
+            Is called in a background thread. Returns a _RefreshSnapshot.
+        """
+        _tree_item, child_plans = plan
+        hidden_flags = self._hidden_flags
+        obj_children, n_items, item_path_template = object_children(obj, hidden_flags)
+        snapshot = _RefreshSnapshot(obj, hidden_flags, obj_children, n_items, item_path_template)
+        if not child_plans:
+            return snapshot
+        
+        new_children = {}
+        duplicate_keys = set()
+        for idx, (name, child_obj) in enumerate(obj_children):
+            key = (str(name), idx >= n_items)
+            if key in new_children:
+                duplicate_keys.add(key)
+            new_children[key] = child_obj
+            
+        n_elements = sequence_length(obj) or 0
+        for key, child_plan in child_plans:
+            if isinstance(key, tuple):
+                # Duplicate keys, e.g. set elements, are refreshed in the GUI thread.
+                if key not in new_children or key in duplicate_keys:
+                    continue
+                child_obj = new_children[key]
+            else:
+                if key >= n_elements:
+                    continue
+                child_obj = obj[key]
+            snapshot.child_snapshots[child_plan[0]] = self._takeRefreshSnapshot(child_plan, 
+                                                                                child_obj)
+        return snapshot
+
+
+    def getHiddenFlags(self):
+        """ Returns the treeitem flags of the attributes that are left out of the model.
+        """
+        return self._hidden_flags
+
+
+    def setHiddenFlags(self, hidden_flags):
+        """ Sets the treeitem flags of the attributes that are left out of the model.
+
+            The fetched children of the expanded nodes are updated at once by refreshing the 
+            tree. Collapsed nodes are marked as stale and updated when they are expanded.
+        """
+        if hidden_flags == self._hidden_flags:
+            return
+        logger.debug("setHiddenFlags: {}".format(hidden_flags))
+        self._hidden_flags = hidden_flags
+        self.refreshTree()
+
+
+    def isRefreshing(self):
+        """ Returns True if a refresh that was started by requestRefresh is running.
+        """
+        return self._refresh_start_time is not None
+    
+    
+    def requestRefresh(self):
+        """ Refreshes the tree model from the underlying root object in the background.
+        
+            The children of the nodes are determined in a background thread, only the resulting
+            changes are applied to the tree in the GUI thread. If a refresh is already running, 
+            a single new refresh is started after it has finished, no matter how many times 
+            requestRefresh was called in the meantime. Emits refreshFinished when done.
+        """
+        if self.isRefreshing():
+            self._refresh_requested = True
+        else:
+            self._startRefresh()
+            
+            
+    def _startRefresh(self):
+        """ Makes the refresh plan and submits it to the background thread.
+        """
+        self._refresh_requested = False
+        self._refresh_start_time = default_timer()
+        inspected_item = self.treeItem(self.inspectedIndex())
+        plan = self._refreshPlan(inspected_item)
+        self._refresh_pool.submit('refresh', self._takeRefreshSnapshot, plan, inspected_item.obj)
+        
+        
+    def _onRefreshSnapshotTaken(self, job):
+        """ Applies the snapshot of a background refresh to the tree. 
+        
+            Starts a new refresh if one was requested while this refresh was running.
+        """
+        if job.exception is not None:
+            logger.error("Unable to refresh the tree: {}".format(job.exception))
+            logger.debug(job.stack_trace)
+        else:
+            self._applyRefresh(job.result)
             
+        duration = default_timer() - self._refresh_start_time
+        self._refresh_start_time = None
+        self._perf_stats.add('refresh', 'background', duration)
+        self._perf_stats.add('refresh', 'background snapshot', job.duration)
+        if tracing.enabled:
+            tracing.record('refresh', background=True, duration=duration, 
+                           snapshot_duration=job.duration)
+        self.refreshFinished.emit(duration)
         
+        if self._refresh_requested:
+            self._startRefresh()
+            
+
     def refreshTree(self):
         """ Refreshes the tree model from the underlying root object (which may have been changed).
+        
+            The refresh is done synchronously. Use requestRefresh to determine the children
+            in a background thread. Emits refreshFinished when done.
         """
-        logger.info("")
-        logger.info("refreshTree: {}".format(self.rootItem))
+        start_time = default_timer()
+        self._applyRefresh(None)
+        duration = default_timer() - start_time
+        self._perf_stats.add('refresh', 'refreshTree', duration)
+        if tracing.enabled:
+            tracing.record('refresh', background=False, duration=duration)
+        self.refreshFinished.emit(duration)
         
+        
+    def _applyRefresh(self, snapshot):
+        """ Refreshes the tree using the _RefreshSnapshot of the inspected node (or None).
+        
+            The dataChanged signal is not emitted for the cells of the refreshed nodes, this is
+            done by updateChangedCells for the cells that have changed. It is only emitted for
+            the expensive cells of which the calculation was cancelled by the refresh.
+        """
         root_item = self.treeItem(self.rootIndex())
-        logger.info("  root_item:      {} (idx={})".format(root_item, self.rootIndex()))
         inspected_item = self.treeItem(self.inspectedIndex())
-        logger.info("  inspected_item: {} (idx={})".format(inspected_item, self.inspectedIndex()))
-        
         assert (root_item is inspected_item) != self.inspectedNodeIsVisible, "sanity check"
         
-        self._auxRefreshTree(self.inspectedIndex())
-        
-        root_obj = self.rootItem.obj
-        logger.debug("After _auxRefreshTree, root_obj: {}".format(cut_off_str(root_obj, 80)))
-        self.rootItem.pretty_print()
+        # The cells that are being calculated may belong to objects that have changed.
+        cancelled_cells = set(self._worker_pool.cancelAll())
+        cancelled_cells.update(self._placeholder_cells)
+        self._placeholder_cells.clear()
+        self._stale_fingerprints = {}
+        self._stale_sort_keys = {}
+        self._auxRefreshTree(self.inspectedIndex(), snapshot)
         
-        # Emit the dataChanged signal for all cells. This is faster than checking which nodes
-        # have changed, which may be slow for some underlying Python objects.
-        n_rows = self.rowCount()
-        n_cols = self.columnCount()
-        top_left = self.index(0, 0)
-        bottom_right = self.index(n_rows-1, n_cols-1)
-        
-        logger.debug("bottom_right: ({}, {})".format(bottom_right.row(), bottom_right.column()))
-        self.dataChanged.emit(top_left, bottom_right)
+        # Let the view request the cancelled cells again, otherwise they would keep showing the
+        # placeholder (or their old value) until they are repainted for another reason.
+        for tree_item, col in cancelled_cells:
+            index = self._itemIndex(tree_item, col)
+            if index.isValid():
+                self.dataChanged.emit(index, index)
         
 
+
+def _consecutive_runs(numbers):
+    """ Returns the (first, last) tuples of the runs of consecutive numbers in a sorted sequence.
+    """
+    runs = []
+    for number in numbers:
+        if runs and runs[-1][1] == number - 1:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+    return [tuple(run) for run in runs]
+
     
 class TreeProxyModel(QtCore.QSortFilterProxyModel):
     """ Proxy model that overrides the sorting and can filter out items
+
+        The rows are sorted by the sort keys of the TreeModel, which are cached per tree item.
+
+        Besides hiding callable and special attributes, the rows can be filtered by name (or
+        by path if the filter text contains a '.' or '['). The nodes that match, their
+        ancestors and their descendants are shown. Only the fetched nodes are searched. The 
+        matches are looked up in a NameIndex. Rows that are inserted in the source model, e.g. 
+        by fetchMore or a refresh, are added to the index in time slices of NAME_INDEX_SLICE_MS
+        when the event loop is idle, so that the first keystroke doesn't index the whole tree.
     """
     def __init__(self,
                  show_callable_attributes = True,
@@ -472,6 +1232,39 @@ class TreeProxyModel(QtCore.QSortFilterProxyModel):
 
         self._show_callables = show_callable_attributes
         self._show_special_attributes = show_special_attributes
+        self._hidden_flags = hidden_attribute_flags(show_callable_attributes, 
+                                                    show_special_attributes)
+
+        self._name_filter = ''       # lowercase filter text
+        self._filter_on_path = False
+        self._name_index = NameIndex()  # NameIndex of the child_items of the fetched nodes
+        self._pending_index_items = deque()  # [items, position] lists of the rows to be indexed
+        self._root_path_len = 0      # length of the inspected path, which is not searched
+        self._matching_items = set()
+        self._visible_items = set()  # the matching items and their ancestors
+
+        self._index_timer = QtCore.QTimer(self)
+        self._index_timer.setSingleShot(True)
+        self._index_timer.setInterval(0)
+        self._index_timer.timeout.connect(self._indexPendingItems)
+
+
+    def setSourceModel(self, source_model):
+        """ Sets the TreeModel. The name index is kept up to date when rows are inserted or 
+            removed.
+        """
+        old_model = self.sourceModel()
+        if old_model is not None:
+            old_model.rowsInserted.disconnect(self._onSourceRowsInserted)
+            old_model.rowsAboutToBeRemoved.disconnect(self._onSourceRowsAboutToBeRemoved)
+            old_model.modelReset.disconnect(self._resetNameIndex)
+        super(TreeProxyModel, self).setSourceModel(source_model)
+        self._name_filter = ''
+        self._resetNameIndex()
+        if source_model is not None:
+            source_model.rowsInserted.connect(self._onSourceRowsInserted)
+            source_model.rowsAboutToBeRemoved.connect(self._onSourceRowsAboutToBeRemoved)
+            source_model.modelReset.connect(self._resetNameIndex)
 
 
     def treeItem(self, proxy_index):
@@ -490,18 +1283,293 @@ class TreeProxyModel(QtCore.QSortFilterProxyModel):
         return first_item_index
             
 
+    def lessThan(self, leftIndex, rightIndex):
+        """ Compares the cached sort keys of the source model. 
+        
+            The keys are compared directly instead of via the sortRole data, which would convert 
+            them to and from QVariants. Equal keys keep their source order.
+        """
+        source_model = self.sourceModel()
+        return source_model.sortKey(leftIndex) < source_model.sortKey(rightIndex)
+    
+
     def filterAcceptsRow(self, sourceRow, sourceParentIndex):
         """ Returns true if the item in the row indicated by the given source_row and 
             source_parent should be included in the model.
         """
         parent_item = self.sourceModel().treeItem(sourceParentIndex)
+        if sourceRow < parent_item.n_sequence_children():
+            # Sequence elements are not attributes and are only hidden by the name filter.
+            return not self._name_filter or self._acceptsSequenceElement(parent_item, sourceRow)
+        
         tree_item = parent_item.child(sourceRow)
+        accept = self._attributeFilterAccepts(tree_item)
         
-        accept = ((self._show_special_attributes or not tree_item.is_special_attribute) and
-                  (self._show_callables or not tree_item.is_callable_attribute))
-
-        #logger.debug("filterAcceptsRow = {}: {}".format(accept, tree_item))
+        # The inspected node is always shown, it is the ancestor of all matches.
+        if accept and self._name_filter and tree_item is not self.sourceModel().inspectedItem:
+            if tree_item not in self._name_index:
+                # The row has been fetched after the index was built.
+                self._indexItem(tree_item)
+            accept = (tree_item in self._visible_items or 
+                      self._hasMatchingAncestor(parent_item))
         return accept
+
+
+    def _attributeFilterAccepts(self, tree_item):
+        """ Returns False if the tree_item is hidden because it is a callable or special attribute.
+        """
+        return not tree_item.flags & self._hidden_flags
+
+
+    def _acceptsSequenceElement(self, parent_item, row):
+        """ Returns True if the sequence element at the row matches the name filter, or if it 
+            is an ancestor or descendant of a matching node.
+        """
+        if self._hasMatchingAncestor(parent_item):
+            return True
+        item = parent_item.sequence_children.cached_item(row)
+        if item is not None and item in self._visible_items:
+            return True
+        # The elements of range nodes are indexed from the start of the sequence.
+        sequence_path, offset = sequence_path_and_offset(parent_item)
+        if self._filter_on_path:
+            parent_path = (self._name_index.key(parent_item).partition('\n')[0] 
+                           if (not isinstance(parent_item.obj, SequenceRange) and 
+                               parent_item in self._name_index) else
+                           sequence_path[self._root_path_len:].lower())
+            return self._name_filter in '{}[{}]'.format(parent_path, offset + row)
+        else:
+            return self._name_filter in str(offset + row)
+
+
+    def _hasMatchingAncestor(self, tree_item):
+        """ Returns True if the tree_item or one of its ancestors matches the name filter.
+        """
+        matching_items = self._matching_items
+        while tree_item is not None:
+            if tree_item in matching_items:
+                return True
+            tree_item = tree_item.parent_item
+        return False
+
+
+    def _indexItem(self, tree_item):
+        """ Adds the tree_item to the name index. If it matches the name filter, it and its
+            ancestors are made visible.
+        """
+        # The key is the path relative to the inspected node. It usually contains the name, 
+        # otherwise (e.g. for dictionary keys with escaped characters) the name is appended
+        # after a newline. This way the index can be used to search both.
+        key = tree_item.obj_path[self._root_path_len:]
+        if tree_item.obj_name not in key:
+            key = '{}\n{}'.format(key, tree_item.obj_name)
+        self._name_index.add(tree_item, key)
+        if (self._name_filter and self._name_filter in self._nameFilterKey(tree_item) and
+                self._attributeFilterAccepts(tree_item)):
+            self._addMatch(tree_item)
+
+
+    def _nameFilterKey(self, tree_item):
+        """ Returns the part of the indexed key that is searched by the current name filter.
+        """
+        if self._filter_on_path:
+            return self._name_index.key(tree_item).partition('\n')[0]
+        else:
+            return tree_item.obj_name.lower()
+
+
+    def _addMatch(self, tree_item):
+        """ Adds a matching item and makes its ancestors visible.
+        """
+        self._matching_items.add(tree_item)
+        while tree_item is not None and tree_item not in self._visible_items:
+            self._visible_items.add(tree_item)
+            tree_item = tree_item.parent_item
+
+
+    def _resetNameIndex(self):
+        """ Clears the name index and schedules the indexing of the fetched nodes.
+        """
+        self._name_index = NameIndex()
+        self._pending_index_items.clear()
+        self._matching_items = set()
+        self._visible_items = set()
+        source_model = self.sourceModel()
+        if source_model is None:
+            return
+        inspected_item = source_model.inspectedItem
+        self._root_path_len = (len(inspected_item.obj_path) 
+                               if source_model.inspectedNodeIsVisible else 0)
+        stack = [inspected_item]
+        while stack:
+            tree_item = stack.pop()
+            self._queueIndexItems(tree_item.child_items)
+            stack.extend(tree_item.child_items)
+            if tree_item.sequence_children is not None:
+                stack.extend(tree_item.sequence_children.existing_items())
+
+
+    def _queueIndexItems(self, tree_items):
+        """ Schedules the tree_items to be added to the name index when the event loop is idle.
+        """
+        if tree_items:
+            self._pending_index_items.append([tree_items, 0])
+            if not self._index_timer.isActive():
+                self._index_timer.start()
+
+
+    def hasPendingIndexItems(self):
+        """ Returns True if there are fetched rows that have not been added to the name index.
+        """
+        return bool(self._pending_index_items)
+
+
+    def _indexPendingItems(self, time_limit=NAME_INDEX_SLICE_MS / 1000.0):
+        """ Adds the pending items to the name index for at most time_limit seconds. Restarts 
+            the index timer if items remain. If time_limit is None, all items are indexed.
+        """
+        start_time = default_timer()
+        pending_items = self._pending_index_items
+        name_index = self._name_index
+        n_indexed = 0
+        while pending_items:
+            if time_limit is not None and default_timer() - start_time > time_limit:
+                self._index_timer.start()
+                break
+            items, pos = pending_items[0]
+            stop = min(pos + 100, len(items))
+            for tree_item in items[pos:stop]:
+                # Rows that have been filtered while a name filter was active are indexed.
+                if tree_item not in name_index:
+                    self._indexItem(tree_item)
+            n_indexed += stop - pos
+            if stop < len(items):
+                pending_items[0][1] = stop
+            else:
+                pending_items.popleft()
+        if tracing.enabled:
+            tracing.record('name_index', n_items=n_indexed, 
+                           duration=default_timer() - start_time)
+
+
+    def _onSourceRowsInserted(self, parent, first, last):
+        """ Schedules the indexing of the inserted rows.
+        """
+        parent_item = self.sourceModel().treeItem(parent)
+        # Sequence elements are not indexed, they are matched by their row number.
+        n_elements = parent_item.n_sequence_children()
+        if last >= n_elements:
+            self._queueIndexItems(
+                parent_item.child_items[max(0, first - n_elements):last + 1 - n_elements])
+
+
+    def _onSourceRowsAboutToBeRemoved(self, parent, first, last):
+        """ Removes the items of the rows and their descendants from the name index.
+        """
+        # The removed items may be pending, they are indexed first so that they are removed.
+        self._indexPendingItems(time_limit=None)
+        parent_item = self.sourceModel().treeItem(parent)
+        stack = [item for item in (parent_item.existing_child(row) 
+                                   for row in range(first, last + 1)) if item is not None]
+        while stack:
+            tree_item = stack.pop()
+            self._name_index.remove(tree_item)
+            self._matching_items.discard(tree_item)
+            self._visible_items.discard(tree_item)
+            stack.extend(tree_item.child_items)
+            if tree_item.sequence_children is not None:
+                stack.extend(tree_item.sequence_children.existing_items())
+
+
+    def getNameFilter(self):
+        return self._name_filter
+
+
+    def setNameFilter(self, text):
+        """ Only shows the nodes of which the name contains the text (case insensitive), and
+            their ancestors and descendants. If the text contains a '.' or '[', the path 
+            is searched instead of the name. An empty text removes the filter.
+
+            Returns the number of matching nodes.
+        """
+        text = text.strip().lower()
+        filter_on_path = '.' in text or '[' in text
+        if text == self._name_filter:
+            return len(self._matching_items)
+
+        if not text:
+            self._name_filter = ''
+            self._matching_items = set()
+            self._visible_items = set()
+            self.invalidateFilter()
+            return 0
+
+        # Usually the rows have been indexed in the background already.
+        self._indexPendingItems(time_limit=None)
+
+        # When characters are added to the filter, only the previous matches can still match.
+        if (self._name_filter and self._name_filter in text and
+                filter_on_path == self._filter_on_path):
+            candidates = self._matching_items
+        else:
+            candidates = None
+
+        old_filter = self._name_filter
+        old_matching_items, old_visible_items = self._matching_items, self._visible_items
+        self._name_filter = text
+        self._filter_on_path = filter_on_path
+        self._updateNameFilterMatches(candidates)
+        if old_filter:
+            self._refilterChangedRows(old_matching_items, old_visible_items)
+        else:
+            self.invalidateFilter()
+        return len(self._matching_items)
+
+
+    def _refilterChangedRows(self, old_matching_items, old_visible_items):
+        """ Lets the proxy filter the rows of which the visibility may have changed.
+
+            Instead of invalidating the filter, which calls filterAcceptsRow for all rows, the
+            source model emits dataChanged for the rows that are (no longer) the ancestor of a
+            match and for the descendants of the nodes that are (no longer) a match. Because the
+            proxy has a dynamic filter, it then filters only these rows.
+        """
+        changed_rows = {} # parent_item -> set of rows, or None for all rows
+        for tree_item in old_visible_items.symmetric_difference(self._visible_items):
+            parent_item = tree_item.parent_item
+            if parent_item is not None:
+                rows = changed_rows.setdefault(parent_item, set())
+                if rows is not None:
+                    rows.add(tree_item.row())
+
+        stack = list(old_matching_items.symmetric_difference(self._matching_items))
+        while stack:
+            tree_item = stack.pop()
+            if tree_item.child_count() > 0:
+                changed_rows[tree_item] = None
+            stack.extend(item for item in tree_item.child_items 
+                         if item.children_fetched or item.pending_children is not None)
+            if tree_item.sequence_children is not None:
+                stack.extend(item for _, item in tree_item.sequence_children.fetched_items())
+
+        source_model = self.sourceModel()
+        for parent_item, rows in changed_rows.items():
+            n_rows = parent_item.child_count()
+            rows = range(n_rows) if rows is None else sorted(row for row in rows if row < n_rows)
+            for first, last in _consecutive_runs(rows):
+                source_model.emitRowsChanged(parent_item, first, last)
+
+
+    def _updateNameFilterMatches(self, candidates=None):
+        """ Searches the items that match the name filter, from the candidates if given.
+        """
+        matching_items = self._name_index.search(self._name_filter, candidates, 
+                                                 key_fn=self._nameFilterKey)
+        self._matching_items = set()
+        self._visible_items = set()
+        for tree_item in matching_items:
+            if self._attributeFilterAccepts(tree_item):
+                self._addMatch(tree_item)
     
     
     def getShowCallables(self):
@@ -514,6 +1582,10 @@ class TreeProxyModel(QtCore.QSortFilterProxyModel):
         """
         logger.debug("setShowCallables: {}".format(show_callables))
         self._show_callables = show_callables
+        self._hidden_flags = hidden_attribute_flags(self._show_callables, 
+                                                    self._show_special_attributes)
+        if self._name_filter:
+            self._updateNameFilterMatches()
         self.invalidateFilter()
 
 
@@ -527,5 +1599,9 @@ class TreeProxyModel(QtCore.QSortFilterProxyModel):
         """
         logger.debug("setShowSpecialAttributes: {}".format(show_special_attributes))
         self._show_special_attributes = show_special_attributes
+        self._hidden_flags = hidden_attribute_flags(self._show_callables, 
+                                                    self._show_special_attributes)
+        if self._name_filter:
+            self._updateNameFilterMatches()
         self.invalidateFilter()
         
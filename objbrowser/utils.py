@@ -1,6 +1,7 @@
 
-import logging
+import logging, sys, pprint, threading
 import six
+from timeit import default_timer
 
 logger = logging.getLogger(__name__)
 
@@ -41,11 +42,288 @@ def setting_str_to_bool(s):
 def cut_off_str(obj, max_len):
     """ Creates a string representation of an object, no longer than max_len characters
         
-        Uses repr(obj) to create the string representation. If this is longer than max_len -3 
+        Uses repr(obj) to create the string representation. If this is longer than max_len 
         characters, the last three will be replaced with elipsis.
     """
-    s = repr(obj)
-    if len(s) > max_len - 3:
-        s = s[:max_len - 3] + '...'
+    return bounded_repr(obj, max_len)
+
+
+# Opening and closing brackets of the builtin containers of which iter_repr generates the 
+# representation element by element. The str() of these types is the same as their repr().
+_CONTAINER_BRACKETS = {
+    list: ('[', ']'),
+    tuple: ('(', ')'),
+    dict: ('{', '}'),
+    set: ('{', '}'),
+    frozenset: ('frozenset({', '})'),
+}
+
+# Long strings are converted with repr() in chunks of this many characters.
+_STR_CHUNK_LEN = 10000
+
+
+def iter_repr(obj, _active_ids=None):
+    """ Generates the repr() of an object in chunks so that the caller can stop early.
+    
+        Lists, tuples, dicts, sets, frozensets and strings are generated piece by piece. 
+        The repr() of other objects is generated in one go. 
+    """
+    brackets = _CONTAINER_BRACKETS.get(type(obj))
+    if brackets is None:
+        if isinstance(obj, (six.text_type, six.binary_type)) and len(obj) > _STR_CHUNK_LEN:
+            for chunk in _iter_long_str_repr(obj):
+                yield chunk
+        else:
+            yield repr(obj)
+        return
+
+    if not obj:
+        if type(obj) is set:
+            yield 'set()'
+        elif type(obj) is frozenset:
+            yield 'frozenset()'
+        else:
+            yield brackets[0] + brackets[1]
+        return
+
+    if _active_ids is None:
+        _active_ids = set()
+    if id(obj) in _active_ids:
+        yield brackets[0] + '...' + brackets[1]  # Recursive container
+        return
+    _active_ids.add(id(obj))
+
+    yield brackets[0]
+    if type(obj) is dict:
+        for idx, (key, value) in enumerate(six.iteritems(obj)):
+            check_time_budget()
+            if idx > 0:
+                yield ', '
+            for chunk in iter_repr(key, _active_ids):
+                yield chunk
+            yield ': '
+            for chunk in iter_repr(value, _active_ids):
+                yield chunk
+    else:
+        for idx, elem in enumerate(obj):
+            check_time_budget()
+            if idx > 0:
+                yield ', '
+            for chunk in iter_repr(elem, _active_ids):
+                yield chunk
+        if type(obj) is tuple and len(obj) == 1:
+            yield ','
+    yield brackets[1]
+
+    _active_ids.discard(id(obj))
+
+
+def _iter_long_str_repr(obj):
+    """ Generates the repr() of a long (byte) string in chunks of _STR_CHUNK_LEN characters.
+    """
+    # Use the same quotes as repr(): double quotes only if the string contains single quotes
+    # and no double quotes. The chunks may use different quotes, their escapes are adjusted.
+    single, double = ("'", '"') if isinstance(obj, six.text_type) else (b"'", b'"')
+    quote = '"' if single in obj and double not in obj else "'"
+    for start in range(0, len(obj), _STR_CHUNK_LEN):
+        check_time_budget()
+        chunk_repr = repr(obj[start:start + _STR_CHUNK_LEN])
+        chunk_quote = chunk_repr[-1]
+        prefix_len = chunk_repr.index(chunk_quote)
+        body = chunk_repr[prefix_len + 1:-1]
+        if chunk_quote != quote:
+            body = body.replace('\\' + chunk_quote, chunk_quote).replace(quote, '\\' + quote)
+        if start == 0:
+            body = chunk_repr[:prefix_len] + quote + body # e.g. b' or u'
+        yield body
+    yield quote
+
+
+def _join_bounded(chunks, max_len):
+    """ Joins the chunks until the result is longer than max_len characters.
+    
+        If the result is longer than max_len, it is cut off and ends with an ellipsis.
+    """
+    parts = []
+    length = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        length += len(chunk)
+        if length > max_len:
+            break
+    return _cut_off(''.join(parts), max_len)
+
+
+def _cut_off(s, max_len):
+    """ Replaces the end of s with an ellipsis if it is longer than max_len characters.
+    """
+    if len(s) > max_len:
+        s = s[:max(max_len - 3, 0)] + '...'
     return s
-    
\ No newline at end of file
+
+
+def bounded_repr(obj, max_len):
+    """ Returns repr(obj) but no longer than max_len characters.
+    
+        The formatting of builtin containers and strings stops when the limit is reached so that
+        no giant strings are created for large objects.
+    """
+    return _join_bounded(iter_repr(obj), max_len)
+
+
+def bounded_str(obj, max_len):
+    """ Returns str(obj) but no longer than max_len characters.
+    
+        The formatting of builtin containers and strings stops when the limit is reached so that
+        no giant strings are created for large objects.
+    """
+    return _bounded_str(obj, max_len, str)
+
+
+def bounded_unicode(obj, max_len):
+    """ Returns the unicode representation of obj but no longer than max_len characters.
+        Uses unicode() in Python 2 and str() in Python 3.
+    """
+    return _bounded_str(obj, max_len, six.text_type)
+
+
+def _bounded_str(obj, max_len, str_fn):
+    """ Returns str_fn(obj) but no longer than max_len characters.
+    """
+    if type(obj) in _CONTAINER_BRACKETS:
+        return bounded_repr(obj, max_len)
+    elif isinstance(obj, (six.text_type, six.binary_type)):
+        return _cut_off(str_fn(obj[:max_len + 1]), max_len)
+    else:
+        return _cut_off(str_fn(obj), max_len)
+
+
+class _BoundedStreamFull(Exception):
+    """ Raised by the _BoundedStream when the maximum length has been exceeded.
+    """
+    pass
+
+
+class _BoundedStream(object):
+    """ Stream that raises _BoundedStreamFull when more than max_len characters are written.
+    """
+    def __init__(self, max_len):
+        self.max_len = max_len
+        self._parts = []
+        self._length = 0
+
+    def write(self, s):
+        """ Adds s to the stream """
+        check_time_budget()
+        self._parts.append(s)
+        self._length += len(s)
+        if self._length > self.max_len:
+            raise _BoundedStreamFull()
+
+    def getvalue(self):
+        """ Returns the contents of the stream. Can be longer than max_len. """
+        return ''.join(self._parts)
+
+
+class _BoundedPrettyPrinter(pprint.PrettyPrinter):
+    """ PrettyPrinter that uses bounded representations for the (sub)objects.
+    """
+    def __init__(self, max_len, **kwargs):
+        pprint.PrettyPrinter.__init__(self, **kwargs) # Old style class in Python 2
+        self._max_len = max_len
+
+    def format(self, obj, context, maxlevels, level):
+        """ Returns the bounded repr of the object and the readable and recursive flags.
+        """
+        return bounded_repr(obj, self._max_len), False, False
+
+
+def bounded_pformat(obj, max_len, indent=4):
+    """ Returns pprint.pformat(obj) but no longer than max_len characters.
+    
+        The pretty printer stops when the limit is reached. In Python 3.8 and higher, the items
+        of dictionaries are printed in insertion order instead of sorted by key.
+    """
+    stream = _BoundedStream(max_len)
+    kwargs = {}
+    if sys.version_info >= (3, 8):
+        kwargs['sort_dicts'] = False # Sorting a large dict is slow and is not bounded.
+    printer = _BoundedPrettyPrinter(max_len, indent=indent, stream=stream, **kwargs)
+    try:
+        printer.pprint(obj)
+    except _BoundedStreamFull:
+        pass
+    s = stream.getvalue()
+    if s.endswith('\n'):
+        s = s[:-1] # Remove the newline that is added by pprint
+    return _cut_off(s, max_len)
+
+
+class TimeBudgetExceeded(BaseException):
+    """ Raised by call_with_time_budget when a function runs longer than its time budget.
+
+        Derives from BaseException so that it is not caught by `except Exception` clauses in
+        the code of the inspected objects.
+    """
+    def __init__(self, time_budget):
+        super(TimeBudgetExceeded, self).__init__(
+            "Exceeded the time budget of {:g} seconds".format(time_budget))
+        self.time_budget = time_budget
+
+
+# The deadline of the innermost call_with_time_budget per thread, as a (deadline, time_budget)
+# tuple. The data functions check it with check_time_budget.
+_time_budget_state = threading.local()
+
+
+def check_time_budget():
+    """ Raises TimeBudgetExceeded if the time budget of the call_with_time_budget that is active in 
+        the current thread has passed. Does nothing if no time budget is active.
+
+        Long running functions, such as the bounded formatters, call this regularly so that 
+        they can be cancelled.
+    """
+    deadline = getattr(_time_budget_state, 'deadline', None)
+    if deadline is not None and default_timer() > deadline[0]:
+        raise TimeBudgetExceeded(deadline[1])
+
+
+def call_with_time_budget(fn, args, time_budget):
+    """ Calls fn(*args) and raises TimeBudgetExceeded if it takes longer than time_budget seconds.
+
+        The cancellation is cooperative: the deadline is only checked when fn calls 
+        check_time_budget, e.g. in iter_repr, bounded_pformat and array_stats. Other code, such 
+        as the __repr__ of an inspected object, cannot be interrupted. A result that is ready 
+        after the deadline is still returned. Nested calls use the earliest deadline. If 
+        time_budget is None, fn is called without (a new) budget.
+    """
+    if time_budget is None:
+        return fn(*args)
+
+    old_deadline = getattr(_time_budget_state, 'deadline', None)
+    deadline = (default_timer() + time_budget, time_budget)
+    if old_deadline is not None and old_deadline[0] < deadline[0]:
+        deadline = old_deadline
+    _time_budget_state.deadline = deadline
+    try:
+        return fn(*args)
+    finally:
+        _time_budget_state.deadline = old_deadline
+
+
+def iter_with_time_budget(chunks, time_budget):
+    """ Generates the chunks of an iterable, each of which must be produced in time_budget seconds.
+
+        If producing a chunk exceeds the budget (see call_with_time_budget), a timeout message 
+        is generated instead and the iteration stops.
+    """
+    iterator = iter(chunks)
+    while True:
+        try:
+            chunk = call_with_time_budget(next, (iterator, ), time_budget)
+        except StopIteration:
+            return
+        except TimeBudgetExceeded as ex:
+            yield "\n**TIMEOUT**: {}".format(ex)
+            return
+        yield chunk
@@ -0,0 +1,194 @@
+""" Module that defines the WorkerPool for evaluating functions in background threads.
+"""
+from __future__ import absolute_import
+
+import logging, threading, traceback
+from collections import deque
+from timeit import default_timer
+
+from objbrowser.qtpy import QtCore
+
+logger = logging.getLogger(__name__)
+
+# Default number of worker threads. Data functions are typically pure Python code that holds the
+# GIL so there is little to gain from more threads.
+DEFAULT_NUMBER_OF_THREADS = 2
+
+
+class Job(object):
+    """ A function call that is evaluated by the WorkerPool.
+    """
+    def __init__(self, key, fn, args):
+        """ Constructor
+
+            :param key: identifies the job. There is at most one pending job per key.
+            :param fn: the function that is called in the background thread
+            :param args: tuple with the arguments of the function
+        """
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.result = None
+        self.exception = None
+        self.stack_trace = None
+        self.duration = None
+        self.cancelled = False
+
+
+    def __repr__(self):
+        """ String representation """
+        return "<Job: {!r}>".format(self.key)
+
+
+    def run(self):
+        """ Calls the function and stores its result or the exception it raised.
+        
+            All exceptions are caught, including those that don't derive from Exception, so that
+            the worker thread survives.
+        """
+        start_time = default_timer()
+        try:
+            self.result = self.fn(*self.args)
+        except BaseException as ex:
+            self.exception = ex
+            self.stack_trace = traceback.format_exc()
+        self.duration = default_timer() - start_time
+
+
+
+class WorkerPool(QtCore.QObject):
+    """ Pool of threads that evaluate functions in the background.
+
+        The most recently submitted job is evaluated first. When a job is finished, the
+        jobFinished signal is emitted in the thread of the pool (i.e. normally the GUI thread).
+        Cancelled jobs are not evaluated if they have not started yet. If they have started,
+        their jobFinished signal is not emitted.
+    """
+    jobFinished = QtCore.Signal(object)
+
+    # The signal that is emitted by the worker threads. It is connected to _onJobDone, which is
+    # called in the GUI thread because the connection is queued.
+    _jobDone = QtCore.Signal(object)
+
+    def __init__(self, n_threads=DEFAULT_NUMBER_OF_THREADS, parent=None):
+        """ Constructor
+
+            :param n_threads: number of worker threads. They are started when the first job is
+                submitted.
+            :param parent: the parent QObject
+        """
+        super(WorkerPool, self).__init__(parent)
+        assert n_threads > 0, "n_threads must be > 0. Got: {}".format(n_threads)
+        self._n_threads = n_threads
+        self._threads = []
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._jobs = {}  # Pending (queued or running) jobs by key
+        self._stopped = False
+        self._jobDone.connect(self._onJobDone, QtCore.Qt.QueuedConnection)
+
+
+    def isPending(self, key):
+        """ Returns True if a job with this key is queued or running.
+        """
+        return key in self._jobs
+
+
+    def submit(self, key, fn, *args):
+        """ Submits a job that calls fn(*args) in a background thread.
+
+            If a job with the same key is already pending, no new job is submitted.
+            Returns the (pending) job.
+        """
+        if self._stopped:
+            raise RuntimeError("The WorkerPool has been stopped.")
+
+        job = self._jobs.get(key)
+        if job is not None:
+            return job
+
+        job = Job(key, fn, args)
+        self._jobs[key] = job
+        with self._condition:
+            self._queue.append(job)
+            self._condition.notify()
+
+        if len(self._threads) < self._n_threads:
+            self._startThread()
+        return job
+
+
+    def cancel(self, key):
+        """ Cancels the pending job with this key (if any).
+        """
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancelled = True
+
+
+    def cancelQueued(self):
+        """ Cancels all jobs that haven't started yet. Running jobs will finish normally.
+        """
+        with self._condition:
+            queued_jobs = list(self._queue)
+            self._queue.clear()
+
+        for job in queued_jobs:
+            self.cancel(job.key)
+
+
+    def cancelAll(self):
+        """ Cancels all jobs. Running jobs will finish but their jobFinished isn't emitted.
+            Returns the keys of the cancelled jobs.
+        """
+        keys = list(self._jobs.keys())
+        self.cancelQueued()
+        for key in keys:
+            self.cancel(key)
+        return keys
+
+
+    def stop(self):
+        """ Cancels all jobs and stops the threads after they have finished their current job.
+        """
+        self.cancelAll()
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._threads = []
+
+
+    def _startThread(self):
+        """ Starts a new worker thread.
+        """
+        thread = threading.Thread(target=self._work, name="objbrowser-worker")
+        thread.daemon = True
+        self._threads.append(thread)
+        thread.start()
+
+
+    def _work(self):
+        """ The loop that is executed by the worker threads.
+        """
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                job = self._queue.pop()
+
+            if job.cancelled:
+                continue
+            job.run()
+            self._jobDone.emit(job)
+
+
+    def _onJobDone(self, job):
+        """ Called in the GUI thread when a job is done. Emits jobFinished if not cancelled.
+        """
+        if job.cancelled or self._jobs.get(job.key) is not job:
+            return
+        del self._jobs[job.key]
+        self.jobFinished.emit(job)
@@ -0,0 +1,30 @@
+""" Fixtures of the objbrowser tests.
+
+    The Qt tests use the offscreen platform so that they can run without a display.
+"""
+from __future__ import absolute_import
+
+import os, sys, time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """ Returns the QApplication, which is created once for all tests.
+    """
+    from objbrowser.qtpy import QtWidgets
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+
+def process_events_until(qapp, condition, timeout=5.0):
+    """ Processes Qt events until condition() is True or the timeout (in seconds) has passed.
+        Returns the result of condition().
+    """
+    end_time = time.time() + timeout
+    while not condition() and time.time() < end_time:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
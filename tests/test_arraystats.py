@@ -0,0 +1,55 @@
+""" Tests of the chunked array statistics and the array statistics column.
+"""
+from __future__ import absolute_import
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from objbrowser import arraystats
+from objbrowser.arraystats import array_stats, clear_array_stats_cache
+from objbrowser.attribute_model import ATTR_MODEL_ARRAY_STATS, tio_array_stats
+from objbrowser.engine import evaluate_column
+from objbrowser.treeitem import TreeItem
+from objbrowser.utils import TimeBudgetExceeded, call_with_time_budget
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    " Reduces the arrays in chunks of 64 bytes and starts with an empty cache "
+    monkeypatch.setattr(arraystats, 'STATS_CHUNK_BYTES', 64)
+    clear_array_stats_cache()
+    yield
+    clear_array_stats_cache()
+
+
+def test_array_stats_of_chunks():
+    arr = np.arange(1000.0).reshape(10, 100)
+    arr[3, 7] = np.nan
+    stats = array_stats(arr)
+    assert stats.is_complete
+    assert stats.n_chunks > 1
+    assert stats.nan_count == 1
+    assert stats.min == 0.0
+    assert stats.max == 999.0
+    assert stats.mean == pytest.approx(np.nanmean(arr))
+
+
+def test_array_stats_continue_after_time_budget():
+    arr = np.arange(100 * 1000.0)
+    with pytest.raises(TimeBudgetExceeded):
+        call_with_time_budget(array_stats, (arr, ), 0.001)
+    partial = arraystats._STATS_CACHE.get(arraystats._cache_key(arr), arr)
+    assert 0 < partial.n_chunks_done < partial.n_chunks
+
+    stats = array_stats(arr)
+    assert stats.is_complete
+    assert stats.mean == pytest.approx(arr.mean())
+
+
+def test_array_stats_column_has_time_budget():
+    assert ATTR_MODEL_ARRAY_STATS.expensive
+    assert ATTR_MODEL_ARRAY_STATS.time_budget is not None
+    tree_item = TreeItem(np.arange(10), 'arr', 'arr', False)
+    assert evaluate_column(ATTR_MODEL_ARRAY_STATS, tree_item) == tio_array_stats(tree_item)
+    assert tio_array_stats(TreeItem([1, 2], 'lst', 'lst', False)) == ''
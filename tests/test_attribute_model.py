@@ -0,0 +1,28 @@
+""" Tests of the data and sort key functions of the attribute models.
+"""
+from __future__ import absolute_import
+
+from objbrowser.attribute_model import tio_name_sort_key
+from objbrowser.engine import range_items, RANGE_NODE_SIZE
+from objbrowser.treeitem import TreeItem
+
+
+def _names_sorted_by_name_key(tree_items):
+    " Returns the names of the tree items in the order of the name sort key "
+    return [tree_item.obj_name for tree_item in sorted(tree_items, key=tio_name_sort_key)]
+
+
+def test_name_sort_key_of_indices():
+    names = ['10', '9', 'b', '100', 'a', '0']
+    tree_items = [TreeItem(None, name, name, False) for name in names]
+    assert _names_sorted_by_name_key(tree_items) == ['0', '9', '10', '100', 'a', 'b']
+
+
+def test_name_sort_key_of_range_nodes():
+    sequence = list(range(12 * RANGE_NODE_SIZE + 1))
+    tree_items = [TreeItem(obj, name, 'lst' + name, False) 
+                  for name, obj in reversed(range_items(sequence, 0, len(sequence)))]
+    assert len(tree_items) == 13
+    expected = ['[{}:{}]'.format(start, start + RANGE_NODE_SIZE) 
+                for start in range(0, len(sequence), RANGE_NODE_SIZE)]
+    assert _names_sorted_by_name_key(tree_items) == expected
@@ -0,0 +1,53 @@
+""" Tests of the CellCache.
+"""
+from __future__ import absolute_import
+
+from objbrowser.cellcache import CellCache
+
+
+def test_get_and_put_count_hits():
+    cache = CellCache()
+    assert cache.get('item', 0) is None
+    cache.put('item', 0, 'value')
+    assert cache.get('item', 0) == 'value'
+    assert cache.get('item', 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.hit_rate == 1 / 3.0
+    cache.reset_counters()
+    assert cache.hit_rate is None
+
+
+def test_least_recently_used_items_are_evicted():
+    cache = CellCache(max_cells=4)
+    for item in 'abc':
+        cache.put(item, 0, item)
+    cache.put('a', 1, 'a1')
+    cache.get('b', 0)  # b is now more recently used than a and c
+    cache.put('d', 0, 'd')
+    # All cells of the least recently used item are evicted.
+    assert cache.get('c', 0) is None
+    assert cache.get('a', 0) == 'a'
+    assert cache.get('b', 0) == 'b'
+    assert cache.n_cells == 4
+
+
+def test_eviction_by_number_of_characters():
+    cache = CellCache(max_chars=10)
+    cache.put('a', 0, 'x' * 6)
+    cache.put('b', 0, 'y' * 6)
+    assert cache.get('a', 0) is None
+    assert cache.n_chars == 6
+    cache.put('c', 0, 'z' * 11)  # too large to be cached
+    assert cache.get('c', 0) is None
+    assert cache.get('b', 0) == 'y' * 6
+
+
+def test_replace_and_pop():
+    cache = CellCache()
+    cache.put('a', 0, 'old')
+    cache.put('a', 0, 'newer')
+    cache.put('a', 1, 'x')
+    assert (cache.n_cells, cache.n_chars) == (2, 6)
+    assert cache.pop('a') == {0: 'newer', 1: 'x'}
+    assert cache.pop('a') is None
+    assert (cache.n_cells, cache.n_chars) == (0, 0)
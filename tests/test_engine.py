@@ -0,0 +1,55 @@
+""" Tests of the Qt-independent core: child providers, paging and column evaluation.
+"""
+from __future__ import absolute_import
+
+from objbrowser.attribute_model import ATTR_MODEL_REPR, ATTR_MODEL_CLASS
+from objbrowser.engine import (fetch_children, add_fetched_children, iter_child_items, 
+                               evaluate_column, single_line, range_items, RANGE_NODE_SIZE, 
+                               LINE_BREAK_GLYPH)
+from objbrowser.treeitem import TreeItem, hidden_attribute_flags
+
+HIDE_ATTRIBUTES = hidden_attribute_flags(False, False)
+
+
+def test_fetch_children_in_pages():
+    parent_item = TreeItem(list(range(5)), 'lst', 'lst', None)
+    n_elements, tree_items = fetch_children(parent_item, page_size=3)
+    assert (n_elements, tree_items) == (3, [])
+    add_fetched_children(parent_item, n_elements, tree_items)
+    assert not parent_item.children_fetched
+
+    n_elements, tree_items = fetch_children(parent_item, page_size=3)
+    add_fetched_children(parent_item, n_elements, tree_items)
+    assert n_elements == 2
+    assert [tree_item.obj_name for tree_item in tree_items] == ['__add__']  # first attribute
+
+    fetch_children(parent_item, page_size=None)
+    assert parent_item.children_fetched
+    assert fetch_children(parent_item) == (0, [])
+
+
+def test_iter_child_items_of_dict():
+    tree_item = TreeItem({'b': 1, 'a': [2]}, 'd', 'd', None)
+    paths = [child.obj_path for child in iter_child_items(tree_item, HIDE_ATTRIBUTES)]
+    assert paths == ["d['a']", "d['b']"]
+    
+    
+def test_range_items():
+    lst = list(range(RANGE_NODE_SIZE ** 2 + 1))
+    names = [name for name, _ in range_items(lst, 0, len(lst))]
+    assert names[:2] == ['[0:1000000]', '[1000000:2000000]']
+    assert len(names) == 2
+    sub_ranges = range_items(lst, 0, RANGE_NODE_SIZE ** 2)
+    assert len(sub_ranges) == RANGE_NODE_SIZE
+    assert sub_ranges[-1][1].stop == RANGE_NODE_SIZE ** 2
+
+
+def test_evaluate_bounded_column():
+    tree_item = TreeItem(list(range(100000)), 'lst', 'lst', None)
+    assert evaluate_column(ATTR_MODEL_REPR, tree_item, max_len=10) == '[0, 1, ...'
+    assert evaluate_column(ATTR_MODEL_CLASS, tree_item, max_len=2) == 'list'
+
+
+def test_single_line():
+    assert single_line('a\nb\r\nc', 100) == 'a{0}b{0}c'.format(LINE_BREAK_GLYPH)
+    assert single_line('abcdefgh', 5) == 'ab...'
@@ -0,0 +1,80 @@
+""" Tests of walking and exporting the object tree without Qt.
+"""
+from __future__ import absolute_import
+
+import json
+from collections import OrderedDict
+
+from six import StringIO
+
+from objbrowser.attribute_model import ATTR_MODEL_PATH, ATTR_MODEL_CLASS, ATTR_MODEL_LENGTH
+from objbrowser.export import walk_tree, export_tree, find_attr_models
+
+import pytest
+
+
+def _data():
+    return OrderedDict([('a', [1, 2]), ('b', {'c': 3})])
+
+
+def _paths(obj, obj_name='', **kwargs):
+    " Returns the (depth, path) of the visited nodes, without the attributes "
+    kwargs.setdefault('show_callable_attributes', False)
+    kwargs.setdefault('show_special_attributes', False)
+    return [(depth, tree_item.obj_path) for depth, tree_item in 
+            walk_tree(obj, obj_name, **kwargs)]
+
+
+def test_walk_tree_is_depth_first():
+    assert _paths(_data(), 'data', max_depth=2) == [
+        (0, 'data'), (1, "data['a']"), (2, "data['a'][0]"), (2, "data['a'][1]"), 
+        (1, "data['b']"), (2, "data['b']['c']")]
+
+
+def test_walk_tree_limits():
+    assert _paths(_data(), 'data', max_depth=1) == [
+        (0, 'data'), (1, "data['a']"), (1, "data['b']")]
+    assert _paths(_data(), 'data', max_nodes=3) == [
+        (0, 'data'), (1, "data['a']"), (2, "data['a'][0]")]
+    assert _paths(_data(), 'data', max_nodes=0) == []
+    # Without a name the walk starts with the children.
+    assert _paths(_data(), max_depth=1) == [(1, 'a'), (1, 'b')]
+
+
+def test_walk_tree_attributes():
+    paths = [path for _, path in _paths(_data(), 'data', max_depth=1, 
+                                        show_callable_attributes=True)]
+    assert 'data.keys' in paths
+    assert 'data.__class__' not in paths
+
+
+def test_export_tree_jsonl():
+    output = StringIO()
+    attr_cols = [ATTR_MODEL_PATH, ATTR_MODEL_CLASS, ATTR_MODEL_LENGTH]
+    n_nodes = export_tree(_data(), output, 'data', attr_cols=attr_cols, max_depth=1,
+                          show_callable_attributes=False, show_special_attributes=False)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert n_nodes == len(records) == 3
+    assert records[1] == {'depth': 1, 'path': "data['a']", 'type name': 'list', 'length': '2'}
+    assert records[2]['length'] == '1'
+
+
+def test_export_tree_text():
+    output = StringIO()
+    export_tree(_data(), output, 'data', file_format='text', max_depth=2,
+                attr_cols=find_attr_models(['path', 'type name']),
+                show_callable_attributes=False, show_special_attributes=False)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == 'data | OrderedDict'
+    assert lines[1] == "    data['a'] | list"
+    assert lines[2] == "        data['a'][0] | int"
+
+
+def test_export_errors_are_text():
+    output = StringIO()
+    export_tree({'n': 1}, output, 'obj', attr_cols=[ATTR_MODEL_LENGTH], max_depth=1,
+                show_callable_attributes=False, show_special_attributes=False)
+    # safe_data_fn returns an empty string when len() fails
+    assert json.loads(output.getvalue().splitlines()[1]) == {'depth': 1, 'length': ''}
+    with pytest.raises(ValueError):
+        find_attr_models(['no such column'])
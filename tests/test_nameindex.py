@@ -0,0 +1,67 @@
+""" Tests of the NameIndex.
+"""
+from __future__ import absolute_import
+
+from objbrowser.nameindex import NameIndex, trigrams
+
+
+class Item(object):
+    " Stands in for a TreeItem "
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+def _make_index(names):
+    " Returns a NameIndex with an Item per name and a dict with the items by name "
+    items = {name: Item(name) for name in names}
+    index = NameIndex()
+    for name, item in items.items():
+        index.add(item, name)
+    return index, items
+
+
+def test_trigrams():
+    assert trigrams('abcd') == {'abc', 'bcd'}
+    assert trigrams('ab') == set()
+
+
+def test_search_is_case_insensitive_substring_match():
+    index, items = _make_index(['Alpha', 'alphabet', 'beta', 'gamma'])
+    assert len(index) == 4
+    assert index.search('alph') == {items['Alpha'], items['alphabet']}
+    assert index.search('bet') == {items['alphabet'], items['beta']}
+    assert index.search('delta') == set()
+    assert index.key(items['Alpha']) == 'alpha'
+
+
+def test_short_text_checks_all_items():
+    index, items = _make_index(['ab', 'ba', 'cc'])
+    assert index.candidates('a') == set(items.values())
+    assert index.search('a') == {items['ab'], items['ba']}
+
+
+def test_search_within_candidates_and_with_key_fn():
+    index, items = _make_index(['x.foo', 'x.foobar', 'y.foo'])
+    previous = index.search('foo')
+    assert index.search('foob', candidates=previous) == {items['x.foobar']}
+    # Only search the part after the dot.
+    key_fn = lambda item: index.key(item).partition('.')[2]
+    assert index.search('x', key_fn=key_fn) == set()
+
+
+def test_remove_and_re_add():
+    index, items = _make_index(['alpha', 'beta'])
+    index.remove(items['alpha'])
+    index.remove(items['alpha'])  # no-op
+    assert items['alpha'] not in index
+    assert index.search('alp') == set()
+
+    index.add(items['beta'], 'gamma')
+    assert index.search('bet') == set()
+    assert index.search('gam') == {items['beta']}
+    assert len(index) == 1
+    index.clear()
+    assert len(index) == 0
@@ -0,0 +1,84 @@
+""" Tests of the details pane of the ObjectBrowser.
+"""
+from __future__ import absolute_import
+
+import pytest
+
+from objbrowser.treemodel import PENDING_VALUE_TEXT
+from objbrowser.attribute_model import AttributeModel, DEFAULT_ATTR_COLS, ATTR_MODEL_PATH
+
+from conftest import process_events_until
+
+
+def _raise_value_error(tree_item):
+    " Details function that always fails "
+    raise ValueError("details of {} are broken".format(tree_item.obj_path))
+
+
+ATTR_MODEL_BROKEN = AttributeModel('broken', 
+    doc         = "Details that raise an exception.",
+    data_fn     = lambda tree_item: '', 
+    details_fn  = _raise_value_error)
+
+
+@pytest.fixture
+def make_browser(qapp):
+    """ Returns a function that creates an ObjectBrowser. The browsers are cleaned up without 
+        writing their settings.
+    """
+    from objbrowser.objectbrowser import ObjectBrowser
+    browsers = []
+
+    def make(obj, attribute_details):
+        browser = ObjectBrowser(obj, 'obj', attribute_columns=DEFAULT_ATTR_COLS, 
+                                attribute_details=attribute_details, reset=True)
+        browsers.append(browser)
+        return browser
+
+    yield make
+    for browser in browsers:
+        browser._finalize()
+        browser._remove_instance()
+        browser.deleteLater()
+
+
+def _show_details(qapp, browser, button_id):
+    """ Selects the first child of the inspected node and the details button and returns the 
+        text of the details editor once it has been calculated.
+    """
+    proxy_model = browser._proxy_tree_model
+    browser.obj_tree.setCurrentIndex(proxy_model.index(0, 0, proxy_model.firstItemIndex()))
+    browser.button_group.button(button_id).setChecked(True)
+    browser._change_details_field(button_id)
+    assert process_events_until(qapp, lambda: browser.editor.toPlainText() != PENDING_VALUE_TEXT)
+    return browser.editor.toPlainText()
+
+
+def test_details_error_is_shown(qapp, make_browser):
+    browser = make_browser({'a': 1}, (ATTR_MODEL_PATH, ATTR_MODEL_BROKEN))
+    text = _show_details(qapp, browser, 1)
+    assert "details of obj['a'] are broken" in text
+    assert 'ValueError' in text
+
+
+def test_details_time_budget_exceeded(qapp, make_browser, monkeypatch):
+    np = pytest.importorskip('numpy')
+    from objbrowser import arraystats, objectbrowser
+    from objbrowser.attribute_model import ATTR_MODEL_ARRAY_STATS
+
+    monkeypatch.setattr(objectbrowser, 'DETAILS_TIME_BUDGET', 0.01)
+    monkeypatch.setattr(arraystats, 'STATS_CHUNK_BYTES', 8)
+    arr = np.arange(100 * 1000.0)
+    browser = make_browser({'arr': arr}, (ATTR_MODEL_PATH, ATTR_MODEL_ARRAY_STATS))
+    
+    text = _show_details(qapp, browser, 1)
+    assert 'Exceeded the time budget' in text
+    assert "Click the 'array statistics' button again" in text
+    key = arraystats._cache_key(arr)
+    n_chunks_done = arraystats._STATS_CACHE.get(key, arr).n_chunks_done
+    assert 0 < n_chunks_done < len(arr)
+
+    # Clicking the button again continues with the remaining chunks.
+    text = _show_details(qapp, browser, 1)
+    assert 'Exceeded the time budget' in text
+    assert arraystats._STATS_CACHE.get(key, arr).n_chunks_done > n_chunks_done
@@ -0,0 +1,34 @@
+""" Tests of the PerformancePanel.
+"""
+from __future__ import absolute_import
+
+from objbrowser.attribute_model import DEFAULT_ATTR_COLS
+from objbrowser.perfpanel import PerformancePanel
+from objbrowser.treemodel import TreeModel
+
+
+def test_tree_items_are_only_counted_on_request(qapp, monkeypatch):
+    model = TreeModel({'a': 1, 'b': [1, 2]}, 'obj', attr_cols=DEFAULT_ATTR_COLS)
+    model.fetchMore(model.inspectedIndex())
+    tree_item_stats = model.treeItemStats
+    calls = []
+
+    def counting_tree_item_stats():
+        calls.append(True)
+        return tree_item_stats()
+
+    monkeypatch.setattr(model, 'treeItemStats', counting_tree_item_stats)
+    panel = PerformancePanel(model)
+    try:
+        panel.updateStats()  # called periodically while the panel is visible
+        assert calls == []
+        assert 'tree_items' not in panel.report(count_tree_items=False)
+
+        n_items, _n_bytes = tree_item_stats()
+        panel.count_button.click()
+        assert len(calls) == 1
+        assert panel.memory_label.text().startswith("Tree items: {:,},".format(n_items))
+        assert panel.report()['tree_items']['count'] == n_items
+    finally:
+        panel.stop()
+        model.stopWorkers()
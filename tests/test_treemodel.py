@@ -0,0 +1,149 @@
+""" Tests of the TreeModel and the TreeProxyModel.
+"""
+from __future__ import absolute_import
+
+import time
+
+import pytest
+
+from objbrowser.qtpy.QtCore import Qt
+from objbrowser.attribute_model import AttributeModel, ATTR_MODEL_NAME
+from objbrowser.engine import RANGE_NODE_SIZE
+from objbrowser.treemodel import TreeModel, TreeProxyModel, PENDING_VALUE_TEXT, diff_child_keys
+
+from conftest import process_events_until
+
+
+def _slow_name(tree_item):
+    " Data function that doesn't check the time budget "
+    time.sleep(0.05)
+    return tree_item.obj_name.upper()
+
+
+@pytest.fixture
+def make_model(qapp):
+    """ Returns a function that creates a TreeModel of which the children of the inspected 
+        node are fetched. The worker threads of the models are stopped afterwards.
+    """
+    models = []
+
+    def make(obj, attr_cols, **kwargs):
+        model = TreeModel(obj, 'obj', attr_cols=attr_cols, **kwargs)
+        model.fetchMore(model.inspectedIndex())
+        models.append(model)
+        return model
+
+    yield make
+    for model in models:
+        model.stopWorkers()
+
+
+@pytest.mark.parametrize('expensive', [False, True])
+def test_late_cell_is_marked_as_timed_out(qapp, make_model, expensive):
+    slow_col = AttributeModel('slow', data_fn=_slow_name, expensive=expensive, 
+                              time_budget=0.01)
+    model = make_model({'a': 1}, [ATTR_MODEL_NAME, slow_col])
+    timed_out = []
+    model.cellTimedOut.connect(lambda path, col_name, duration: timed_out.append(path))
+    index = model.index(0, 1, model.inspectedIndex())
+
+    assert process_events_until(
+        qapp, lambda: model.data(index, Qt.DisplayRole) != PENDING_VALUE_TEXT)
+    assert model.data(index, Qt.DisplayRole) == 'A'
+    assert timed_out == ["obj['a']"]
+    assert list(model.timedOutCells) == [("obj['a']", 1)]
+
+
+def _check_diff(old_keys, new_keys):
+    """ Checks that the result of diff_child_keys transforms the old into the new keys. 
+        Returns the number of kept keys.
+    """
+    kept, removed, inserted = diff_child_keys(old_keys, new_keys)
+    for old_pos, new_pos in kept:
+        assert old_keys[old_pos] == new_keys[new_pos]
+    for positions in zip(*kept):
+        assert list(positions) == sorted(set(positions))
+    removed_positions = [pos for start, stop in removed for pos in range(start, stop)]
+    inserted_positions = [pos for start, stop in inserted for pos in range(start, stop)]
+    assert sorted(removed_positions + [old_pos for old_pos, _ in kept]) == \
+        list(range(len(old_keys)))
+    assert sorted(inserted_positions + [new_pos for _, new_pos in kept]) == \
+        list(range(len(new_keys)))
+    return len(kept)
+
+
+@pytest.mark.parametrize('old_keys, new_keys, n_kept', [
+    ('abc', 'abc', 3),
+    ('abc', 'abxc', 3),
+    ('abcd', 'ad', 2),
+    ('abcd', 'dabc', 3),
+    ('abcdef', 'fedcba', 1),
+    ('', 'ab', 0),
+    ('ab', '', 0),
+    ('aab', 'aba', 2),  # duplicates are matched in order of occurrence
+    ('pop', 'ppo', 2),
+])
+def test_diff_child_keys(old_keys, new_keys, n_kept):
+    assert _check_diff(list(old_keys), list(new_keys)) == n_kept
+
+
+def test_diff_child_keys_ranges_are_maximal():
+    kept, removed, inserted = diff_child_keys(list('abcdef'), list('axyf'))
+    assert kept == [(0, 0), (5, 3)]
+    assert removed == [(1, 5)]
+    assert inserted == [(1, 3)]
+
+
+def test_children_are_fetched_in_pages(qapp, make_model):
+    model = make_model({'k{:03d}'.format(i): i for i in range(25)}, [ATTR_MODEL_NAME],
+                       fetch_page_size=10)
+    parent = model.inspectedIndex()
+    assert model.rowCount(parent) == 10
+    assert model.canFetchMore(parent)
+    model.fetchMore(parent)
+    assert model.rowCount(parent) == 20
+    while model.canFetchMore(parent):
+        model.fetchMore(parent)
+    assert model.index(24, 0, parent).data() == 'k024'
+
+
+def test_long_sequences_are_split_into_range_nodes(qapp, make_model):
+    lst = list(range(2 * RANGE_NODE_SIZE + 1))
+    model = make_model({'lst': lst}, [ATTR_MODEL_NAME], fetch_page_size=None)
+    lst_index = model.index(0, 0, model.inspectedIndex())
+    model.fetchMore(lst_index)
+    names = [model.index(row, 0, lst_index).data() for row in range(3)]
+    assert names == ['[0:1000]', '[1000:2000]', '[2000:3000]']
+
+    last_range = model.index(2, 0, lst_index)
+    model.fetchMore(last_range)
+    assert model.rowCount(last_range) == 1
+    assert model.treeItem(model.index(0, 0, last_range)).obj_path == "obj['lst'][2000]"
+
+
+def test_name_filter_shows_matches_and_ancestors(qapp, make_model):
+    data = {'alpha': {'needle': 'a', 'hay': 'b'}, 'beta': {'hay': 'c'}, 'needles': 'd'}
+    model = make_model(data, [ATTR_MODEL_NAME], fetch_page_size=None)
+    for row in range(len(data)):  # the items precede the attributes
+        model.fetchMore(model.index(row, 0, model.inspectedIndex()))
+    proxy = TreeProxyModel()
+    proxy.setSourceModel(model)
+    proxy.setShowCallables(False)
+    proxy.setShowSpecialAttributes(False)
+    
+    def visible_paths(parent=None):
+        " Returns the paths of the visible rows under the parent "
+        parent = proxy.firstItemIndex() if parent is None else parent
+        paths = []
+        for row in range(proxy.rowCount(parent)):
+            index = proxy.index(row, 0, parent)
+            paths.append(proxy.treeItem(index).obj_path)
+            paths.extend(visible_paths(index))
+        return paths
+
+    assert proxy.setNameFilter('NEEDLE') == 2
+    assert visible_paths() == ["obj['alpha']", "obj['alpha']['needle']", "obj['needles']"]
+    assert proxy.setNameFilter('needles') == 1
+    assert visible_paths() == ["obj['needles']"]
+    assert proxy.setNameFilter('') == 0
+    assert "obj['beta']['hay']" in visible_paths()
@@ -0,0 +1,100 @@
+""" Tests of the bounded string representations and the time budget helpers.
+"""
+from __future__ import absolute_import
+
+import pprint, sys, time
+
+import pytest
+
+from objbrowser.utils import (bounded_repr, bounded_str, bounded_unicode, bounded_pformat, 
+                              iter_repr, call_with_time_budget, check_time_budget, 
+                              iter_with_time_budget, TimeBudgetExceeded)
+
+
+SMALL_OBJECTS = [
+    [], (), {}, set(), frozenset(), (1, ), 'text', u'€', b'bytes', 
+    [1, 'two', (3.0, None)], {'a': [1, 2], 'b': {'c': set([3])}}, frozenset([1]),
+    'quo\'te', 'both\'"quotes', 'x' * 25000 + '\'', 'x' * 25000 + '"\'', b'y' * 25000]
+
+
+@pytest.mark.parametrize('obj', SMALL_OBJECTS)
+def test_iter_repr_equals_repr(obj):
+    assert ''.join(iter_repr(obj)) == repr(obj)
+
+
+def test_iter_repr_of_recursive_list():
+    lst = [1]
+    lst.append(lst)
+    assert ''.join(iter_repr(lst)) == repr(lst)
+
+
+def test_bounded_repr_cuts_off_at_max_len():
+    lst = list(range(100000))
+    result = bounded_repr(lst, 50)
+    assert len(result) == 50
+    assert result.endswith('...')
+    assert repr(lst).startswith(result[:-3])
+    assert bounded_repr([1, 2], 50) == '[1, 2]'
+
+
+def test_bounded_str_and_unicode():
+    assert bounded_str('abc', 10) == 'abc'
+    assert bounded_str('a' * 20, 10) == 'a' * 7 + '...'
+    assert bounded_str(['a'], 10) == str(['a'])
+    assert bounded_unicode(u'€' * 20, 10) == u'€' * 7 + '...'
+    assert bounded_str(12345678901, 5) == '12...'
+
+
+def test_bounded_pformat():
+    obj = {'key{}'.format(i): list(range(i)) for i in range(30)}
+    kwargs = {'sort_dicts': False} if sys.version_info >= (3, 8) else {}
+    expected = pprint.pformat(obj, indent=4, **kwargs)
+    assert bounded_pformat(obj, len(expected)) == expected
+    result = bounded_pformat(obj, 100)
+    assert len(result) == 100
+    assert expected.startswith(result[:-3])
+
+
+def _busy(duration):
+    " Calls check_time_budget for duration seconds and returns 'done' "
+    end_time = time.time() + duration
+    while time.time() < end_time:
+        check_time_budget()
+        time.sleep(0.001)
+    return 'done'
+
+
+def test_call_with_time_budget():
+    assert call_with_time_budget(_busy, (0.0, ), 1.0) == 'done'
+    assert call_with_time_budget(_busy, (0.05, ), None) == 'done'
+    with pytest.raises(TimeBudgetExceeded) as exc_info:
+        call_with_time_budget(_busy, (10.0, ), 0.02)
+    assert exc_info.value.time_budget == 0.02
+    # The deadline is removed after the call.
+    check_time_budget()
+
+
+def test_call_with_time_budget_returns_late_results():
+    # Code that doesn't call check_time_budget can't be interrupted.
+    assert call_with_time_budget(time.sleep, (0.05, ), 0.01) is None
+
+
+def test_nested_time_budget_uses_earliest_deadline():
+    start_time = time.time()
+    with pytest.raises(TimeBudgetExceeded):
+        call_with_time_budget(call_with_time_budget, (_busy, (10.0, ), 10.0), 0.02)
+    assert time.time() - start_time < 5.0
+
+
+def test_iter_with_time_budget():
+    assert list(iter_with_time_budget(['a', 'b'], 1.0)) == ['a', 'b']
+
+    def chunks():
+        yield 'fast'
+        _busy(10.0)
+        yield 'never'
+
+    result = list(iter_with_time_budget(chunks(), 0.02))
+    assert result[0] == 'fast'
+    assert len(result) == 2
+    assert result[1].startswith('\n**TIMEOUT**')
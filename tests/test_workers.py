@@ -0,0 +1,58 @@
+""" Tests of the WorkerPool.
+"""
+from __future__ import absolute_import
+
+import threading
+
+import pytest
+
+from objbrowser.workers import WorkerPool
+
+from conftest import process_events_until
+
+
+@pytest.fixture
+def pool(qapp):
+    " Returns a WorkerPool that is stopped afterwards "
+    worker_pool = WorkerPool(n_threads=2)
+    yield worker_pool
+    worker_pool.stop()
+
+
+def test_jobs_are_evaluated_in_the_background(qapp, pool):
+    finished = []
+    pool.jobFinished.connect(finished.append)
+    gui_thread = threading.current_thread()
+    job = pool.submit('key', lambda x: (x * 2, threading.current_thread()), 21)
+    assert pool.submit('key', lambda: None) is job  # at most one pending job per key
+    assert pool.isPending('key')
+
+    assert process_events_until(qapp, lambda: finished)
+    assert finished == [job]
+    assert job.result[0] == 42
+    assert job.result[1] is not gui_thread
+    assert not pool.isPending('key')
+
+
+def test_exceptions_are_stored_in_the_job(qapp, pool):
+    finished = []
+    pool.jobFinished.connect(finished.append)
+    pool.submit('key', lambda: 1 / 0)
+    assert process_events_until(qapp, lambda: finished)
+    assert isinstance(finished[0].exception, ZeroDivisionError)
+    assert 'ZeroDivisionError' in finished[0].stack_trace
+
+
+def test_cancelled_jobs_are_not_finished(qapp, pool):
+    finished = []
+    pool.jobFinished.connect(finished.append)
+    release = threading.Event()
+    pool.submit('slow', release.wait, 5.0)
+    pool.submit('cancelled', lambda: 'result')
+    pool.cancel('cancelled')
+    assert not pool.isPending('cancelled')
+    assert set(pool.cancelAll()) == {'slow'}
+    release.set()
+    pool.submit('last', lambda: 'done')
+    assert process_events_until(qapp, lambda: finished)
+    assert [job.key for job in finished] == ['last']